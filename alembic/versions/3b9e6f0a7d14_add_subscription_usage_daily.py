@@ -0,0 +1,45 @@
+"""add_subscription_usage_daily
+
+Revision ID: 3b9e6f0a7d14
+Revises: 8f4b1d2c6e57
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e6f0a7d14'
+down_revision = '8f4b1d2c6e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'subscription_usage_daily',
+        sa.Column('branch_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('subscription_id', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('user_ids', postgresql.ARRAY(sa.Integer()), server_default=sa.text("'{}'"), nullable=False),
+        sa.ForeignKeyConstraint(['branch_id'], ['branches.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['subscription_id'], ['subscriptions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('branch_id', 'day', 'subscription_id')
+    )
+    # Бар заказдардан жиынтықты толтыру
+    op.execute("""
+        INSERT INTO subscription_usage_daily (branch_id, day, subscription_id, orders, user_ids)
+        SELECT branch_id, CAST(created_at AS DATE), subscription_id, count(id), array_agg(DISTINCT user_id)
+        FROM orders
+        WHERE paid_by_subscription = true
+          AND subscription_id IS NOT NULL
+          AND status != 'cancelled'
+        GROUP BY branch_id, CAST(created_at AS DATE), subscription_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('subscription_usage_daily')
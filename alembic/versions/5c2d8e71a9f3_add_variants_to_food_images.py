@@ -0,0 +1,24 @@
+"""add_variants_to_food_images
+
+Revision ID: 5c2d8e71a9f3
+Revises: e1a7c3f94b20
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2d8e71a9f3'
+down_revision = 'e1a7c3f94b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('food_images', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('food_images', 'variants')
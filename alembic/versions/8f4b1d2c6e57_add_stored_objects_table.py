@@ -0,0 +1,36 @@
+"""add_stored_objects_table
+
+Revision ID: 8f4b1d2c6e57
+Revises: 5c2d8e71a9f3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f4b1d2c6e57'
+down_revision = '5c2d8e71a9f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'stored_objects',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('folder', sa.String(), nullable=False),
+        sa.Column('url', sa.String(), nullable=False),
+        sa.Column('content_type', sa.String(), nullable=True),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('variants', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('sha256', 'folder', name='uq_stored_object_sha256_folder')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stored_objects')
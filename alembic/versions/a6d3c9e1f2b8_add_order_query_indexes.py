@@ -0,0 +1,46 @@
+"""add_order_query_indexes
+
+Revision ID: a6d3c9e1f2b8
+Revises: 3b9e6f0a7d14
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d3c9e1f2b8'
+down_revision = '3b9e6f0a7d14'
+branch_labels = None
+depends_on = None
+
+ACTIVE_ORDER_CONDITION = sa.text("status IN ('pending', 'accepted', 'cooking', 'ready')")
+
+INDEXES = [
+    ('ix_orders_user_created', 'orders', ['user_id', 'created_at'], None),
+    ('ix_orders_branch_created', 'orders', ['branch_id', 'created_at'], None),
+    ('ix_orders_branch_updated', 'orders', ['branch_id', 'updated_at'], None),
+    ('ix_orders_active_branch_status', 'orders', ['branch_id', 'status'], ACTIVE_ORDER_CONDITION),
+    ('ix_orders_active_created', 'orders', ['created_at'], ACTIVE_ORDER_CONDITION),
+    ('ix_order_items_order_id', 'order_items', ['order_id'], None),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY: orders кестесіне жазу индекс құрылып жатқанда бөгелмейді (транзакциядан тыс)
+    with op.get_context().autocommit_block():
+        # Модельдегі статустар бұрынғы миграцияларда enum-ға қосылмаған (partial индекс шарты оларды қолданады)
+        for value in ('ready', 'given'):
+            op.execute(f"ALTER TYPE orderstatus ADD VALUE IF NOT EXISTS '{value}'")
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False,
+                postgresql_where=where, postgresql_concurrently=True, if_not_exists=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
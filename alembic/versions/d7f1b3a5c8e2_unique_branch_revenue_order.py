@@ -0,0 +1,33 @@
+"""unique_branch_revenue_order
+
+Revision ID: d7f1b3a5c8e2
+Revises: c4e8a2f7b9d1
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7f1b3a5c8e2'
+down_revision = 'c4e8a2f7b9d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Қайталанған жазбаларды өшіру: әр заказдың ең бірінші (ең кіші id) жазбасы қалады
+    op.execute("""
+        DELETE FROM branch_revenue duplicate
+        USING branch_revenue original
+        WHERE duplicate.order_id = original.order_id
+          AND duplicate.id > original.id
+    """)
+    op.create_unique_constraint('uq_branch_revenue_order_id', 'branch_revenue', ['order_id'])
+    op.create_index('ix_branch_revenue_branch_created', 'branch_revenue', ['branch_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_branch_revenue_branch_created', table_name='branch_revenue')
+    op.drop_constraint('uq_branch_revenue_order_id', 'branch_revenue', type_='unique')
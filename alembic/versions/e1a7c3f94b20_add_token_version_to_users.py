@@ -0,0 +1,24 @@
+"""add_token_version_to_users
+
+Revision ID: e1a7c3f94b20
+Revises: d10882ccb6ba
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a7c3f94b20'
+down_revision = 'd10882ccb6ba'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
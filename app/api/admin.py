@@ -203,6 +203,7 @@ def delete_canteen_admin(
 
     db.delete(admin)
     db.commit()
+    AuthService.invalidate_principal(admin_id)
     return {"message": "Администратор өшірілді"}
 
 
@@ -5,13 +5,15 @@ import jwt
 from fastapi import APIRouter, Depends, HTTPException, status, Body, Response, Request
 from sqlalchemy.orm import Session
 from starlette.responses import RedirectResponse
+from starlette.concurrency import run_in_threadpool
 import secrets
 import string
 
 from config import settings
 from app.configuration.auth_generate_google import generate_google_auth
 from app.configuration.state_storage import state_storage
-from app.database.connection import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import get_db, get_async_db
 from app.models.user import User
 from app.models.otp_code import OtpCode
 from app.schemas.auth_dto import (
@@ -95,7 +97,9 @@ async def google_auth_callback(
     # 🆕 Егер жоқ болса → REGISTER
     if not user:
         random_password = generate_random_password()
-        user = AuthService.register_user(
+        # Argon2 хэштеу event loop-ты бөгемеуі үшін threadpool-да
+        user = await run_in_threadpool(
+            AuthService.register_user,
             db=db,
             full_name=full_name,
             email=email,
@@ -103,8 +107,8 @@ async def google_auth_callback(
             is_email_verified=True
         )
 
-    access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value})
-    refresh_token = AuthService.create_refresh_token({"sub": user.id})
+    access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value, "ver": user.token_version})
+    refresh_token = AuthService.create_refresh_token({"sub": user.id, "ver": user.token_version})
 
     response.set_cookie(
         key="access_token",
@@ -223,8 +227,8 @@ def register(user_data: UserRegisterRequest, response: Response, db: Session = D
         raise HTTPException(status_code=400, detail=str(e))
 
 
-    access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value})
-    refresh_token = AuthService.create_refresh_token({"sub": user.id})
+    access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value, "ver": user.token_version})
+    refresh_token = AuthService.create_refresh_token({"sub": user.id, "ver": user.token_version})
 
     response.set_cookie(
         key="access_token",
@@ -249,17 +253,17 @@ def register(user_data: UserRegisterRequest, response: Response, db: Session = D
     )
 
 @router.post("/login", response_model=TokenResponse)
-def login(credentials: UserLoginRequest, response: Response, db: Session = Depends(get_db)):
+async def login(credentials: UserLoginRequest, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Жүйеге кіру (логин)"""
-    user = AuthService.authenticate_user(
+    user = await AuthService.authenticate_user_async(
         db=db,
         email=credentials.email,
         password=credentials.password
     )
     
     # Токендер жасау
-    access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value})
-    refresh_token = AuthService.create_refresh_token({"sub": user.id})
+    access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value, "ver": user.token_version})
+    refresh_token = AuthService.create_refresh_token({"sub": user.id, "ver": user.token_version})
     
     response.set_cookie(
         key="access_token",
@@ -309,15 +313,16 @@ def refresh_token(request: Request, response: Response, data: TokenRefreshReques
         user_id = int(payload.get("sub"))
         user = db.query(User).filter(User.id == user_id).first()
         
-        if not user:
+        # Пароль өзгергеннен кейін ескі refresh token жарамсыз
+        if not user or user.token_version != payload.get("ver", 0):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Қолданушы табылмады"
             )
         
         # Жаңа токендер жасау
-        new_access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value})
-        new_refresh_token = AuthService.create_refresh_token({"sub": user.id})
+        new_access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value, "ver": user.token_version})
+        new_refresh_token = AuthService.create_refresh_token({"sub": user.id, "ver": user.token_version})
         
         response.set_cookie(
             key="access_token",
@@ -366,18 +371,47 @@ def update_me(data: UserUpdateRequest, db: Session = Depends(get_db), current_us
     db.add(user)
     db.commit()
     db.refresh(user)
+    AuthService.invalidate_principal(user.id)
 
     return user
 
 @router.post("/me/change-password")
-def change_password(data: ChangePasswordRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def change_password(data: ChangePasswordRequest, response: Response, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     """Change current user's password"""
-    if not AuthService.verify_password(data.old_password, current_user.hashed_password):
+    # current_user кэштен келуі мүмкін (сессияға тіркелмеген), сондықтан қайта жүктейміз
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not AuthService.verify_password(data.old_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Қазіргі құпиясөз қате")
     
-    current_user.hashed_password = AuthService.get_password_hash(data.new_password)
+    user.hashed_password = AuthService.get_password_hash(data.new_password)
+    # Басқа құрылғылардағы ескі токендер жарамсыз болады
+    AuthService.revoke_tokens(user)
     db.commit()
-    return {"message": "Құпиясөз сәтті өзгертілді"}
+
+    # Осы сессия жаңа токендермен жалғасады
+    access_token = AuthService.create_access_token({"sub": user.id, "role": user.role.value, "ver": user.token_version})
+    refresh_token = AuthService.create_refresh_token({"sub": user.id, "ver": user.token_version})
+    response.set_cookie(
+        key="access_token",
+        value=access_token,
+        httponly=True,
+        secure=True,
+        samesite="lax",
+        max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    )
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token,
+        httponly=True,
+        secure=True,
+        samesite="lax",
+        max_age=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+    )
+    return {
+        "message": "Құпиясөз сәтті өзгертілді",
+        "access_token": access_token,
+        "refresh_token": refresh_token
+    }
 
 @router.post("/me/change-email/send-otp")
 async def send_change_email_otp(data: ForgotPasswordRequest, db: Session = Depends(get_db)):
@@ -409,9 +443,11 @@ def verify_change_email(data: ChangeEmailRequest, db: Session = Depends(get_db),
     if existing_user:
         raise HTTPException(status_code=400, detail="Бұл email бос емес")
 
-    current_user.email = data.new_email
+    user = db.query(User).filter(User.id == current_user.id).first()
+    user.email = data.new_email
     db.delete(otp)
     db.commit()
+    AuthService.invalidate_principal(user.id)
     return {"message": "Email сәтті өзгертілді"}
 
 @router.post("/forgot-password")
@@ -443,6 +479,7 @@ def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Код қате немесе мерзімі өткен")
 
     user.hashed_password = AuthService.get_password_hash(data.new_password)
+    AuthService.revoke_tokens(user)
     db.delete(otp)
     db.commit()
     
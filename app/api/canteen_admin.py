@@ -10,6 +10,7 @@ from app.schemas.food_dto import FoodResponse, CreateFoodRequest, UpdateFoodRequ
 from app.models.user import User, UserRole
 from app.models.order import Order
 from app.service.auth_service import AuthService
+from app.service.revenue_service import RevenueService
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -193,14 +194,22 @@ def get_branch_cashiers(db: Session = Depends(get_db), current_user: User = Depe
 @router.get("/stats/orders")
 def get_order_stats(db: Session = Depends(get_db), current_user: User = Depends(get_canteen_admin_user)):
     """Заказ статистикасы"""
-    today = datetime.utcnow().date()
+    if not current_user.branch_id:
+        raise HTTPException(status_code=400, detail="Сізге филиал тағайындалмаған")
+
+    # [бүгін 00:00, ертең 00:00) — created_at бағанын функцияға орамай, индекспен
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     today_orders = db.query(Order).filter(
-        Order.created_at >= today,
-        Order.created_at < today + timedelta(days=1)
+        Order.branch_id == current_user.branch_id,
+        Order.created_at >= today_start,
+        Order.created_at < today_start + timedelta(days=1)
     ).all()
 
     total_today = len(today_orders)
-    revenue_today = 0.0
+    today = today_start.date()
+    revenue_today = RevenueService.totals(db, [current_user.branch_id], start=today, end=today).get(
+        current_user.branch_id, {}
+    ).get("final_amount", 0.0)
 
     return {
         "today_orders": total_today,
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from app.database.connection import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.database.connection import get_db, get_async_db
 from app.configuration.security.dependencies import get_cashier_user
 from app.service.order_service import OrderService
+from app.service.order_board import order_board, order_snapshot
 from app.models.user import User
 from app.models.order import Order, OrderStatus
 from app.configuration.websocket.websocket_server import websocket_manager
@@ -11,7 +13,7 @@ from typing import List
 
 router = APIRouter()
 
-async def broadcast_status(order: Order):
+async def broadcast_status(order: Order, snapshot: bool = False):
     """WebSocket арқылы заказ статусын барлығына хабарлау"""
     await websocket_manager.broadcast_order_update({
         "id": order.id,
@@ -19,42 +21,48 @@ async def broadcast_status(order: Order):
         "is_paid": order.is_paid,
         "branch_id": order.branch_id,
         "user_id": order.user_id
-    })
+    }, order=order_snapshot(order) if snapshot else None)
 
-@router.post("/orders/{id}/cooking", response_model=OrderResponse)
-async def cooking(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
-    order = db.get(Order, id)
+async def get_branch_order(db: AsyncSession, order_id: int, current_user: User) -> Order:
+    """Кассир филиалына тиесілі заказды items және branch-пен бірге алу"""
+    order = await db.get(
+        Order, order_id,
+        options=[selectinload(Order.items), joinedload(Order.branch)]
+    )
     if not order or (current_user.branch_id is not None and order.branch_id != current_user.branch_id):
         raise HTTPException(status_code=404, detail="Заказ табылмады")
+    return order
+
+@router.post("/orders/{id}/cooking", response_model=OrderResponse)
+async def cooking(id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_cashier_user)):
+    order = await get_branch_order(db, id, current_user)
     order.status = OrderStatus.COOKING
-    db.commit()
-    await broadcast_status(order)
+    await db.commit()
+    await broadcast_status(order, snapshot=True)
     return order
 
 @router.post("/orders/{id}/ready", response_model=OrderResponse)
-async def ready(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
-    order = db.get(Order, id)
-    if not order or (current_user.branch_id is not None and order.branch_id != current_user.branch_id):
-        raise HTTPException(status_code=404, detail="Заказ табылмады")
+async def ready(id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_cashier_user)):
+    order = await get_branch_order(db, id, current_user)
     order.status = OrderStatus.READY
-    db.commit()
-    await broadcast_status(order)
+    await db.commit()
+    await broadcast_status(order, snapshot=True)
     return order
 
 @router.post("/orders/{id}/given", response_model=OrderResponse)
-async def given(id: int, db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
-    order = db.get(Order, id)
-    if not order or (current_user.branch_id is not None and order.branch_id != current_user.branch_id):
-        raise HTTPException(status_code=404, detail="Заказ табылмады")
+async def given(id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_cashier_user)):
+    order = await get_branch_order(db, id, current_user)
     order.status = OrderStatus.GIVEN
-    db.commit()
-    await broadcast_status(order)
+    await db.commit()
+    await broadcast_status(order, snapshot=True)
     return order
 
 
 @router.get("/orders/active", response_model=List[OrderResponse])
 def get_active_orders(db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
     """Барлық белсенді заказдар"""
+    if order_board.ready:
+        return order_board.orders(current_user.branch_id, paid_only=True)
     query = db.query(Order).options(joinedload(Order.branch), joinedload(Order.items)).filter(
         Order.status.in_([OrderStatus.PENDING, OrderStatus.ACCEPTED, OrderStatus.COOKING, OrderStatus.READY]),
         Order.is_paid == True
@@ -76,6 +84,8 @@ def get_order_history(db: Session = Depends(get_db), current_user: User = Depend
 @router.get("/orders/pending", response_model=List[OrderResponse])
 def get_pending_orders(db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
     """Күтіп тұрған заказдар"""
+    if order_board.ready:
+        return order_board.orders(current_user.branch_id, [OrderStatus.PENDING], paid_only=True)
     query = db.query(Order).options(joinedload(Order.branch), joinedload(Order.items)).filter(
         Order.status == OrderStatus.PENDING,
         Order.is_paid == True
@@ -87,6 +97,8 @@ def get_pending_orders(db: Session = Depends(get_db), current_user: User = Depen
 @router.get("/orders/accepted", response_model=List[OrderResponse])
 def get_accepted_orders(db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
     """Қабылданған заказдар"""
+    if order_board.ready:
+        return order_board.orders(current_user.branch_id, [OrderStatus.ACCEPTED], paid_only=True)
     query = db.query(Order).options(joinedload(Order.branch), joinedload(Order.items)).filter(
         Order.status == OrderStatus.ACCEPTED,
         Order.is_paid == True
@@ -96,9 +108,9 @@ def get_accepted_orders(db: Session = Depends(get_db), current_user: User = Depe
     return query.all()
 
 @router.post("/orders/verify-qr/{qr_code}")
-async def verify_qr(qr_code: str, db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
+async def verify_qr(qr_code: str, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_cashier_user)):
     """QR кодты тексеру"""
-    order = OrderService.verify_qr_code(db, qr_code)
+    order = await db.run_sync(OrderService.verify_qr_code, qr_code, current_user.branch_id)
     await broadcast_status(order)
     return {
         "valid": True,
@@ -107,11 +119,11 @@ async def verify_qr(qr_code: str, db: Session = Depends(get_db), current_user: U
     }
 
 @router.post("/orders/{order_id}/accept")
-async def accept_order(order_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
+async def accept_order(order_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_cashier_user)):
     """Заказды қабылдау"""
     try:
         print(f"Accepting order {order_id} by cashier {current_user.id}")
-        order = OrderService.accept_order(db, order_id)
+        order = await db.run_sync(OrderService.accept_order, order_id)
         await broadcast_status(order)
         return {
             "message": "Заказ қабылданды",
@@ -124,9 +136,9 @@ async def accept_order(order_id: int, db: Session = Depends(get_db), current_use
         raise HTTPException(status_code=400, detail=f"Заказды қабылдау қатесі: {str(e)}")
 
 @router.post("/orders/{order_id}/complete")
-async def complete_order(order_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_cashier_user)):
+async def complete_order(order_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_cashier_user)):
     """Заказды аяқтау"""
-    order = OrderService.complete_order(db, order_id)
+    order = await db.run_sync(OrderService.complete_order, order_id)
     await broadcast_status(order)
     return {
         "message": "Заказ дайын",
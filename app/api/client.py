@@ -1,19 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import ValidationError
 
 from app.models import Restaurant
-from app.database.connection import get_db
+from app.database.connection import get_db, get_async_db
 from app.configuration.security.dependencies import get_client_user
 from app.service.order_service import OrderService
 from app.service.subscription_service import SubscriptionService
 from app.service.food_service import FoodService
+from app.service.order_board import order_snapshot
 from app.schemas.order_dto import CreateOrderRequest, OrderResponse
 from app.schemas.subscription_dto import SubscriptionResponse, UserSubscriptionResponse, PurchaseSubscriptionRequest
 from app.schemas.food_dto import FoodResponse
 from fastapi import File, UploadFile, Form
-from app.utils.s3_upload import upload_file_to_s3
+from app.utils.s3_upload import upload_file_to_s3, upload_file_to_s3_async
 from app.models.user import User
 from app.models.branch import Branch
 from app.configuration.websocket.websocket_server import websocket_manager
@@ -158,7 +160,7 @@ def get_foods(branch_id: int, db: Session = Depends(get_db), current_user: User
         allowed_sub_food_ids = [s[0] for s in subs]
 
     # Base query for foods available at this branch
-    query = db.query(Food).join(
+    query = db.query(Food).options(selectinload(Food.images)).join(
         BranchMenu, BranchMenu.food_id == Food.id
     ).filter(
         BranchMenu.branch_id == branch_id,
@@ -180,7 +182,7 @@ def get_foods(branch_id: int, db: Session = Depends(get_db), current_user: User
             "description": f.description,
             "calories": f.calories,
             "ingredients": f.ingredients,
-            "image_url": f.image_url or (f.images[0].url if f.images and len(f.images) > 0 else None),
+            **FoodService.image_fields(f),
             "menu_type": f.menu_type.value if hasattr(f.menu_type, 'value') else f.menu_type,
             "can_order_sub": can_order_sub and (f.id in allowed_sub_food_ids),
             "sub_limit_reason": sub_limit_reason if (f.id in allowed_sub_food_ids) else "NOT_IN_MENU",
@@ -233,14 +235,14 @@ def cancel_my_subscription(db: Session = Depends(get_db), current_user: User = D
 @router.post("/orders", status_code=201)
 async def create_order(
     request: CreateOrderRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_client_user)
 ):
     """Жаңа заказ жасау"""
     try:
         print(f"Received order request: {request}")
-        order = OrderService.create_order(
-            db, current_user.id, request.branch_id, request.items
+        order = await db.run_sync(
+            OrderService.create_order, current_user.id, request.branch_id, request.items
         )
         
         # Кассирге және кезекке хабарлама жіберу (төленген-төленбегеніне қарамастан)
@@ -252,8 +254,8 @@ async def create_order(
             "created_at": order.created_at.isoformat() if hasattr(order.created_at, 'isoformat') else str(order.created_at),
             "is_paid": order.is_paid,
             "user_name": current_user.full_name,
-            "items": [{"food_name": i.food.name, "quantity": i.quantity} for i in order.items]
-        })
+            "items": [{"food_name": i.food_name, "quantity": i.quantity} for i in order.items]
+        }, order=order_snapshot(order))
         
         return order
     except ValidationError as e:
@@ -285,24 +287,23 @@ def get_order_by_id(order_id: int, db: Session = Depends(get_db), current_user:
 async def pay_order(
     order_id: int, 
     receipt: UploadFile = File(...),
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_db), 
     current_user: User = Depends(get_client_user)
 ):
     """Заказ үшін төлем жасау (Kaspi чек жүктеу)"""
     from app.models.order import Order
-    order = db.get(Order, order_id)
+    order = await db.get(Order, order_id, options=[selectinload(Order.items), joinedload(Order.branch)])
     if not order:
         raise HTTPException(status_code=404, detail="Заказ табылмады")
         
     if receipt:
         if not receipt.content_type.startswith("image/") and receipt.content_type != "application/pdf":
             raise HTTPException(status_code=400, detail="Тек сурет немесе PDF жүктеңіз")
-        receipt_url = upload_file_to_s3(receipt, receipt.content_type, folder="receipts")
+        receipt_url = await upload_file_to_s3_async(receipt, receipt.content_type, folder="receipts")
         order.receipt_url = receipt_url
         
     order.is_paid = True
-    db.commit()
-    db.refresh(order)
+    await db.commit()
     
     # Кассирге статус жаңарғанын хабарлау (төленді)
     from app.configuration.websocket.websocket_server import websocket_manager
@@ -313,7 +314,7 @@ async def pay_order(
         "is_paid": order.is_paid,
         "branch_id": order.branch_id,
         "user_id": order.user_id
-    })
+    }, order=order_snapshot(order))
     # 2. Жаңа тапсырыс ретінде қосу (өйткені бұған дейін кассирде көрінбеді)
     await websocket_manager.broadcast_new_order({
         "id": order.id,
@@ -321,7 +322,7 @@ async def pay_order(
         "branch_id": order.branch_id,
         "created_at": order.created_at.isoformat() if hasattr(order.created_at, 'isoformat') else str(order.created_at),
         "is_paid": order.is_paid,
-        "items": [{"food_name": i.food.name, "quantity": i.quantity} for i in order.items]
+        "items": [{"food_name": i.food_name, "quantity": i.quantity} for i in order.items]
     })
     
     return order
@@ -347,9 +348,9 @@ async def broadcast_status(order):
     })
 
 @router.post("/orders/verify-qr/{qr_code}")
-async def client_verify_qr(qr_code: str, db: Session = Depends(get_db), current_user: User = Depends(get_client_user)):
+async def client_verify_qr(qr_code: str, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_client_user)):
     """Клиент QR кодты тексеру және қабылдау"""
-    order = OrderService.client_verify_qr_code(db, qr_code, current_user.id)
+    order = await db.run_sync(OrderService.client_verify_qr_code, qr_code, current_user.id)
     await broadcast_status(order)
     return {
         "message": "Заказ қабылданды",
@@ -357,9 +358,9 @@ async def client_verify_qr(qr_code: str, db: Session = Depends(get_db), current_
     }
 
 @router.post("/orders/scan/{qr_code}")
-async def scan_order_qr(qr_code: str, db: Session = Depends(get_db), current_user: User = Depends(get_client_user)):
+async def scan_order_qr(qr_code: str, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_client_user)):
     """Клиент QR код сканерлеу арқылы заказды алу"""
-    result = OrderService.scan_order_by_qr(db, qr_code, current_user.id)
+    result = await db.run_sync(OrderService.scan_order_by_qr, qr_code, current_user.id)
     if "order" in result:
         await broadcast_status(result["order"])
     return result
@@ -433,7 +434,7 @@ def get_today_menu(db: Session = Depends(get_db), current_user: User = Depends(g
                 "id": food.id,
                 "name": food.name,
                 "description": food.description,
-                "image_url": food.image_url or (food.images[0].url if food.images and len(food.images) > 0 else None),
+                **FoodService.image_fields(food),
                 "menu_type": m_type,
                 "branch_id": bm.branch_id,
                 "branch_name": branch.name if branch else None,
@@ -5,7 +5,7 @@ from app.models.FoodImage import FoodImage
 from app.models.food import Food, MenuType
 from app.models.user import User
 from app.configuration.security.dependencies import get_canteen_admin_user, get_owner_user
-from app.utils.s3_upload import upload_file_to_s3
+from app.utils.s3_upload import upload_images_with_variants
 
 router = APIRouter()
 
@@ -39,20 +39,20 @@ def create_food(
         owner_id=current_user.id
     )
 
-    db.add(new_food)
-    db.commit()
-    db.refresh(new_food)
-
-    # 📌 Upload images → S3 → DB
     for image in images:
         if not image.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Тек сурет жіберіңіз")
 
-        image_url = upload_file_to_s3(image, image.content_type)
+    db.add(new_food)
+    db.commit()
+    db.refresh(new_food)
 
+    # 📌 Upload images + variants → S3 (параллель) → DB
+    for image_url, variants in upload_images_with_variants(images):
         food_image = (
             FoodImage(
             image_url=image_url,
+            variants=variants,
             food_id=new_food.id
         ))
 
@@ -90,9 +90,8 @@ def add_food_images(
         if not image.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="Тек сурет жіберіңіз")
 
-        image_url = upload_file_to_s3(image, image.content_type)
-
-        db.add(FoodImage(image_url=image_url, food_id=food.id))
+    for image_url, variants in upload_images_with_variants(images):
+        db.add(FoodImage(image_url=image_url, variants=variants, food_id=food.id))
 
     db.commit()
 
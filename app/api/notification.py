@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from app.database.connection import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.connection import get_async_db
 from app.configuration.security.dependencies import get_current_user
 from app.models.user import User
 from app.models.notification import NotificationStatus, Notification
@@ -16,7 +17,7 @@ async def get_notifications(
     limit: int = Query(20, ge=1, le=100),
     status: str = Query(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Пайдаланушының уведомлениелерін алу"""
     status_enum = None
@@ -29,7 +30,7 @@ async def get_notifications(
                 detail=f"Жарамсыз статус: {status}"
             )
     
-    notifications = NotificationService.get_user_notifications(
+    notifications = await NotificationService.get_user_notifications(
         db=db,
         user_id=current_user.id,
         skip=skip,
@@ -37,7 +38,7 @@ async def get_notifications(
         status=status_enum
     )
     
-    unread_count = NotificationService.get_unread_count(db, current_user.id)
+    unread_count = await NotificationService.get_unread_count(db, current_user.id)
     
     return NotificationListResponse(
         items=[
@@ -61,10 +62,10 @@ async def get_notifications(
 @router.get("/unread-count")
 async def get_unread_count(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Оқылмаған уведомлениелердің саны"""
-    count = NotificationService.get_unread_count(db, current_user.id)
+    count = await NotificationService.get_unread_count(db, current_user.id)
     return {"unread_count": count}
 
 
@@ -72,13 +73,10 @@ async def get_unread_count(
 async def mark_notification_as_read(
     notification_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Бір уведомлениелерді оқығанды белгілеу"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    notification = await NotificationService.get_user_notification(db, notification_id, current_user.id)
     
     if not notification:
         raise HTTPException(
@@ -86,7 +84,7 @@ async def mark_notification_as_read(
             detail="Уведомлениелер табылмады"
         )
     
-    result = NotificationService.mark_as_read(db, notification_id)
+    result = await NotificationService.mark_as_read(db, notification_id)
     return {
         "id": result.id,
         "status": result.status.value,
@@ -97,10 +95,10 @@ async def mark_notification_as_read(
 @router.put("/read-all")
 async def mark_all_as_read(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Барлық уведомлениелерді оқығанды белгілеу"""
-    count = NotificationService.mark_all_as_read(db, current_user.id)
+    count = await NotificationService.mark_all_as_read(db, current_user.id)
     return {"marked_as_read": count}
 
 
@@ -108,13 +106,10 @@ async def mark_all_as_read(
 async def delete_notification(
     notification_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Уведомлениелерді өндіктеу"""
-    notification = db.query(Notification).filter(
-        Notification.id == notification_id,
-        Notification.user_id == current_user.id
-    ).first()
+    notification = await NotificationService.get_user_notification(db, notification_id, current_user.id)
     
     if not notification:
         raise HTTPException(
@@ -122,33 +117,35 @@ async def delete_notification(
             detail="Уведомлениелер табылмады"
         )
     
-    success = NotificationService.delete_notification(db, notification_id)
+    success = await NotificationService.delete_notification(db, notification_id)
     return {"deleted": success}
 
 
 @router.post("/clear-old")
 async def clear_old_notifications(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Ескі уведомлениелерді өндіктеу"""
-    count = NotificationService.clear_old_notifications(db, current_user.id)
+    count = await NotificationService.clear_old_notifications(db, current_user.id)
     return {"cleared": count}
 
 
 @router.get("/branch/pending")
 async def get_branch_notifications(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Филиал үшін ұстанған уведомлениелер (кассирлер үшін)"""
     # Find branch where current user is cashier
     from app.models.branch import Branch
     
-    branch = db.query(Branch).filter(
-        Branch.id == current_user.branch_id,
-        Branch.is_active == True
-    ).first()
+    branch = await db.scalar(
+        select(Branch).where(
+            Branch.id == current_user.branch_id,
+            Branch.is_active == True
+        )
+    )
     
     if not branch:
         raise HTTPException(
@@ -157,11 +154,13 @@ async def get_branch_notifications(
         )
     
     # Get all unread notifications for this branch
-    notifications = db.query(Notification).filter(
-        Notification.branch_id == branch.id,
-        Notification.status == NotificationStatus.UNREAD,
-        Notification.user_id == None  # Broadcast notifications
-    ).order_by(Notification.created_at.desc()).all()
+    notifications = (await db.scalars(
+        select(Notification).where(
+            Notification.branch_id == branch.id,
+            Notification.status == NotificationStatus.UNREAD,
+            Notification.user_id == None  # Broadcast notifications
+        ).order_by(Notification.created_at.desc())
+    )).all()
     
     return {
         "items": [
@@ -1,6 +1,7 @@
 from datetime import time, datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
@@ -13,6 +14,9 @@ from app.configuration.security.dependencies import get_owner_user, get_current_
 from app.models.user import User, UserRole
 from app.service.restaurant_service import RestaurantService
 from app.service.auth_service import AuthService
+from app.service.subscription_usage_service import SubscriptionUsageService
+from app.service.stats_export_service import StatsExportService, CSV_HEADER, parquet_available
+from app.service.revenue_service import RevenueService
 from app.schemas.restaurant_dto import RestaurantCreate, RestaurantUpdate, AdminAssign
 from app.models.food import Food, MenuType
 
@@ -131,6 +135,7 @@ def delete_admin(
 
     db.delete(admin)
     db.commit()
+    AuthService.invalidate_principal(admin_id)
     return {"message": "Admin өшірілді"}
 
 
@@ -722,27 +727,14 @@ def get_subscription_overview(
 
     active_subscriptions = db.query(Subscription).filter(Subscription.is_active == True).count()
 
+    # Күндік жиынтықтан (subscription_usage_daily), orders кестесін сканерлемей
     today = datetime.utcnow().date()
-    today_usage = (
-        db.query(func.count(func.distinct(Order.id)))
-        .filter(
-            Order.branch_id.in_(branch_ids),
-            Order.paid_by_subscription == True,
-            Order.subscription_id.isnot(None),
-            func.date(Order.created_at) == today,
-        )
-        .scalar()
-    ) or 0
-
-    total_subscription_orders = (
-        db.query(func.count(func.distinct(Order.id)))
-        .filter(
-            Order.branch_id.in_(branch_ids),
-            Order.paid_by_subscription == True,
-            Order.subscription_id.isnot(None),
-        )
-        .scalar()
-    ) or 0
+    today_usage = SubscriptionUsageService.totals(
+        db, [], branch_ids, start=today, end=today, customers=False
+    ).get((), {}).get("orders", 0)
+    total_subscription_orders = SubscriptionUsageService.totals(
+        db, [], branch_ids, customers=False
+    ).get((), {}).get("orders", 0)
 
     return {
         "active_subscriptions": active_subscriptions,
@@ -767,31 +759,15 @@ def get_daily_subscription_stats(
     end_date = datetime.utcnow().date()
     start_date = end_date - timedelta(days=days)
 
-    daily_stats = (
-        db.query(
-            func.date(Order.created_at).label("date"),
-            func.count(func.distinct(Order.id)).label("total_orders"),
-            func.count(func.distinct(Order.user_id)).label("total_customers"),
-        )
-        .filter(
-            Order.branch_id.in_(branch_ids),
-            Order.paid_by_subscription == True,
-            Order.subscription_id.isnot(None),
-            func.date(Order.created_at) >= start_date,
-            func.date(Order.created_at) <= end_date,
-        )
-        .group_by(func.date(Order.created_at))
-        .order_by(func.date(Order.created_at).desc())
-        .all()
-    )
+    daily_stats = SubscriptionUsageService.totals(db, ["day"], branch_ids, start=start_date, end=end_date)
 
     return [
         {
-            "date": stat.date.isoformat(),
-            "total_orders": stat.total_orders,
-            "total_customers": stat.total_customers
+            "date": day.isoformat(),
+            "total_orders": stat["orders"],
+            "total_customers": stat["customers"]
         }
-        for stat in daily_stats
+        for (day,), stat in sorted(daily_stats.items(), reverse=True)
     ]
 
 
@@ -805,45 +781,18 @@ def get_subscription_stats_by_branch(
     if current_user.role not in [UserRole.OWNER, UserRole.ADMIN]:
         raise HTTPException(403, "Тек Owner немесе Admin қол жеткізе алады")
     branch_ids = _get_owner_branch_ids(db, current_user, restaurant_id)
-    branches = db.query(Branch).filter(Branch.id.in_(branch_ids)).all()
-
-    result = []
-    for branch in branches:
-        orders = (
-            db.query(Order)
-            .filter(
-                Order.branch_id == branch.id,
-                Order.paid_by_subscription == True,
-                Order.subscription_id.isnot(None),
-            )
-            .all()
-        )
-
-        top_subscription = (
-            db.query(
-                Subscription.name,
-                func.count(func.distinct(Order.id)).label("count"),
-            )
-            .join(Order, Order.subscription_id == Subscription.id)
-            .filter(
-                Order.branch_id == branch.id,
-                Order.paid_by_subscription == True,
-            )
-            .group_by(Subscription.name)
-            .order_by(func.count(func.distinct(Order.id)).desc())
-            .first()
-        )
-
-        result.append({
-            "branch_id": branch.id,
-            "branch_name": branch.name,
-            "total_orders": len(orders),
-            "total_customers": len(set(o.user_id for o in orders)),
-            "top_subscription": top_subscription[0] if top_subscription else None,
-            "top_subscription_count": top_subscription[1] if top_subscription else 0
-        })
-
-    return result
+    # Барлық филиал бір сұраныспен (филиал санына қарай сұраныс көбеймейді)
+    return [
+        {
+            "branch_id": row.branch_id,
+            "branch_name": row.branch_name,
+            "total_orders": int(row.total_orders),
+            "total_customers": row.total_customers,
+            "top_subscription": row.top_subscription,
+            "top_subscription_count": int(row.top_subscription_count)
+        }
+        for row in SubscriptionUsageService.branch_summary(db, branch_ids)
+    ]
 
 
 @router.get("/stats/subscription/by-subscription")
@@ -857,43 +806,23 @@ def get_subscription_stats_by_type(
         raise HTTPException(403, "Тек Owner немесе Admin қол жеткізе алады")
     branch_ids = _get_owner_branch_ids(db, current_user, restaurant_id)
 
-    stats = (
-        db.query(
-            Subscription.id,
-            Subscription.name,
-            Subscription.price,
-            Subscription.duration_days,
-            Subscription.meal_limit,
-            func.count(func.distinct(Order.id)).label("total_orders"),
-            func.count(func.distinct(Order.user_id)).label("total_users"),
-        )
-        .join(Order, Order.subscription_id == Subscription.id)
-        .filter(
-            Order.branch_id.in_(branch_ids),
-            Order.paid_by_subscription == True,
-        )
-        .group_by(
-            Subscription.id,
-            Subscription.name,
-            Subscription.price,
-            Subscription.duration_days,
-            Subscription.meal_limit,
-        )
-        .order_by(func.count(func.distinct(Order.id)).desc())
-        .all()
-    )
+    totals = SubscriptionUsageService.totals(db, ["subscription_id"], branch_ids)
+    subscriptions = db.query(Subscription).filter(
+        Subscription.id.in_([sub_id for (sub_id,) in totals])
+    ).all()
+    subscriptions.sort(key=lambda sub: totals[(sub.id,)]["orders"], reverse=True)
 
     return [
         {
-            "subscription_id": stat.id,
-            "subscription_name": stat.name,
-            "price": stat.price,
-            "duration_days": stat.duration_days,
-            "meal_limit": stat.meal_limit,
-            "total_orders": stat.total_orders,
-            "total_users": stat.total_users
+            "subscription_id": sub.id,
+            "subscription_name": sub.name,
+            "price": sub.price,
+            "duration_days": sub.duration_days,
+            "meal_limit": sub.meal_limit,
+            "total_orders": totals[(sub.id,)]["orders"],
+            "total_users": totals[(sub.id,)]["customers"]
         }
-        for stat in stats
+        for sub in subscriptions
     ]
 
 
@@ -916,103 +845,133 @@ def get_subscription_stats_custom_range(
         raise HTTPException(403, "Тек Owner немесе Admin қол жеткізе алады")
     branch_ids = _get_owner_branch_ids(db, current_user, request.restaurant_id)
 
-    query = (
-        db.query(
-            Branch.id.label("branch_id"),
-            Branch.name.label("branch_name"),
-            Subscription.id.label("subscription_id"),
-            Subscription.name.label("subscription_name"),
-            func.count(func.distinct(Order.id)).label("total_orders"),
-            func.count(func.distinct(Order.user_id)).label("total_customers"),
-        )
-        .join(Order, Order.branch_id == Branch.id)
-        .join(Subscription, Subscription.id == Order.subscription_id)
-        .filter(
-            Branch.id.in_(branch_ids),
-            Order.paid_by_subscription == True,
-            func.date(Order.created_at) >= request.start_date,
-            func.date(Order.created_at) <= request.end_date,
-        )
-    )
-
     if request.branch_id:
-        query = query.filter(Branch.id == request.branch_id)
-    if request.subscription_id:
-        query = query.filter(Subscription.id == request.subscription_id)
+        branch_ids = [b for b in branch_ids if b == request.branch_id]
 
-    query = query.group_by(
-        Branch.id, Branch.name, Subscription.id, Subscription.name
-    ).order_by(func.count(Order.id).desc())
+    totals = SubscriptionUsageService.totals(
+        db, ["branch_id", "subscription_id"], branch_ids,
+        start=request.start_date, end=request.end_date, subscription_id=request.subscription_id
+    )
+    branch_names = dict(db.query(Branch.id, Branch.name).filter(Branch.id.in_({b for b, _ in totals})).all())
+    subscription_names = dict(
+        db.query(Subscription.id, Subscription.name).filter(Subscription.id.in_({s for _, s in totals})).all()
+    )
 
-    results = query.all()
+    results = sorted(totals.items(), key=lambda item: item[1]["orders"], reverse=True)
 
     return [
         {
-            "branch_id": r.branch_id,
-            "branch_name": r.branch_name,
-            "subscription_id": r.subscription_id,
-            "subscription_name": r.subscription_name,
-            "total_orders": r.total_orders,
-            "total_customers": r.total_customers
+            "branch_id": branch_id,
+            "branch_name": branch_names.get(branch_id),
+            "subscription_id": subscription_id,
+            "subscription_name": subscription_names.get(subscription_id),
+            "total_orders": stat["orders"],
+            "total_customers": stat["customers"]
         }
-        for r in results
+        for (branch_id, subscription_id), stat in results
     ]
 
 
+def _export_range(db: Session, current_user: User, restaurant_id, start_date, end_date):
+    """Экспорт үшін филиалдар мен күн аралығы (әдепкі: соңғы 30 күн)"""
+    if current_user.role not in [UserRole.OWNER, UserRole.ADMIN]:
+        raise HTTPException(403, "Тек Owner немесе Admin қол жеткізе алады")
+
+    branch_ids = _get_owner_branch_ids(db, current_user, restaurant_id)
+
+    if not start_date:
+        start_date = (datetime.utcnow() - timedelta(days=30)).date()
+    if not end_date:
+        end_date = datetime.utcnow().date()
+    return branch_ids, start_date, end_date
+
+
 @router.get("/stats/subscription/export")
 def export_subscription_stats(
     restaurant_id: int | None = None,
-    start_date: str | None = None,
-    end_date: str | None = None,
+    start_date: date_type | None = None,
+    end_date: date_type | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Абонемент статистикасын экспорттау (CSV)"""
-    if current_user.role not in [UserRole.OWNER, UserRole.ADMIN]:
-        raise HTTPException(403, "Тек Owner немесе Admin қол жеткізе алады")
+    """Абонемент статистикасын экспорттау (CSV, JSON ішінде)
+
+    Үлкен аралықтар үшін /stats/subscription/export/stream қолданыңыз.
+    """
     import csv
     from io import StringIO
 
-    branch_ids = _get_owner_branch_ids(db, current_user, restaurant_id)
-
-    if not start_date:
-        start_date = (datetime.utcnow() - timedelta(days=30)).date().isoformat()
-    if not end_date:
-        end_date = datetime.utcnow().date().isoformat()
-
-    stats = (
-        db.query(
-            func.date(Order.created_at).label("date"),
-            Branch.name.label("branch_name"),
-            Subscription.name.label("subscription_name"),
-            User.full_name.label("user_name"),
-        )
-        .join(Branch, Branch.id == Order.branch_id)
-        .join(Subscription, Subscription.id == Order.subscription_id)
-        .join(User, User.id == Order.user_id)
-        .filter(
-            Order.branch_id.in_(branch_ids),
-            Order.paid_by_subscription == True,
-            func.date(Order.created_at) >= start_date,
-            func.date(Order.created_at) <= end_date,
-        )
-        .order_by(Order.created_at.desc())
-        .all()
-    )
+    branch_ids, start_date, end_date = _export_range(db, current_user, restaurant_id, start_date, end_date)
+    stats = db.execute(StatsExportService.export_query(branch_ids, start_date, end_date)).all()
 
     output = StringIO()
     writer = csv.writer(output)
-    writer.writerow(['Күні', 'Филиал', 'Абонемент', 'Клиент'])
-    for stat in stats:
-        writer.writerow([
-            stat.date,
-            stat.branch_name,
-            stat.subscription_name,
-            stat.user_name,
-        ])
+    writer.writerow(CSV_HEADER)
+    writer.writerows(stats)
 
     return {
         "csv_data": output.getvalue(),
-        "filename": f"subscription_stats_{start_date}_{end_date}.csv",
+        "filename": f"subscription_stats_{start_date.isoformat()}_{end_date.isoformat()}.csv",
         "count": len(stats)
     }
+
+
+@router.get("/stats/subscription/export/stream")
+def stream_subscription_stats(
+    restaurant_id: int | None = None,
+    start_date: date_type | None = None,
+    end_date: date_type | None = None,
+    format: str = "csv",
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Абонемент статистикасын файл ретінде ағынмен жүктеу (CSV немесе Parquet)"""
+    if format not in ("csv", "parquet"):
+        raise HTTPException(400, "format: csv немесе parquet")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(501, "Parquet экспорт үшін pyarrow орнатылмаған")
+
+    branch_ids, start_date, end_date = _export_range(db, current_user, restaurant_id, start_date, end_date)
+
+    filename = f"subscription_stats_{start_date.isoformat()}_{end_date.isoformat()}.{format}"
+    if format == "parquet":
+        stream = StatsExportService.parquet_stream(branch_ids, start_date, end_date)
+        media_type = "application/vnd.apache.parquet"
+    else:
+        stream = StatsExportService.csv_stream(branch_ids, start_date, end_date)
+        media_type = "text/csv"
+
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/stats/revenue")
+def get_revenue_stats(
+    restaurant_id: int | None = None,
+    start_date: date_type | None = None,
+    end_date: date_type | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Филиалдар бойынша түсім (branch_revenue, әр заказ бір рет)"""
+    if current_user.role not in [UserRole.OWNER, UserRole.ADMIN]:
+        raise HTTPException(403, "Тек Owner немесе Admin қол жеткізе алады")
+    branch_ids = _get_owner_branch_ids(db, current_user, restaurant_id)
+
+    totals = RevenueService.totals(db, branch_ids, start=start_date, end=end_date)
+    branch_names = dict(db.query(Branch.id, Branch.name).filter(Branch.id.in_(list(totals))).all())
+
+    branches = [
+        {"branch_id": branch_id, "branch_name": branch_names.get(branch_id), **stat}
+        for branch_id, stat in sorted(totals.items(), key=lambda item: item[1]["final_amount"], reverse=True)
+    ]
+    return {
+        "total_orders": sum(stat["orders"] for stat in totals.values()),
+        "total_amount": sum(stat["amount"] for stat in totals.values()),
+        "total_discount_amount": sum(stat["discount_amount"] for stat in totals.values()),
+        "total_final_amount": sum(stat["final_amount"] for stat in totals.values()),
+        "branches": branches,
+    }
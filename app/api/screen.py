@@ -1,23 +1,34 @@
+from typing import List
+
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from app.database.connection import get_db
 from app.configuration.security.dependencies import get_current_user
 from app.models.order import Order, OrderStatus
+from app.schemas.order_dto import OrderResponse
+from app.service.order_board import order_board
 
 router = APIRouter()
 
-@router.get("/screen/orders")
+@router.get("/screen/orders", response_model=List[OrderResponse])
 def screen_orders(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    orders = db.query(Order).filter(
+    if order_board.ready:
+        return order_board.orders(
+            current_user.branch_id,
+            [OrderStatus.ACCEPTED, OrderStatus.COOKING, OrderStatus.READY]
+        )
+
+    # Тақта дайын болмаса да жауап пішіні бірдей (items, branch_name)
+    orders = db.query(Order).options(joinedload(Order.branch), joinedload(Order.items)).filter(
         Order.branch_id == current_user.branch_id,
         Order.status.in_([
             OrderStatus.ACCEPTED,
             OrderStatus.COOKING,
             OrderStatus.READY
         ])
-    ).all()
+    ).order_by(Order.created_at, Order.id).all()
 
     return orders
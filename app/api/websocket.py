@@ -1,8 +1,11 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database.connection import get_db
+from sqlalchemy import select
+from app.database.connection import AsyncSessionLocal
 from app.models.user import User
 from app.configuration.websocket.websocket_server import websocket_manager
+from app.service.subscription_usage_service import SubscriptionUsageService
+from config import settings
+from datetime import datetime, timedelta, timezone
 import json
 import logging
 
@@ -18,11 +21,12 @@ async def websocket_endpoint(
     websocket: WebSocket,
     role: str,
     token: str = None,
-    db: Session = Depends(get_db)
+    capabilities: str = None
 ):
     """
     WebSocket байланысын орнату
     Рөлдер: cashier, admin, canteen_admin, owner, client
+    capabilities: үтірмен бөлінген қосымша хабарлама түрлері (мысалы, orders_update)
     """
     try:
         # Validate role
@@ -46,7 +50,9 @@ async def websocket_endpoint(
                 from app.service.auth_service import AuthService
                 payload = AuthService.decode_token(token)
                 user_id = payload.get("sub")
-                user = db.query(User).filter(User.id == user_id).first()
+                # Байланыс бойы сессия ұстамаймыз — тек тексеру үшін қысқа сессия
+                async with AsyncSessionLocal() as db:
+                    user = await db.get(User, int(user_id))
                 
                 if user:
                     # Verify user role matches requested role
@@ -75,7 +81,10 @@ async def websocket_endpoint(
         if user and hasattr(user, 'branch_id') and user.branch_id:
             branch_id = user.branch_id
         
-        await websocket_manager.connect(websocket, role, branch_id, user.id if user else None)
+        await websocket_manager.connect(
+            websocket, role, branch_id, user.id if user else None,
+            capabilities={c.strip() for c in capabilities.split(",") if c.strip()} if capabilities else None
+        )
         
         # Хабарламаларды тыңдау
         while True:
@@ -84,7 +93,7 @@ async def websocket_endpoint(
                 message = json.loads(data)
                 
                 # Хабарлама түріне қарай өңдеу
-                await handle_websocket_message(websocket, message, user, db)
+                await handle_websocket_message(websocket, message, user)
                 
             except WebSocketDisconnect:
                 break
@@ -99,7 +108,7 @@ async def websocket_endpoint(
     finally:
         websocket_manager.disconnect(websocket)
 
-async def handle_websocket_message(websocket: WebSocket, message: dict, user: User, db: Session):
+async def handle_websocket_message(websocket: WebSocket, message: dict, user: User):
     """WebSocket хабарламаларын өңдеу"""
     
     # Validate message structure
@@ -156,12 +165,18 @@ async def handle_websocket_message(websocket: WebSocket, message: dict, user: Us
             try:
                 # Заказ статусін жаңарту логикасы
                 from app.models.order import Order
-                order = db.query(Order).filter(Order.id == order_id).first()
+                async with AsyncSessionLocal() as db:
+                    order = await db.get(Order, order_id)
+                    if order:
+                        old_status = order.status
+                        order.status = new_status
+                        # cancelled-ке өтсе/шықса, owner статистикасының жиынтығын түзету
+                        usage = SubscriptionUsageService.status_change_stmt(order, old_status)
+                        if usage is not None:
+                            await db.execute(usage)
+                        await db.commit()
                 
                 if order:
-                    order.status = new_status
-                    db.commit()
-                    
                     # Барлық байланыстарға хабарлама жіберу
                     await websocket_manager.broadcast_order_update({
                         "id": order.id,
@@ -182,10 +197,6 @@ async def handle_websocket_message(websocket: WebSocket, message: dict, user: Us
     elif message_type == "get_active_orders":
         # Белсенді заказдарды алу
         try:
-            from app.models.order import Order
-            from app.models.user import User
-            from sqlalchemy import and_
-            
             # Message data-дан branch_id алу мүмкіндігі
             msg_data = message.get("data", {})
             branch_id = msg_data.get("branch_id")
@@ -193,48 +204,177 @@ async def handle_websocket_message(websocket: WebSocket, message: dict, user: Us
             # Егер хабарламада жоқ болса, пайдаланушы профилінен алу
             if not branch_id and user and hasattr(user, 'branch_id') and user.branch_id:
                 branch_id = user.branch_id
+
+            # Қайта қосылған клиент соңғы көрген updated_at-ты жібере алады
+            since = msg_data.get("since")
+            scope_user_id = None
+            if since:
+                try:
+                    since = parse_since(since)
+                except ValueError:
+                    await websocket_manager.send_personal_message({
+                        "type": "error",
+                        "message": "since must be an ISO datetime"
+                    }, websocket)
+                    return
+                # since статус сүзгісін алып тастайды: сондықтан ауқым міндетті
+                scope = since_scope(user, branch_id)
+                if scope is None:
+                    await websocket_manager.send_personal_message({
+                        "type": "error",
+                        "message": "branch_id is required with since"
+                    }, websocket)
+                    return
+                branch_id, scope_user_id = scope
             
             # Динамикалық филиалға тіркеу (Клиент үшін маңызды)
             if branch_id:
                 await websocket_manager.set_branch(websocket, branch_id)
             
-            # Белсенді заказдарды алу (күтілуде, қабылданды, дайындалуда, дайын)
-            query = db.query(Order).filter(
-                Order.status.in_(["pending", "accepted", "cooking", "ready"])
-            )
-            
-            if branch_id:
-                query = query.filter(Order.branch_id == branch_id)
-            
-            # Уақыты бойынша сұрыптау (ең ескісі бірінші - кезек реті бойынша)
-            orders = query.order_by(Order.created_at.asc()).all()
-            
-            orders_data = []
-            for order in orders:
-                # Пайдаланушы атын алу (опционалды)
-                user_obj = db.query(User).filter(User.id == order.user_id).first()
-                user_name = user_obj.full_name if user_obj else "Клиент"
-                
-                orders_data.append({
-                    "id": order.id,
-                    "status": order.status,
-                    "branch_id": order.branch_id,
-                    "created_at": order.created_at.isoformat(),
-                    "user_id": order.user_id,
-                    "user_name": user_name
-                })
+            await send_active_orders(websocket, branch_id, since, scope_user_id)
             
+        except Exception as e:
+            logger.error(f"Белсенді заказдарды алу қатесі: {e}")
             await websocket_manager.send_personal_message({
-                "type": "active_orders",
-                "data": orders_data
+                "type": "error",
+                "message": "Белсенді заказдарды алу мүмкін болмады"
             }, websocket)
-            
+
+    elif message_type == "resume":
+        # Қайта қосылған клиент: last_seq-тен кейінгі оқиғалар, болмаса толық snapshot
+        try:
+            msg_data = message.get("data", {})
+            branch_id = msg_data.get("branch_id")
+            if not branch_id and user and hasattr(user, 'branch_id') and user.branch_id:
+                branch_id = user.branch_id
+
+            last_seq = msg_data.get("last_seq")
+            if not branch_id or not isinstance(last_seq, int):
+                await websocket_manager.send_personal_message({
+                    "type": "error",
+                    "message": "branch_id and last_seq are required"
+                }, websocket)
+                return
+
+            await websocket_manager.set_branch(websocket, branch_id)
+
+            events = websocket_manager.events_since(branch_id, last_seq, msg_data.get("epoch"))
+            if events is None:
+                # Айырма тым үлкен немесе seq санауышы қайта басталған
+                await send_active_orders(websocket, branch_id)
+                return
+
+            await websocket_manager.send_personal_message({
+                "type": "order_events",
+                "data": websocket_manager.events_for(websocket, events),
+                "seq": websocket_manager.current_seq(branch_id),
+                "epoch": websocket_manager.epoch
+            }, websocket)
+
         except Exception as e:
-            logger.error(f"Белсенді заказдарды алу қатесі: {e}")
+            logger.error(f"Resume қатесі: {e}")
             await websocket_manager.send_personal_message({
                 "type": "error",
                 "message": "Белсенді заказдарды алу мүмкін болмады"
             }, websocket)
 
+
+def since_scope(user: User, branch_id: int = None):
+    """since-сұраныстың ауқымы (branch_id, user_id); None — ауқым анықталмады
+
+    Клиент тек өз заказдарын, кассир/асхана админі тек өз филиалын алады, admin/owner филиалды көрсетуі керек.
+    """
+    role = user.role.value
+    if role == "client":
+        return branch_id, user.id
+    if role in ("cashier", "canteen_admin"):
+        return (user.branch_id, None) if user.branch_id else None
+    return (branch_id, None) if branch_id else None
+
+
+async def send_active_orders(websocket: WebSocket, branch_id: int = None, since: datetime = None, user_id: int = None):
+    """Белсенді заказдардың толық snapshot-ын (немесе since-тен кейінгі өзгерістерін) жіберу
+
+    user_id тек since-delta-ны сүзеді.
+    """
+    # seq сұраныстан бұрын алынады: snapshot-тан кейінгі оқиғалар одан үлкен seq-пен келеді
+    seq = websocket_manager.current_seq(branch_id) if branch_id else None
+
+    # Курсор тым ескі болса — толық snapshot
+    if since and since < datetime.utcnow() - timedelta(seconds=settings.WS_SINCE_MAX_AGE_SECONDS):
+        since = None
+
+    async with AsyncSessionLocal() as db:
+        orders_data = None
+        if since:
+            orders_data = await fetch_active_orders(
+                db, branch_id, since, user_id=user_id, limit=settings.WS_SINCE_MAX_ORDERS + 1
+            )
+            if len(orders_data) > settings.WS_SINCE_MAX_ORDERS:
+                # Өзгеріс тым көп — толық snapshot арзанырақ
+                since, orders_data = None, None
+        if orders_data is None:
+            # Snapshot since-сіз сұраныспен бірдей ауқымда: клиент тақтаны толығымен ауыстырады
+            orders_data = await fetch_active_orders(db, branch_id)
+    
+    await websocket_manager.send_personal_message({
+        "type": "active_orders",
+        "data": orders_data,
+        "since": since.isoformat() if since else None,
+        # Келесі қайта қосылу үшін курсор
+        "cursor": max((o["updated_at"] for o in orders_data if o["updated_at"]), default=None),
+        "seq": seq,
+        "epoch": websocket_manager.epoch if branch_id else None
+    }, websocket)
+
+
+def parse_since(value: str) -> datetime:
+    """ISO курсорды naive UTC datetime-ға айналдыру (DB-дегідей)"""
+    since = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if since.tzinfo:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return since
+
+
+async def fetch_active_orders(
+    db, branch_id: int = None, since: datetime = None, user_id: int = None, limit: int = None
+) -> list:
+    """Белсенді заказдар клиент атымен бірге, бір сұраныспен"""
+    from app.models.order import Order
+
+    query = (
+        select(Order, User.full_name)
+        .outerjoin(User, User.id == Order.user_id)
+    )
+    if since:
+        # since-тен кейін өзгерген заказдар, соның ішінде аяқталғандары (клиент тақтадан алып тастауы үшін)
+        query = query.where(Order.updated_at > since)
+    else:
+        # Белсенді заказдар (күтілуде, қабылданды, дайындалуда, дайын)
+        query = query.where(Order.status.in_(["pending", "accepted", "cooking", "ready"]))
+    
+    if branch_id:
+        query = query.where(Order.branch_id == branch_id)
+    if user_id:
+        query = query.where(Order.user_id == user_id)
+    if limit:
+        query = query.limit(limit)
+    
+    # Уақыты бойынша сұрыптау (ең ескісі бірінші - кезек реті бойынша)
+    rows = (await db.execute(query.order_by(Order.created_at.asc()))).all()
+    
+    return [
+        {
+            "id": order.id,
+            "status": order.status,
+            "branch_id": order.branch_id,
+            "created_at": order.created_at.isoformat(),
+            "updated_at": order.updated_at.isoformat() if order.updated_at else None,
+            "user_id": order.user_id,
+            "user_name": full_name or "Клиент"
+        }
+        for order, full_name in rows
+    ]
+
 # WebSocket менеджерді экспорттау
 __all__ = ["websocket_manager"]
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.models.user import User
+from config import settings
+
+
+class PrincipalCache:
+    """Аутентификацияланған қолданушының қысқа TTL кэші (user_id, token_version) бойынша"""
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, Dict]]" = OrderedDict()
+        # Sync endpoint-тер threadpool-да орындалады
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_size > 0
+
+    def get(self, user_id: int, token_version: int) -> Optional[User]:
+        """Кэштегі қолданушыны әр сұранысқа жаңа detached User ретінде қайтару"""
+        if not self.enabled:
+            return None
+        key = (user_id, token_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            values = entry[1]
+
+        user = User(**values)
+        # Relationship-ке жүгінсе, үнсіз None емес, DetachedInstanceError береді
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user: User):
+        if not self.enabled:
+            return
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        key = (user.id, user.token_version or 0)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        """Қолданушының барлық кэш жазбаларын өшіру (профиль, пароль, рөл өзгергенде)"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Глобалдық principal кэші (әр worker-дің өз кэші, сондықтан TTL қысқа)
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=settings.AUTH_PRINCIPAL_CACHE_SIZE
+)
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import uuid
+from collections import defaultdict
+from typing import Awaitable, Callable, List, Optional
+
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict], Awaitable[None]]
+
+# Барлық worker-лер тыңдайтын Redis арнасы
+DEFAULT_CHANNEL = "foodlapp:ws-events"
+# Филиал бойынша оқиға seq санауыштары және олардың epoch-ы
+SEQ_KEY_PREFIX = "foodlapp:ws-seq:"
+EPOCH_KEY = "foodlapp:ws-epoch"
+
+
+class RedisBackplane:
+    """Worker-лер арасында WebSocket оқиғаларын Redis pub/sub арқылы тарату"""
+
+    def __init__(
+        self,
+        url: str,
+        channel: str = DEFAULT_CHANNEL,
+        reconnect_delay: float = 1.0,
+        on_reconnect: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.url = url
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        # Қайта жазылғаннан кейін: үзіліс кезіндегі оқиғалар жоғалған, жергілікті күйді қайта құру үшін
+        self.on_reconnect = on_reconnect
+        self.redis = None
+        self.epoch: Optional[str] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, handler: EventHandler):
+        """Арнаға жазылып, келген оқиғаларды handler-ге беру"""
+        self.redis = aioredis.from_url(self.url, encoding="utf8", decode_responses=True)
+        # Redis қолжетімсіз болса, lifespan бірден білуі үшін
+        try:
+            await self.redis.ping()
+        except Exception:
+            await self.redis.close()
+            self.redis = None
+            raise
+        # Барлық worker-лер бір epoch-ты бөліседі
+        await self.redis.set(EPOCH_KEY, uuid.uuid4().hex, nx=True)
+        self.epoch = await self.redis.get(EPOCH_KEY)
+        self._listener = asyncio.create_task(self._listen(handler))
+
+    async def _listen(self, handler: EventHandler):
+        reconnected = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                if reconnected and self.on_reconnect:
+                    reconnected = False
+                    try:
+                        await self.on_reconnect()
+                    except Exception as e:
+                        logger.error(f"Backplane on_reconnect қатесі: {e}")
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        await handler(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.error(f"Backplane оқиғасын өңдеу қатесі: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis үзілсе, қайта жазылу
+                logger.warning(f"Redis pub/sub үзілді, қайта қосылу: {e}")
+                reconnected = True
+                await asyncio.sleep(self.reconnect_delay)
+            finally:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+
+    async def next_seq(self, branch_id: int) -> int:
+        return await self.redis.incr(f"{SEQ_KEY_PREFIX}{branch_id}")
+
+    async def publish(self, event: dict):
+        await self.redis.publish(self.channel, json.dumps(event))
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self.redis:
+            await self.redis.close()
+            self.redis = None
+
+
+class InMemoryBroker:
+    """Бір процесс ішіндегі pub/sub (тесттер мен бір worker үшін)"""
+
+    def __init__(self):
+        self.handlers: List[EventHandler] = []
+        self.epoch = uuid.uuid4().hex
+        self.sequences = defaultdict(int)
+
+    async def publish(self, payload: str):
+        for handler in list(self.handlers):
+            try:
+                await handler(json.loads(payload))
+            except Exception as e:
+                logger.error(f"Backplane оқиғасын өңдеу қатесі: {e}")
+
+
+class InMemoryBackplane:
+    """RedisBackplane-нің жадтағы баламасы, бір broker-ді бөлісетін менеджерлер бір-бірін естиді"""
+
+    def __init__(self, broker: Optional[InMemoryBroker] = None):
+        self.broker = broker or InMemoryBroker()
+        self._handler: Optional[EventHandler] = None
+
+    @property
+    def epoch(self) -> str:
+        return self.broker.epoch
+
+    async def start(self, handler: EventHandler):
+        self._handler = handler
+        self.broker.handlers.append(handler)
+
+    async def next_seq(self, branch_id: int) -> int:
+        self.broker.sequences[branch_id] += 1
+        return self.broker.sequences[branch_id]
+
+    async def publish(self, event: dict):
+        # Redis сияқты JSON арқылы өткізу
+        await self.broker.publish(json.dumps(event))
+
+    async def stop(self):
+        if self._handler in self.broker.handlers:
+            self.broker.handlers.remove(self._handler)
+        self._handler = None
@@ -0,0 +1,71 @@
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BranchEventLog:
+    """Филиал бойынша соңғы order оқиғаларының ring buffer-і (қайта қосылған клиенттерге delta беру үшін)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.events: Dict[int, Deque[Tuple[int, dict]]] = {}
+        # Филиалдағы ең үлкен seq және оның epoch-ы (seq санауышы қайта басталса, epoch өзгереді)
+        self.last_seqs: Dict[int, int] = {}
+        self.epochs: Dict[int, str] = {}
+        # Осы seq-тен бұрынғы тарих толық емес (seq-сіз оқиға өткен)
+        self.floors: Dict[int, int] = {}
+        self._broken: Dict[int, bool] = {}
+
+    def record(self, branch_id: int, seq: int, epoch: str, message: dict):
+        buffer = self.events.setdefault(branch_id, deque(maxlen=self.size))
+        if self.epochs.get(branch_id) != epoch:
+            buffer.clear()
+            self.epochs[branch_id] = epoch
+            self.last_seqs[branch_id] = 0
+            self.floors.pop(branch_id, None)
+
+        if self._broken.pop(branch_id, False):
+            self.floors[branch_id] = seq
+
+        if buffer and seq < buffer[-1][0]:
+            # Бірнеше worker жариялағанда seq ретсіз келуі мүмкін
+            items = sorted([*buffer, (seq, message)], key=lambda e: e[0])
+            buffer.clear()
+            buffer.extend(items)
+        else:
+            buffer.append((seq, message))
+        self.last_seqs[branch_id] = max(self.last_seqs.get(branch_id, 0), seq)
+
+    def invalidate(self, branch_id: int):
+        """seq-сіз оқиға жіберілді: бұрынғы курсорлар бойынша delta беруге болмайды"""
+        self.events.get(branch_id, deque()).clear()
+        self._broken[branch_id] = True
+
+    def current_seq(self, branch_id: int) -> int:
+        return self.last_seqs.get(branch_id, 0)
+
+    def since(self, branch_id: int, last_seq: int, epoch: str) -> Optional[List[dict]]:
+        """last_seq-тен кейінгі оқиғалар; толық snapshot керек болса None"""
+        if epoch is None or epoch != self.epochs.get(branch_id) or self._broken.get(branch_id):
+            return None
+
+        current = self.current_seq(branch_id)
+        if last_seq == current and last_seq >= self.floors.get(branch_id, 0):
+            return []
+        if last_seq > current:
+            return None
+
+        buffer = self.events.get(branch_id)
+        if not buffer:
+            return None
+        floor = max(buffer[0][0] - 1, self.floors.get(branch_id, 0))
+        if last_seq < floor:
+            return None
+
+        missing = [(seq, message) for seq, message in buffer if seq > last_seq]
+        # Арасында жетіспейтін seq болса (әлі келмеген оқиға), snapshot қайтару
+        if [seq for seq, _ in missing] != list(range(last_seq + 1, current + 1)):
+            return None
+        return [message for _, message in missing]
@@ -0,0 +1,168 @@
+import asyncio
+import json
+import logging
+from collections import deque, Counter
+from enum import Enum
+from typing import Callable, Deque, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# seq-і бар хабарлама түсіп қалса, келесі хабарламадан бұрын жіберіледі: клиент snapshot-ты қайта сұрайды
+RESYNC_REQUIRED = json.dumps({"type": "resync_required", "reason": "queue_overflow"})
+
+
+class OverflowPolicy(str, Enum):
+    """Кезек толғанда не істеу керек"""
+    DROP_OLDEST = "drop_oldest"
+    # Бір заказдың ескі order_update-ін жаңасымен ауыстыру, болмаса drop_oldest
+    COALESCE = "coalesce"
+    DISCONNECT = "disconnect"
+
+
+class OutboundMetrics:
+    """Барлық байланыстардың кезек метрикалары (осы worker бойынша)"""
+
+    def __init__(self):
+        self.dropped: Counter = Counter()
+        self.enqueued = 0
+        self.sent = 0
+
+    def snapshot(self, writers) -> dict:
+        depths = [w.depth for w in writers]
+        return {
+            "connections": len(depths),
+            "queued": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": dict(self.dropped),
+        }
+
+
+class ConnectionWriter:
+    """Бір WebSocket-тің шектелген жіберу кезегі және оны босататын writer task"""
+
+    def __init__(
+        self,
+        websocket,
+        maxsize: int,
+        policy: OverflowPolicy,
+        send_timeout: float,
+        on_close: Callable,
+        metrics: OutboundMetrics,
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = OverflowPolicy(policy)
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.metrics = metrics
+        self.queue: Deque[Tuple[Optional[Hashable], str, bool]] = deque()
+        self.closed = False
+        # seq-і бар хабарлама түсірілді: клиент last_seq бойынша үзілісті көре алмайды
+        self.resync_required = False
+        self._has_items = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, text: str, coalesce_key: Hashable = None, sequenced: bool = False) -> bool:
+        """Хабарламаны кезекке қою (күтпейді). False — хабарлама қабылданбады
+
+        sequenced — хабарламада seq бар: ол түсірілсе немесе ауыстырылса, клиентке resync_required жіберіледі.
+        """
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.maxsize:
+            if self.policy == OverflowPolicy.DISCONNECT:
+                self.metrics.dropped["disconnected"] += 1
+                logger.warning("WebSocket кезегі толды, баяу клиент ажыратылды")
+                self._close()
+                return False
+
+            if self.policy == OverflowPolicy.COALESCE and coalesce_key is not None:
+                for i, (key, _, replaced_sequenced) in enumerate(self.queue):
+                    if key == coalesce_key:
+                        self.queue[i] = (coalesce_key, text, sequenced)
+                        self.metrics.dropped["coalesced"] += 1
+                        self._mark_gap(replaced_sequenced)
+                        return True
+
+            _, _, dropped_sequenced = self.queue.popleft()
+            self.metrics.dropped["dropped_oldest"] += 1
+            self._mark_gap(dropped_sequenced)
+
+        self.queue.append((coalesce_key, text, sequenced))
+        self.metrics.enqueued += 1
+        self._idle.clear()
+        self._has_items.set()
+        return True
+
+    def _mark_gap(self, sequenced: bool):
+        if sequenced and not self.resync_required:
+            self.resync_required = True
+            self.metrics.dropped["resync_required"] += 1
+
+    async def _run(self):
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._idle.set()
+                    self._has_items.clear()
+                    await self._has_items.wait()
+                    continue
+
+                if self.resync_required:
+                    # Үзілістен кейінгі хабарламалардан бұрын
+                    self.resync_required = False
+                    text = RESYNC_REQUIRED
+                else:
+                    _, text, _ = self.queue.popleft()
+                try:
+                    await asyncio.wait_for(self.websocket.send_text(text), timeout=self.send_timeout)
+                    self.metrics.sent += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Хабарлама жіберу қатесі: {e!r}")
+                    self.metrics.dropped["send_failed"] += 1 + len(self.queue)
+                    self._close()
+        finally:
+            self._idle.set()
+
+    def _close(self):
+        """Writer-ді тоқтатып, байланысты менеджерден алып тастау"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self._has_items.set()
+        self.on_close(self.websocket)
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(code=1008)
+        except Exception:
+            pass
+
+    def stop(self):
+        """Менеджер disconnect кезінде шақырылады"""
+        self.closed = True
+        self.queue.clear()
+        self._has_items.set()
+        self._idle.set()
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def join(self):
+        """Кезек босағанша күту"""
+        await self._idle.wait()
@@ -1,14 +1,29 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Set
+import uuid
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
 from websockets.server import WebSocketServer
+from config import settings
+from app.configuration.websocket.outbound import ConnectionWriter, OutboundMetrics, OverflowPolicy
+from app.configuration.websocket.event_log import BranchEventLog
 
 logger = logging.getLogger(__name__)
 
+# Клиент ?capabilities=orders_update жіберсе ғана batch хабарламасын алады
+ORDERS_UPDATE_CAPABILITY = "orders_update"
+
 class WebSocketManager:
-    def __init__(self):
+    def __init__(self, queue_size: int = None, overflow_policy: str = None, send_timeout: float = None, event_buffer_size: int = None):
+        # Әр байланыстың жіберу кезегі: өлшемі, толғандағы саясат және бір сокетке берілетін уақыт
+        self.queue_size = queue_size or settings.WS_SEND_QUEUE_SIZE
+        self.overflow_policy = OverflowPolicy(overflow_policy or settings.WS_OVERFLOW_POLICY)
+        self.send_timeout = send_timeout or settings.WS_SEND_TIMEOUT_SECONDS
+        # WebSocket-тің ID-сіне байланысты writer-лер
+        self.writers: Dict[int, ConnectionWriter] = {}
+        self.metrics = OutboundMetrics()
         # Рөлге байланысты активті WebSocket байланыстар
         self.active_connections: Dict[str, Set[WebSocket]] = {
             "cashier": set(),
@@ -27,6 +42,90 @@ class WebSocketManager:
         self.connection_branches: Dict[str, int] = {}
         # WebSocket-тің ID-сіне байланысты пайдаланушылар
         self.connection_users: Dict[str, int] = {}
+        # WebSocket-тің ID-сіне байланысты клиент қолдайтын хабарлама түрлері
+        self.connection_capabilities: Dict[int, Set[str]] = {}
+        # Worker-лер арасындағы pub/sub (None болса — тек осы процесс)
+        self.backplane = None
+        # Филиал бойынша order оқиғаларының seq-і және соңғы оқиғалар буфері
+        self.event_log = BranchEventLog(event_buffer_size or settings.WS_EVENT_BUFFER_SIZE)
+        self._local_epoch = uuid.uuid4().hex
+        self._local_seqs = defaultdict(int)
+        # Әр жеткізілген оқиғаны тыңдайтын функциялар (мысалы, заказ тақтасы)
+        self.listeners: List[Callable[[dict], None]] = []
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    @property
+    def epoch(self) -> str:
+        """seq санауышының epoch-ы: өзгерсе, клиенттің last_seq-і жарамсыз"""
+        return self.backplane.epoch if self.backplane else self._local_epoch
+
+    async def _next_seq(self, branch_id: int) -> Optional[int]:
+        if not self.backplane:
+            self._local_seqs[branch_id] += 1
+            return self._local_seqs[branch_id]
+        try:
+            return await self.backplane.next_seq(branch_id)
+        except Exception as e:
+            logger.error(f"Оқиға seq алу қатесі: {e}")
+            return None
+
+    def current_seq(self, branch_id: int) -> int:
+        return self.event_log.current_seq(branch_id)
+
+    def events_since(self, branch_id: int, last_seq: int, epoch: str) -> Optional[List[dict]]:
+        """Қайта қосылған клиентке last_seq-тен кейінгі оқиғалар (None — толық snapshot керек)"""
+        return self.event_log.since(branch_id, last_seq, epoch)
+
+    async def start_backplane(self, backplane):
+        """Backplane-ге жазылу: әр оқиға тек осы worker-дің сокеттеріне жеткізіледі"""
+        await backplane.start(self.dispatch_local)
+        self.backplane = backplane
+
+    async def stop_backplane(self):
+        if self.backplane:
+            backplane, self.backplane = self.backplane, None
+            await backplane.stop()
+
+    async def publish(self, event: str, data: dict, order: dict = None, **targets):
+        """Оқиғаны барлық worker-лерге бір рет жариялау"""
+        envelope = {"event": event, "data": data, **targets}
+        if order:
+            # Клиенттерге жіберілмейді, тек listener-лер үшін толық заказ
+            envelope["order"] = order
+        if event in ("order_update", "orders_update", "new_order") and data.get("branch_id") is not None:
+            envelope["seq"] = await self._next_seq(data["branch_id"])
+            envelope["epoch"] = self.epoch
+        if self.backplane:
+            try:
+                await self.backplane.publish(envelope)
+                return
+            except Exception as e:
+                # Backplane істемесе, кем дегенде осы worker-дің клиенттері алсын
+                logger.error(f"Backplane publish қатесі: {e}")
+        await self.dispatch_local(envelope)
+
+    async def dispatch_local(self, envelope: dict):
+        """Backplane-нен келген оқиғаны жергілікті сокеттерге жеткізу"""
+        for listener in self.listeners:
+            try:
+                listener(envelope)
+            except Exception as e:
+                logger.error(f"WebSocket listener қатесі: {e}")
+
+        event = envelope.get("event")
+        if event == "order_update":
+            await self._deliver_order_update(envelope["data"], envelope.get("seq"), envelope.get("epoch"))
+        elif event == "orders_update":
+            await self._deliver_orders_update(envelope["data"], envelope.get("seq"), envelope.get("epoch"))
+        elif event == "new_order":
+            await self._deliver_new_order(envelope["data"], envelope.get("seq"), envelope.get("epoch"))
+        elif event == "notification":
+            await self._deliver_notification(envelope["data"], envelope.get("role"), envelope.get("branch_id"))
+        else:
+            logger.warning(f"Белгісіз backplane оқиғасы: {event}")
 
     async def set_branch(self, websocket: WebSocket, branch_id: int):
         """Пайдаланушыны филиалға тіркеу (динамикалық)"""
@@ -45,12 +144,24 @@ class WebSocketManager:
         
         logger.info(f"WebSocket филиалға тіркелді: branch_id={branch_id}")
 
-    async def connect(self, websocket: WebSocket, role: str, branch_id: int = None, user_id: int = None):
+    async def connect(self, websocket: WebSocket, role: str, branch_id: int = None, user_id: int = None, capabilities: Set[str] = None):
         """WebSocket байланысын орнату"""
         await websocket.accept()
         
         # WebSocket-ке уникал ID беру
         connection_id = id(websocket)
+
+        # Жеке жіберу кезегі: баяу клиент басқаларды күттірмейді
+        writer = ConnectionWriter(
+            websocket,
+            maxsize=self.queue_size,
+            policy=self.overflow_policy,
+            send_timeout=self.send_timeout,
+            on_close=self.disconnect,
+            metrics=self.metrics,
+        )
+        self.writers[connection_id] = writer
+        writer.start()
         
         # Рөлге байланысты сақтау
         if role not in self.active_connections:
@@ -71,6 +182,9 @@ class WebSocketManager:
                 self.user_connections[user_id] = set()
             self.user_connections[user_id].add(websocket)
             self.connection_users[connection_id] = user_id
+
+        if capabilities:
+            self.connection_capabilities[connection_id] = set(capabilities)
         
         logger.info(f"WebSocket байланысы орнатылды: role={role}, branch_id={branch_id}, user_id={user_id}")
         
@@ -105,117 +219,171 @@ class WebSocketManager:
         self.connection_roles.pop(connection_id, None)
         self.connection_branches.pop(connection_id, None)
         self.connection_users.pop(connection_id, None)
+        self.connection_capabilities.pop(connection_id, None)
+
+        writer = self.writers.pop(connection_id, None)
+        if writer:
+            writer.stop()
         
         logger.info(f"WebSocket байланысы үзілді: role={role}, branch_id={branch_id}")
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
         """Жеке хабарлама жіберу"""
+        writer = self.writers.get(id(websocket))
+        if writer:
+            writer.enqueue(json.dumps(message))
+            return
         try:
             await websocket.send_text(json.dumps(message))
         except Exception as e:
             logger.error(f"Жеке хабарлама жіберу қатесі: {e}")
 
-    async def broadcast_to_role(self, message: dict, role: str):
-        """Рөлге байланысты барлық байланыстарға хабарлама жіберу"""
-        if role not in self.active_connections:
-            return
-        
-        disconnected = set()
+    async def send_to_connections(self, message: dict, connections: Set[WebSocket]) -> int:
+        """Хабарламаны бір рет сериализациялап, байланыстардың кезегіне қою"""
+        if not connections:
+            return 0
+        text = json.dumps(message)
+        # Бір заказдың order_update-тері кезек толғанда біріктіріледі
+        coalesce_key = None
+        if message.get("type") == "order_update":
+            coalesce_key = message.get("data", {}).get("id")
+
+        sequenced = message.get("seq") is not None
+
         count = 0
-        for connection in self.active_connections[role]:
-            try:
-                await connection.send_text(json.dumps(message))
+        for connection in list(connections):
+            writer = self.writers.get(id(connection))
+            if writer and writer.enqueue(text, coalesce_key, sequenced):
                 count += 1
-            except Exception as e:
-                logger.error(f"Рөлге хабарлама жіберу қатесі: {e}")
-                disconnected.add(connection)
-        
-        logger.info(f"Broadcast to role '{role}' completed. Sent to {count} connections.")
-        
-        # Үзілген байланыстарды жою
-        for connection in disconnected:
-            self.disconnect(connection)
+        return count
+
+    def supports(self, websocket: WebSocket, capability: str) -> bool:
+        return capability in self.connection_capabilities.get(id(websocket), ())
+
+    async def flush(self):
+        """Барлық кезектер босағанша күту (тесттер және shutdown үшін)"""
+        await asyncio.gather(*(w.join() for w in list(self.writers.values())))
+
+    def get_queue_stats(self) -> dict:
+        return self.metrics.snapshot(list(self.writers.values()))
+
+    def _role_targets(self, *roles: str) -> Set[WebSocket]:
+        targets = set()
+        for role in roles:
+            targets |= self.active_connections.get(role, set())
+        return targets
+
+    async def broadcast_to_role(self, message: dict, role: str):
+        """Рөлге байланысты барлық байланыстарға хабарлама жіберу"""
+        count = await self.send_to_connections(message, self._role_targets(role))
+        logger.info(f"Broadcast to role '{role}' completed. Queued for {count} connections.")
 
     async def broadcast_to_branch(self, message: dict, branch_id: int):
         """Филиалға байланысты барлық байланыстарға хабарлама жіберу"""
-        if branch_id not in self.branch_connections:
-            return
-        
-        disconnected = set()
-        count = 0
-        for connection in self.branch_connections[branch_id]:
-            try:
-                await connection.send_text(json.dumps(message))
-                count += 1
-            except Exception as e:
-                logger.error(f"Филиалға хабарлама жіберу қатесі: {e}")
-                disconnected.add(connection)
-        
-        logger.info(f"Broadcast to branch '{branch_id}' completed. Sent to {count} connections.")
-        
-        # Үзілген байланыстарды жою
-        for connection in disconnected:
-            self.disconnect(connection)
+        count = await self.send_to_connections(message, self.branch_connections.get(branch_id, set()))
+        logger.info(f"Broadcast to branch '{branch_id}' completed. Queued for {count} connections.")
 
     async def broadcast_to_user(self, message: dict, user_id: int):
         """Белгілі пайдаланушыға хабарлама жіберу"""
-        if user_id not in self.user_connections:
-            return
-        
-        disconnected = set()
-        for connection in self.user_connections[user_id]:
-            try:
-                await connection.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Пайдаланушыға хабарлама жіберу қатесі: {e}")
-                disconnected.add(connection)
-        
-        for connection in disconnected:
-            self.disconnect(connection)
+        await self.send_to_connections(message, self.user_connections.get(user_id, set()))
 
-    async def broadcast_order_update(self, order_data: dict):
-        """Заказ обновлениесі туралы хабарлама жіберу"""
+    def _order_targets(self, branch_id: int = None, user_id: int = None) -> Set[WebSocket]:
+        """Заказ оқиғасын алатын байланыстар (әр сокет бір рет)"""
+        # Админдер мен кассирлер (кассирлер филиал бойынша сүзгіден өтпей қалса да)
+        targets = self._role_targets("admin", "canteen_admin", "cashier")
+        # Филиалдағы барлық экран/кассалар
+        if branch_id is not None:
+            targets |= self.branch_connections.get(branch_id, set())
+        # Пайдаланушының өзі (Клиент үшін маңызды)
+        if user_id is not None:
+            targets |= self.user_connections.get(user_id, set())
+        return targets
+
+    def _sequenced_message(self, message_type: str, order_data: dict, seq: int = None, epoch: str = None) -> dict:
+        """Order хабарламасына seq қосып, филиал буферіне жазу"""
         message = {
-            "type": "order_update",
+            "type": message_type,
             "data": order_data
         }
-        
-        # Егер филиал белгілі болса, сол филиалға жіберу (Кассирлерді қоса алғанда)
-        if "branch_id" in order_data:
-            await self.broadcast_to_branch(message, order_data["branch_id"])
-        
-        # Админдерге жіберу
-        await self.broadcast_to_role(message, "admin")
-        await self.broadcast_to_role(message, "canteen_admin")
-        
-        # Қосымша: кассирлерге рөл бойынша жіберу (егер филиал бойынша сүзгіден өтпей қалса)
-        await self.broadcast_to_role(message, "cashier")
-        
-        # Already handled above via branch broadcast if present
+        branch_id = order_data.get("branch_id")
+        if branch_id is None:
+            return message
+        if seq is None:
+            self.event_log.invalidate(branch_id)
+            return message
+        message["seq"] = seq
+        message["epoch"] = epoch
+        self.event_log.record(branch_id, seq, epoch, message)
+        return message
 
-        # Пайдаланушының өзіне жіберу (Клиент үшін маңызды)
-        if "user_id" in order_data:
-            await self.broadcast_to_user(message, order_data["user_id"])
+    async def broadcast_order_update(self, order_data: dict, order: dict = None):
+        """Заказ обновлениесі туралы хабарлама жіберу (барлық worker-лерге)"""
+        await self.publish("order_update", order_data, order=order)
 
-    async def broadcast_new_order(self, order_data: dict):
-        """Жаңа заказ туралы хабарлама жіберу"""
-        message = {
-            "type": "new_order",
-            "data": order_data
-        }
-        
-        # Егер филиал белгілі болса, сол филиалға жіберу (Кассирлерді қоса алғанда)
-        if "branch_id" in order_data:
-            await self.broadcast_to_branch(message, order_data["branch_id"])
-        
-        # Админдерге жіберу
-        await self.broadcast_to_role(message, "admin")
-        await self.broadcast_to_role(message, "canteen_admin")
-        
-        # Қосымша: кассирлерге рөл бойынша жіберу
-        await self.broadcast_to_role(message, "cashier")
-        
-        # Already handled above via branch broadcast if present
+    async def _deliver_order_update(self, order_data: dict, seq: int = None, epoch: str = None):
+        message = self._sequenced_message("order_update", order_data, seq, epoch)
+        targets = self._order_targets(order_data.get("branch_id"), order_data.get("user_id"))
+        await self.send_to_connections(message, targets)
+
+    async def broadcast_orders_update(self, branch_id: int, orders: List[dict], **extra):
+        """Бір филиалдың көп заказы өзгергенде — бір оқиға (әр заказға бөлек хабарлама емес)"""
+        await self.publish("orders_update", {"branch_id": branch_id, "orders": orders, **extra})
+
+    async def _deliver_orders_update(self, data: dict, seq: int = None, epoch: str = None):
+        message = self._sequenced_message("orders_update", data, seq, epoch)
+        staff = self._order_targets(data.get("branch_id"))
+        targets = set(staff)
+        for order in data.get("orders", []):
+            targets |= self.user_connections.get(order.get("user_id"), set())
+        await self.send_to_connections(
+            message, {ws for ws in targets if self.supports(ws, ORDERS_UPDATE_CAPABILITY)}
+        )
+
+        # Ескі клиенттер orders_update-ті білмейді: оларға әр заказ бөлек order_update болып барады
+        legacy_staff = {ws for ws in staff if not self.supports(ws, ORDERS_UPDATE_CAPABILITY)}
+        updates = self.split_orders_update(message)
+        for update in updates:
+            owners = self.user_connections.get(update["data"].get("user_id"), set())
+            legacy = legacy_staff | {ws for ws in owners if not self.supports(ws, ORDERS_UPDATE_CAPABILITY)}
+            await self.send_to_connections(update, legacy)
+
+    @staticmethod
+    def split_orders_update(message: dict) -> List[dict]:
+        """orders_update-ті заказ бойынша order_update хабарламаларына бөлу
+
+        seq/epoch соңғысына ғана қойылады: seq бақылайтын ескі клиент үзіліс көрмейді.
+        """
+        data = message["data"]
+        # branch_id, automation сияқты batch кілттері әр заказға көшіріледі
+        extra = {key: value for key, value in data.items() if key != "orders"}
+        updates = [
+            {"type": "order_update", "data": {**order, **extra}}
+            for order in data.get("orders", [])
+        ]
+        if updates and message.get("seq") is not None:
+            updates[-1]["seq"] = message["seq"]
+            updates[-1]["epoch"] = message.get("epoch")
+        return updates
+
+    def events_for(self, websocket: WebSocket, events: List[dict]) -> List[dict]:
+        """Resume кезінде ескі клиентке orders_update орнына order_update-тер"""
+        if self.supports(websocket, ORDERS_UPDATE_CAPABILITY):
+            return events
+        expanded = []
+        for event in events:
+            if event.get("type") == "orders_update":
+                expanded.extend(self.split_orders_update(event))
+            else:
+                expanded.append(event)
+        return expanded
+
+    async def broadcast_new_order(self, order_data: dict, order: dict = None):
+        """Жаңа заказ туралы хабарлама жіберу (барлық worker-лерге)"""
+        await self.publish("new_order", order_data, order=order)
+
+    async def _deliver_new_order(self, order_data: dict, seq: int = None, epoch: str = None):
+        message = self._sequenced_message("new_order", order_data, seq, epoch)
+        await self.send_to_connections(message, self._order_targets(order_data.get("branch_id")))
 
     async def send_notification(self, title: str, message: str, role: str = None, branch_id: int = None, notification_type: str = "system", data: dict = None):
         """Уведомлениелерді жіберу"""
@@ -229,7 +397,9 @@ class WebSocketManager:
                 **(data or {})
             }
         }
-        
+        await self.publish("notification", notification_message, role=role, branch_id=branch_id)
+
+    async def _deliver_notification(self, notification_message: dict, role: str = None, branch_id: int = None):
         if role:
             # Белгілі рөлге жіберу
             await self.broadcast_to_role(notification_message, role)
@@ -238,8 +408,7 @@ class WebSocketManager:
             await self.broadcast_to_branch(notification_message, branch_id)
         else:
             # Барлық құлдарға жіберу
-            for role_name in self.active_connections:
-                await self.broadcast_to_role(notification_message, role_name)
+            await self.send_to_connections(notification_message, self._role_targets(*self.active_connections))
 
 # Глобалдық WebSocket менеджері
 websocket_manager = WebSocketManager()
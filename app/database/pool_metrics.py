@@ -0,0 +1,98 @@
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+# Checkout күту уақытының гистограмма шекаралары (секунд)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class CheckoutWaitHistogram:
+    """Pool-дан байланыс алуды күту уақытының гистограммасы (thread-safe)"""
+
+    def __init__(self, buckets: tuple = WAIT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+            self._timeouts = 0
+
+    def observe(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, seconds)] += 1
+            self._count += 1
+            self._sum += seconds
+            self._max = max(self._max, seconds)
+            if timed_out:
+                self._timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[f"le_{bound}"] = cumulative
+            buckets["le_inf"] = self._count
+            return {
+                "count": self._count,
+                "sum_seconds": round(self._sum, 6),
+                "max_seconds": round(self._max, 6),
+                "timeouts": self._timeouts,
+                "buckets": buckets,
+            }
+
+
+class _TimedPoolMixin:
+    """QueuePool-ға checkout күту уақытын өлшеуді қосу"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_histogram = CheckoutWaitHistogram()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_histogram.observe(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_histogram.observe(time.perf_counter() - started)
+        return entry
+
+    def recreate(self):
+        # engine.dispose() жаңа pool жасайды — жиналған метрикаларды сақтаймыз
+        pool = super().recreate()
+        pool.wait_histogram = self.wait_histogram
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def get_pool_stats(pool) -> dict:
+    """Pool-дың ағымдағы күйі және checkout күту гистограммасы"""
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "timeout": pool.timeout(),
+    }
+    histogram = getattr(pool, "wait_histogram", None)
+    if histogram is not None:
+        stats["checkout_wait"] = histogram.snapshot()
+    return stats
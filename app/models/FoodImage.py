@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from . import Base
 
@@ -7,6 +7,8 @@ class FoodImage(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     image_url = Column(String, nullable=False)
+    # {"thumb": {"width", "height", "webp", "jpeg"}, "medium": ..., "large": ...}
+    variants = Column(JSON, nullable=True)
     food_id = Column(Integer, ForeignKey("foods.id", ondelete="CASCADE"))
 
     food = relationship("Food", back_populates="images")
\ No newline at end of file
@@ -16,6 +16,9 @@ from .ai_profile import AIProfile
 from .weight_history import WeightHistory
 from .ration import Ration
 from .otp_code import OtpCode
+from .stored_object import StoredObject
+from .subscription_usage import SubscriptionUsageDaily
+from .scheduled_job import ScheduledJob
 
 
 __all__ = [
@@ -37,6 +40,9 @@ __all__ = [
     "AIProfile",
     "WeightHistory",
     "Ration",
-    "OtpCode"
+    "OtpCode",
+    "StoredObject",
+    "SubscriptionUsageDaily",
+    "ScheduledJob"
 ]
 
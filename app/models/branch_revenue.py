@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from . import Base
@@ -19,6 +19,13 @@ class BranchRevenue(Base):
     final_amount = Column(Float, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Бір заказға бір жазба: қайта жазу әрекеттері ON CONFLICT DO NOTHING-пен өткізіледі
+        UniqueConstraint("order_id", name="uq_branch_revenue_order_id"),
+        # Филиал бойынша кезеңдік түсім
+        Index("ix_branch_revenue_branch_created", "branch_id", "created_at"),
+    )
+
 
     branch = relationship("Branch")
     order = relationship("Order")
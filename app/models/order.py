@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Index, Enum as SQLEnum, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -13,6 +13,10 @@ class OrderStatus(str, enum.Enum):
     CANCELLED = "cancelled"
 
 
+# Аяқталмаған заказдар (тақта, кассир, автоматты аяқтау) — кестенің аз бөлігі, partial индекстер осыған
+ACTIVE_ORDER_CONDITION = text("status IN ('pending', 'accepted', 'cooking', 'ready')")
+
+
 class Order(Base):
     __tablename__ = "orders"
     
@@ -39,6 +43,17 @@ class Order(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     receipt_url = Column(String, nullable=True)
 
+    __table_args__ = (
+        # Клиент тарихы, күндік лимит
+        Index("ix_orders_user_created", "user_id", "created_at"),
+        # Статистика/экспорт диапазондары, кассир тарихы
+        Index("ix_orders_branch_created", "branch_id", "created_at"),
+        # WebSocket since-синхронизациясы
+        Index("ix_orders_branch_updated", "branch_id", "updated_at"),
+        Index("ix_orders_active_branch_status", "branch_id", "status", postgresql_where=ACTIVE_ORDER_CONDITION),
+        Index("ix_orders_active_created", "created_at", postgresql_where=ACTIVE_ORDER_CONDITION),
+    )
+
     # Relationships
     user = relationship("User", back_populates="orders")
     branch = relationship("Branch", back_populates="orders")
@@ -53,7 +68,7 @@ class OrderItem(Base):
     __tablename__ = "order_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     food_id = Column(Integer, ForeignKey("foods.id", ondelete="SET NULL"), nullable=True)
     quantity = Column(Integer, default=1)
     food_name = Column(String, nullable=False)
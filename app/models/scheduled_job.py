@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text
+from . import Base
+
+
+class ScheduledJob(Base):
+    """Фондық job-тың күйі: барлық worker-лер ортақ қолданады (кім орындап жатыр, қашан келесі рет)
+
+    Уақыттар DB сағатымен (now()) жазылады, worker-лердің сағаты әртүрлі болса да lease дұрыс.
+    """
+    __tablename__ = "scheduled_jobs"
+
+    name = Column(String, primary_key=True)
+    next_run_at = Column(DateTime(timezone=True), nullable=False)
+    # Lease: орындап жатқан worker және оның мерзімі (worker өлсе, мерзім өткен соң басқасы ала алады)
+    locked_by = Column(String, nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    last_started_at = Column(DateTime(timezone=True), nullable=True)
+    last_success_at = Column(DateTime(timezone=True), nullable=True)
+    last_duration_ms = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+    runs = Column(Integer, nullable=False, default=0, server_default="0")
+    failures = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, UniqueConstraint
+from datetime import datetime
+from . import Base
+
+
+class StoredObject(Base):
+    """S3-ке жүктелген файлдардың мазмұн (SHA-256) бойынша индексі"""
+    __tablename__ = "stored_objects"
+
+    id = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    folder = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)
+    # Тағам суреттерінің нұсқалары (бар болса, қайта жасалмайды)
+    variants = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("sha256", "folder", name="uq_stored_object_sha256_folder"),
+    )
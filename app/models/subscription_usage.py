@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from . import Base
+
+
+class SubscriptionUsageDaily(Base):
+    """Абонемент заказдарының күндік жиынтығы (күн × филиал × абонемент), owner статистикасы үшін
+
+    Заказ жасалғанда және жойылғанда (cancelled) бірге жаңарады, жойылған заказдар саналмайды.
+    """
+    __tablename__ = "subscription_usage_daily"
+
+    branch_id = Column(Integer, ForeignKey("branches.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    subscription_id = Column(Integer, ForeignKey("subscriptions.id", ondelete="CASCADE"), primary_key=True)
+    orders = Column(Integer, nullable=False, default=0, server_default="0")
+    # Осы күні заказ берген клиенттер (бірнеше күн/филиал бойынша distinct санау үшін)
+    user_ids = Column(ARRAY(Integer), nullable=False, default=list, server_default=text("'{}'"))
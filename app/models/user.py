@@ -30,6 +30,8 @@ class User(Base):
     )
     is_active = Column(Boolean, default=True)
     is_email_verified = Column(Boolean, default=False)
+    # Пароль/рөл өзгергенде өседі: ескі токендер мен кэштелген principal жарамсыз болады
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Profile fields
     avatar_url = Column(String, nullable=True)
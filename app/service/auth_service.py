@@ -1,36 +1,31 @@
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User, UserRole
+from app.models.otp_code import OtpCode
 from config import settings
 from fastapi import HTTPException, status
+from app.configuration.security.principal_cache import principal_cache
 
 # Ескі bcrypt өшірілді
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# ЖАҢА: Argon2 қолданамыз
-from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
-
-ph = PasswordHasher()
+# ЖАҢА: Argon2 қолданамыз (бөлек шектелген pool-да)
+from app.service.password_hasher import password_hasher
 
 class AuthService:
     
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Парольді тексеру"""
-        try:
-            ph.verify(hashed_password, plain_password)
-            return True
-        except VerifyMismatchError:
-            return False
-        except Exception:
-            return False
+        return password_hasher.verify(hashed_password, plain_password)[0]
     
     @staticmethod
     def get_password_hash(password: str) -> str:
         """Парольді хэштеу (Argon2)"""
-        return ph.hash(password)  # Ұзындыққа шектеу жоқ!
+        return password_hasher.hash(password)  # Ұзындыққа шектеу жоқ!
 
     @staticmethod
     def create_access_token(data: dict) -> str:
@@ -91,35 +86,35 @@ class AuthService:
         return new_user
     
     @staticmethod
-    def authenticate_user(db: Session, email: str, password: str) -> User:
-        """Қолданушыны аутентификациялау"""
+    async def authenticate_user_async(db: AsyncSession, email: str, password: str) -> User:
+        """Қолданушыны аутентификациялау (Argon2 pool-да, Argon2 параметрлері өзгерсе хэшті жаңарту)"""
         email = email.lower().strip()
-        user = db.query(User).filter(User.email == email).first()
-        
-        print(f"[DEBUG] authenticate_user: email={email}, user_found={user is not None}")
-        
+        user = await db.scalar(select(User).where(User.email == email))
+
         if not user:
-             print(f"[DEBUG] authenticate_user FAIL: user not found")
-             raise HTTPException(
+            raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email немесе пароль қате"
             )
 
-        password_correct = AuthService.verify_password(password, user.hashed_password)
-        print(f"[DEBUG] authenticate_user: password_correct={password_correct}")
+        password_correct, new_hash = await password_hasher.verify_async(user.hashed_password, password)
 
         if not password_correct:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email немесе пароль қате"
             )
-        
+
         if not user.is_active:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Қолданушы белсенді емес"
             )
-        
+
+        if new_hash:
+            user.hashed_password = new_hash
+            await db.commit()
+
         return user
     
     @staticmethod
@@ -142,11 +137,45 @@ class AuthService:
                 detail="Token жарамсыз"
             )
         
+        token_version = payload.get("ver", 0)
+
+        # Кэштен алу: көп сұраныс DB-ге бармайды
+        cached_user = principal_cache.get(user_id, token_version)
+        if cached_user is not None:
+            return cached_user
+
         user = db.query(User).filter(User.id == user_id).first()
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Қолданушы табылмады"
             )
-        
-        return user
\ No newline at end of file
+
+        # Пароль өзгергеннен кейінгі ескі токен
+        if (user.token_version or 0) != token_version:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token жарамсыз немесе мерзімі өткен"
+            )
+
+        principal_cache.put(user)
+        return user
+
+    @staticmethod
+    def invalidate_principal(user_id: int):
+        """Қолданушының кэштегі principal-ын өшіру (профиль өзгергенде)"""
+        principal_cache.invalidate(user_id)
+
+    @staticmethod
+    def revoke_tokens(user: User):
+        """Барлық бұрынғы токендерді жарамсыз ету (пароль, рөл өзгергенде, өшіргенде). Commit-ті шақырушы жасайды"""
+        user.token_version = (user.token_version or 0) + 1
+        principal_cache.invalidate(user.id)
+
+    @staticmethod
+    def purge_expired_otps(db: Session) -> int:
+        """Мерзімі OTP_RETENTION_HOURS бұрын өткен OTP жазбаларын өшіру (фондық job)"""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.OTP_RETENTION_HOURS)
+        deleted = db.query(OtpCode).filter(OtpCode.expires_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+        return deleted
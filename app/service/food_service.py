@@ -12,6 +12,14 @@ class FoodService:
             Food.is_available == True
         ).all()
     
+    @staticmethod
+    def image_fields(food: Food) -> dict:
+        """Мәзір жауабына сурет URL-ы және оның нұсқалары (images жүктелген болуы керек)"""
+        first = food.images[0] if food.images else None
+        image_url = food.image_url or (first.image_url if first else None)
+        variants = first.variants if first and first.image_url == image_url else None
+        return {"image_url": image_url, "image_variants": variants}
+
     @staticmethod
     def create_food(db: Session, food_data: dict) -> Food:
         """Жаңа тағам қосу"""
@@ -0,0 +1,212 @@
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from config import settings
+from app.database.connection import AsyncSessionLocal, SessionLocal
+from app.models.scheduled_job import ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """Тіркелген фондық job: async функция, немесе Session қабылдайтын sync функция (thread-те орындалады)"""
+
+    def __init__(self, name: str, func: Callable, interval_seconds: float):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+
+
+class JobScheduler:
+    """Фондық job-тарды барлық uvicorn worker-лер арасында бір рет орындау
+
+    Әр worker tick сайын мерзімі келген job-ты шартты UPDATE-пен "алуға" тырысады (scheduled_jobs жолы):
+    шарт next_run_at <= now() және lease бос. Жолды тек бір worker өзгерте алады, қалғандары 0 жол алады.
+    Орындау кезінде lease heartbeat-пен ұзартылады; worker өлсе, lease мерзімі өткен соң job қайта босайды.
+    """
+
+    def __init__(self, tick_seconds: float, lease_seconds: float, worker_id: Optional[str] = None):
+        self.tick_seconds = tick_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.jobs: Dict[str, Job] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._running: Dict[str, asyncio.Task] = {}
+        self._registered = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def register(self, name: str, func: Callable, interval_seconds: float):
+        self.jobs[name] = Job(name, func, interval_seconds)
+        self._registered = False
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Tick-ті тоқтату және осы worker-де орындалып жатқан job-тарды болдырмау (lease мерзімімен босайды)"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"[Scheduler] Tick error: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def tick(self) -> List[str]:
+        """Мерзімі келген job-тарды алып, фонда іске қосу; осы worker алған job аттарын қайтарады"""
+        if not self._registered:
+            await self._register_rows()
+        candidates = [name for name in self.jobs if name not in self._running]
+        claimed = await self._claim(candidates) if candidates else []
+        for name in claimed:
+            task = asyncio.create_task(self._execute(self.jobs[name]))
+            self._running[name] = task
+            task.add_done_callback(lambda _, name=name: self._running.pop(name, None))
+        return claimed
+
+    async def wait_idle(self):
+        """Осы worker-де іске қосылған job-тардың аяқталуын күту"""
+        await asyncio.gather(*list(self._running.values()), return_exceptions=True)
+
+    async def _register_rows(self):
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                insert(ScheduledJob)
+                .values([{"name": name, "next_run_at": func.now()} for name in self.jobs])
+                .on_conflict_do_nothing(index_elements=[ScheduledJob.name])
+            )
+            await db.commit()
+        self._registered = True
+
+    async def _claim(self, names: List[str]) -> List[str]:
+        claimed = []
+        async with AsyncSessionLocal() as db:
+            for name in names:
+                job = self.jobs[name]
+                row = (await db.execute(
+                    update(ScheduledJob)
+                    .where(
+                        ScheduledJob.name == name,
+                        ScheduledJob.next_run_at <= func.now(),
+                        or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < func.now()),
+                    )
+                    .values(
+                        locked_by=self.worker_id,
+                        locked_until=func.now() + timedelta(seconds=self.lease_seconds),
+                        last_started_at=func.now(),
+                        next_run_at=func.now() + timedelta(seconds=job.interval_seconds),
+                    )
+                    .returning(ScheduledJob.name)
+                )).scalar()
+                if row:
+                    claimed.append(row)
+            await db.commit()
+        return claimed
+
+    async def _heartbeat(self, name: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(ScheduledJob)
+                        .where(ScheduledJob.name == name, ScheduledJob.locked_by == self.worker_id)
+                        .values(locked_until=func.now() + timedelta(seconds=self.lease_seconds))
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"[Scheduler] Lease renewal error ({name}): {e}")
+
+    @staticmethod
+    def _call_sync(job_func: Callable):
+        with SessionLocal() as db:
+            return job_func(db)
+
+    async def _execute(self, job: Job):
+        heartbeat = asyncio.create_task(self._heartbeat(job.name))
+        started = time.perf_counter()
+        error = None
+        try:
+            if inspect.iscoroutinefunction(job.func):
+                await job.func()
+            else:
+                await asyncio.to_thread(self._call_sync, job.func)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            logger.error(f"[Scheduler] Job {job.name} failed: {error}")
+        finally:
+            heartbeat.cancel()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        values = {
+            "locked_by": None,
+            "locked_until": None,
+            "last_duration_ms": duration_ms,
+            "runs": ScheduledJob.runs + 1,
+        }
+        if error:
+            values.update(last_error=error[:1000], failures=ScheduledJob.failures + 1)
+        else:
+            values.update(last_error=None, last_success_at=func.now())
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(ScheduledJob)
+                    .where(ScheduledJob.name == job.name, ScheduledJob.locked_by == self.worker_id)
+                    .values(**values)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"[Scheduler] Job {job.name} result was not saved: {e}")
+        logger.info(f"[Scheduler] Job {job.name} finished in {duration_ms:.0f} ms{' (failed)' if error else ''}")
+
+    async def stats(self) -> dict:
+        """Барлық worker-лер бойынша job-тардың соңғы орындалуы (ұзақтығы, сәтті уақыты, қателер)"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.scalars(select(ScheduledJob).order_by(ScheduledJob.name))).all()
+        return {
+            "worker": self.worker_id,
+            "running_here": sorted(self._running),
+            "jobs": [
+                {
+                    "name": row.name,
+                    "next_run_at": row.next_run_at,
+                    "locked_by": row.locked_by,
+                    "locked_until": row.locked_until,
+                    "last_started_at": row.last_started_at,
+                    "last_success_at": row.last_success_at,
+                    "last_duration_ms": row.last_duration_ms,
+                    "last_error": row.last_error,
+                    "runs": row.runs,
+                    "failures": row.failures,
+                }
+                for row in rows
+            ],
+        }
+
+
+# Глобалдық scheduler (job-тар main.py-да тіркеледі)
+job_scheduler = JobScheduler(settings.JOB_SCHEDULER_TICK_SECONDS, settings.JOB_LEASE_SECONDS)
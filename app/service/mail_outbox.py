@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import smtplib
+from email.message import Message
+from typing import List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxMessage:
+    """Кезектегі бір хат"""
+
+    def __init__(self, receiver: str, message: Message, fallback: Optional[str] = None):
+        self.receiver = receiver
+        self.message = message
+        # Хат мүлде жіберілмесе, логқа жазылатын мәтін (dev кезінде OTP кодын көру үшін)
+        self.fallback = fallback
+        self.attempts = 0
+
+
+class MailOutbox:
+    """Хаттарды фонда жіберетін кезек: бір SMTP байланысы қайта қолданылады, қате болса backoff-пен қайталанады
+
+    HTTP endpoint-тер тек кезекке қояды, SMTP-ны worker task бөлек thread-те шақырады.
+    Кезек осы worker жадында (OTP 10 минут жарамды, сондықтан рестартта жоғалса, қолданушы кодты қайта сұрайды).
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        idle_seconds: float,
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.idle_seconds = idle_seconds
+        self.queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retries: List[asyncio.TimerHandle] = []
+        # Кезектегі, жіберіліп жатқан және қайталауды күтіп тұрған хаттар саны
+        self._pending = 0
+        self._drained: Optional[asyncio.Event] = None
+        # SMTP байланысын тек worker қолданады (бір уақытта бір thread)
+        self._smtp: Optional[smtplib.SMTP] = None
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self._pending = 0
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        """Кезектегі хаттарды жіберуге біраз уақыт беріп, worker-ді тоқтату"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Mail outbox: {self._pending} хат жіберілмей қалды")
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._disconnect)
+
+    async def flush(self):
+        """Кезек (қайталаулармен қоса) босағанша күту"""
+        if self.running:
+            await self._drained.wait()
+
+    def enqueue(self, receiver: str, message: Message, fallback: Optional[str] = None):
+        """Хатты кезекке қою (күтпейді)"""
+        item = OutboxMessage(receiver, message, fallback)
+        if not self.running:
+            # Worker жоқ (скрипттер, lifespan-сыз): бұрынғыдай бірден жіберу
+            if self._deliver([item]) and fallback:
+                print(f"⚠️ FALLBACK: {fallback}")
+            self._disconnect()
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._put(item)
+        else:
+            # Sync endpoint (threadpool) ішінен шақырылды
+            asyncio.run_coroutine_threadsafe(self._put_async(item), self._loop).result()
+
+    def _put(self, item: OutboxMessage):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Сұранысты құлатпаймыз (OTP жазылып қойған): бұрынғыдай fallback-ты логқа шығарамыз
+            self.failed += 1
+            logger.error(f"Mail outbox толы: {item.receiver} адресіне хат кезекке қойылмады")
+            if item.fallback:
+                print(f"⚠️ FALLBACK: {item.fallback}")
+            return
+        self._pending += 1
+        self._drained.clear()
+
+    async def _put_async(self, item: OutboxMessage):
+        self._put(item)
+
+    def _done(self):
+        self._pending -= 1
+        if self._pending == 0:
+            self._drained.set()
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if batch is None:
+                # Ұзақ хат болмаса, SMTP байланысын жабу
+                await asyncio.to_thread(self._disconnect)
+                continue
+            try:
+                failed = await asyncio.to_thread(self._deliver, batch)
+            except Exception as e:
+                logger.error(f"Mail outbox error: {e!r}")
+                failed = batch
+            for item in batch:
+                if item in failed:
+                    self._schedule_retry(item)
+                else:
+                    self._done()
+
+    async def _next_batch(self) -> Optional[List[OutboxMessage]]:
+        try:
+            first = await asyncio.wait_for(self.queue.get(), timeout=self.idle_seconds)
+        except asyncio.TimeoutError:
+            return None
+        batch = [first]
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    def _schedule_retry(self, item: OutboxMessage):
+        if item.attempts >= self.max_attempts:
+            self.failed += 1
+            logger.error(f"Email {item.receiver} адресіне {item.attempts} әрекеттен кейін жіберілмеді")
+            if item.fallback:
+                print(f"⚠️ FALLBACK: {item.fallback}")
+            self._done()
+            return
+
+        self.retried += 1
+        delay = self.retry_base_seconds * 2 ** (item.attempts - 1)
+
+        def requeue():
+            self._retries.remove(handle)
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                item.attempts += 1
+                self._schedule_retry(item)
+
+        handle = self._loop.call_later(delay, requeue)
+        self._retries.append(handle)
+
+    def _deliver(self, batch: List[OutboxMessage]) -> List[OutboxMessage]:
+        """Хаттарды бір SMTP байланысымен жіберу (thread-те). Қайталау керек хаттарды қайтарады"""
+        failed = []
+        sender = settings.MAIL_USERNAME
+        for item in batch:
+            item.attempts += 1
+            try:
+                self._send(sender, item)
+                self.sent += 1
+                print(f"✅ Email successfully sent to {item.receiver}")
+            except smtplib.SMTPRecipientsRefused as e:
+                # 5xx: адрес қабылданбады, қайталаудан пайда жоқ; 4xx (greylisting т.б.) қайталанады
+                if all(code >= 500 for code, _ in e.recipients.values()):
+                    self.failed += 1
+                    print(f"❌ Email recipient refused ({item.receiver}): {e.recipients}")
+                else:
+                    failed.append(item)
+            except Exception as e:
+                print(f"❌ Error sending email to {item.receiver}: {e!r}")
+                self._disconnect()
+                failed.append(item)
+        return failed
+
+    def _send(self, sender: str, item: OutboxMessage):
+        reused = self._smtp is not None
+        try:
+            self._connection().sendmail(sender, item.receiver, item.message.as_string())
+        except smtplib.SMTPServerDisconnected:
+            if not reused:
+                raise
+            # Сервер бос байланысты жапқан: бір рет жаңа байланыспен қайталау
+            self._disconnect()
+            self._connection().sendmail(sender, item.receiver, item.message.as_string())
+
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(settings.MAIL_SERVER, settings.MAIL_PORT, timeout=settings.MAIL_TIMEOUT_SECONDS)
+            try:
+                if settings.MAIL_STARTTLS:
+                    smtp.starttls()
+                smtp.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self.connections += 1
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is None:
+            return
+        smtp, self._smtp = self._smtp, None
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "retry_scheduled": len(self._retries),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "connections": self.connections,
+        }
+
+
+# Глобалдық email кезегі (lifespan-да іске қосылады)
+mail_outbox = MailOutbox(
+    max_size=settings.MAIL_OUTBOX_SIZE,
+    batch_size=settings.MAIL_BATCH_SIZE,
+    max_attempts=settings.MAIL_MAX_ATTEMPTS,
+    retry_base_seconds=settings.MAIL_RETRY_BASE_SECONDS,
+    idle_seconds=settings.MAIL_CONNECTION_IDLE_SECONDS,
+)
@@ -1,27 +1,29 @@
-import ssl
-from smtplib import SMTP
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from config import settings
+from app.service.mail_outbox import mail_outbox
 
 class MailService:
+    @staticmethod
+    def _build_message(sender_email: str, receiver_email: str, subject: str, text: str, html: str) -> MIMEMultipart:
+        message = MIMEMultipart("alternative")
+        message["Subject"] = subject
+        message["From"] = f"FoodLapp <{sender_email}>"
+        message["To"] = receiver_email
+        message.attach(MIMEText(text, "plain"))
+        message.attach(MIMEText(html, "html"))
+        return message
+
     @staticmethod
     def send_otp_email(receiver_email: str, otp_code: str):
-        """SMTP-мен OTP жіберу"""
+        """OTP хатын жіберу кезегіне қою"""
         sender_email = getattr(settings, "MAIL_USERNAME", None)
         password = getattr(settings, "MAIL_PASSWORD", None)
-        smtp_server = getattr(settings, "MAIL_SERVER", "smtp.gmail.com")
-        smtp_port = getattr(settings, "MAIL_PORT", 587)
 
         if not sender_email or not password:
             print(f"DEBUG: Email settings not configured. OTP for {receiver_email} is {otp_code}")
             return
 
-        message = MIMEMultipart("alternative")
-        message["Subject"] = "FoodLapp - Тіркелу үшін растау коды"
-        message["From"] = f"FoodLapp <{sender_email}>"
-        message["To"] = receiver_email
-
         text = f"Сіздің растау кодыңыз: {otp_code}"
         html = f"""
         <html>
@@ -36,40 +38,25 @@ class MailService:
         </html>
         """
 
-        part1 = MIMEText(text, "plain")
-        part2 = MIMEText(html, "html")
-        message.attach(part1)
-        message.attach(part2)
-
-        try:
-            with SMTP(smtp_server, smtp_port, timeout=5) as server:
-                server.starttls()
-                server.login(sender_email, password)
-                server.sendmail(sender_email, receiver_email, message.as_string())
-            print(f"✅ OTP email successfully sent to {receiver_email}")
-        except Exception as e:
-            print(f"❌ Error sending email: {e}")
-            print(f"⚠️ FALLBACK: Сәлеметсіз бе! {receiver_email} үшін растау коды: {otp_code}")
-            # Қатені қайта лақтырмаймыз, сонда тіркелу процесі тоқтамайды
-            # Бірақ өндірісте (production) қайта лақтыру керек
+        message = MailService._build_message(
+            sender_email, receiver_email, "FoodLapp - Тіркелу үшін растау коды", text, html
+        )
+        # Фондағы кезек жібереді, HTTP жауап SMTP-ны күтпейді
+        mail_outbox.enqueue(
+            receiver_email, message,
+            fallback=f"Сәлеметсіз бе! {receiver_email} үшін растау коды: {otp_code}"
+        )
 
     @staticmethod
     def send_password_reset_email(receiver_email: str, otp_code: str):
-        """SMTP-мен құпиясөзді қалпына келтіру кодын жіберу"""
+        """Құпиясөзді қалпына келтіру кодының хатын кезекке қою"""
         sender_email = getattr(settings, "MAIL_USERNAME", None)
         password = getattr(settings, "MAIL_PASSWORD", None)
-        smtp_server = getattr(settings, "MAIL_SERVER", "smtp.gmail.com")
-        smtp_port = getattr(settings, "MAIL_PORT", 587)
 
         if not sender_email or not password:
             print(f"DEBUG: Email settings not configured. Reset OTP for {receiver_email} is {otp_code}")
             return
 
-        message = MIMEMultipart("alternative")
-        message["Subject"] = "FoodLapp - Құпиясөзді қалпына келтіру"
-        message["From"] = f"FoodLapp <{sender_email}>"
-        message["To"] = receiver_email
-
         text = f"Сіздің құпиясөзді қалпына келтіру кодыңыз: {otp_code}"
         html = f"""
         <html>
@@ -84,17 +71,7 @@ class MailService:
         </html>
         """
 
-        part1 = MIMEText(text, "plain")
-        part2 = MIMEText(html, "html")
-        message.attach(part1)
-        message.attach(part2)
-
-        try:
-            with SMTP(smtp_server, smtp_port, timeout=5) as server:
-                server.starttls()
-                server.login(sender_email, password)
-                server.sendmail(sender_email, receiver_email, message.as_string())
-            print(f"✅ Password reset email successfully sent to {receiver_email}")
-        except Exception as e:
-            print(f"❌ Error sending password reset email: {e}")
-            print(f"⚠️ FALLBACK: РЕСЕТ КОД {receiver_email} үшін: {otp_code}")
+        message = MailService._build_message(
+            sender_email, receiver_email, "FoodLapp - Құпиясөзді қалпына келтіру", text, html
+        )
+        mail_outbox.enqueue(receiver_email, message, fallback=f"РЕСЕТ КОД {receiver_email} үшін: {otp_code}")
@@ -1,4 +1,5 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.notification import Notification, NotificationType, NotificationStatus
 from datetime import datetime
 from typing import List, Optional, Union
@@ -7,8 +8,8 @@ import json
 
 class NotificationService:
     @staticmethod
-    def create_notification(
-        db: Session,
+    async def create_notification(
+        db: AsyncSession,
         user_id: int,
         title: str,
         message: str,
@@ -33,84 +34,99 @@ class NotificationService:
             status=NotificationStatus.UNREAD
         )
         db.add(notification)
-        db.commit()
-        db.refresh(notification)
+        await db.commit()
+        await db.refresh(notification)
         return notification
 
     @staticmethod
-    def get_user_notifications(
-        db: Session,
+    async def get_user_notifications(
+        db: AsyncSession,
         user_id: int,
         skip: int = 0,
         limit: int = 20,
         status: Optional[NotificationStatus] = None
     ) -> List[Notification]:
         """Пайдаланушының уведомлениелерін алу"""
-        query = db.query(Notification).filter(Notification.user_id == user_id)
+        query = select(Notification).where(Notification.user_id == user_id)
         
         if status:
-            query = query.filter(Notification.status == status)
+            query = query.where(Notification.status == status)
         
-        return query.order_by(Notification.created_at.desc()).offset(skip).limit(limit).all()
+        result = await db.scalars(
+            query.order_by(Notification.created_at.desc()).offset(skip).limit(limit)
+        )
+        return list(result)
+
+    @staticmethod
+    async def get_user_notification(db: AsyncSession, notification_id: int, user_id: int) -> Optional[Notification]:
+        """Пайдаланушыға тиесілі бір уведомлениені алу"""
+        return await db.scalar(
+            select(Notification).where(
+                Notification.id == notification_id,
+                Notification.user_id == user_id
+            )
+        )
 
     @staticmethod
-    def get_unread_count(db: Session, user_id: int) -> int:
+    async def get_unread_count(db: AsyncSession, user_id: int) -> int:
         """Оқылмаған уведомлениелердің саны"""
-        return db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.status == NotificationStatus.UNREAD
-        ).count()
+        return await db.scalar(
+            select(func.count(Notification.id)).where(
+                Notification.user_id == user_id,
+                Notification.status == NotificationStatus.UNREAD
+            )
+        )
 
     @staticmethod
-    def mark_as_read(db: Session, notification_id: int) -> Notification:
+    async def mark_as_read(db: AsyncSession, notification_id: int) -> Notification:
         """Уведомлениелерді оқығанды белгілеу"""
-        notification = db.query(Notification).filter(Notification.id == notification_id).first()
+        notification = await db.get(Notification, notification_id)
         if notification:
             notification.status = NotificationStatus.READ
             notification.read_at = datetime.utcnow()
-            db.commit()
-            db.refresh(notification)
+            await db.commit()
         return notification
 
     @staticmethod
-    def mark_all_as_read(db: Session, user_id: int) -> int:
+    async def mark_all_as_read(db: AsyncSession, user_id: int) -> int:
         """Барлық уведомлениелерді оқығанды белгілеу"""
-        notifications = db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.status == NotificationStatus.UNREAD
-        ).all()
-        
-        for notification in notifications:
-            notification.status = NotificationStatus.READ
-            notification.read_at = datetime.utcnow()
-        
-        db.commit()
-        return len(notifications)
+        result = await db.execute(
+            update(Notification)
+            .where(
+                Notification.user_id == user_id,
+                Notification.status == NotificationStatus.UNREAD
+            )
+            .values(status=NotificationStatus.READ, read_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
 
     @staticmethod
-    def delete_notification(db: Session, notification_id: int) -> bool:
+    async def delete_notification(db: AsyncSession, notification_id: int) -> bool:
         """Уведомлениелерді өндіктеу"""
-        notification = db.query(Notification).filter(Notification.id == notification_id).first()
+        notification = await db.get(Notification, notification_id)
         if notification:
             notification.status = NotificationStatus.ARCHIVED
-            db.commit()
+            await db.commit()
             return True
         return False
 
     @staticmethod
-    def clear_old_notifications(db: Session, user_id: int) -> int:
+    async def clear_old_notifications(db: AsyncSession, user_id: int) -> int:
         """Ескі уведомлениелерді өндіктеу (30 күннен ет)"""
         from datetime import timedelta
         
         old_date = datetime.utcnow() - timedelta(days=30)
-        notifications = db.query(Notification).filter(
-            Notification.user_id == user_id,
-            Notification.created_at < old_date,
-            Notification.status != NotificationStatus.UNREAD
-        ).all()
-        
-        for notification in notifications:
-            notification.status = NotificationStatus.ARCHIVED
-        
-        db.commit()
-        return len(notifications)
+        result = await db.execute(
+            update(Notification)
+            .where(
+                Notification.user_id == user_id,
+                Notification.created_at < old_date,
+                Notification.status != NotificationStatus.UNREAD
+            )
+            .values(status=NotificationStatus.ARCHIVED)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
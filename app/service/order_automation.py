@@ -1,82 +1,91 @@
-import asyncio
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from app.database.connection import SessionLocal
+from typing import Optional
+
+from sqlalchemy import select, update, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from app.database.connection import AsyncSessionLocal
 from app.models.order import Order, OrderStatus
 from app.models.branch_revenue import BranchRevenue
 from app.configuration.websocket.websocket_server import websocket_manager
 
 logger = logging.getLogger(__name__)
 
+STALE_STATUSES = [
+    OrderStatus.PENDING,
+    OrderStatus.ACCEPTED,
+    OrderStatus.COOKING,
+    OrderStatus.READY
+]
+STALE_AFTER = timedelta(hours=1)
+
+
 class OrderAutomationService:
     @staticmethod
-    async def auto_complete_stale_orders():
-        """
-        Background task to automatically complete orders that have been in 
-        pending, accepted, or ready status for more than 1 hour.
+    async def complete_stale_batch(db: AsyncSession, cutoff: datetime, batch_size: int) -> list:
+        """Бір batch ескі заказды GIVEN-ге ауыстыру және branch_revenue жазу — бір транзакция, екі statement
+
+        Басқа транзакция (кассир) ұстап тұрған заказдар өткізіліп жіберіледі (SKIP LOCKED).
         """
+        now = datetime.utcnow()
+        stale_ids = (
+            select(Order.id)
+            .where(Order.status.in_(STALE_STATUSES), Order.created_at <= cutoff)
+            .order_by(Order.created_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        completed = (await db.execute(
+            update(Order)
+            .where(Order.id.in_(stale_ids))
+            .values(status=OrderStatus.GIVEN, updated_at=now)
+            .returning(Order.id, Order.branch_id, Order.user_id, Order.is_paid)
+            .execution_options(synchronize_session=False)
+        )).all()
+
+        if completed:
+            # Revenue жазбасы (қолмен аяқтаудағыдай, сомасы 0); бұрын жазылған заказ өткізіледі
+            await db.execute(pg_insert(BranchRevenue).from_select(
+                ["branch_id", "order_id", "subscription_id", "user_id",
+                 "amount", "discount_amount", "final_amount", "created_at"],
+                select(
+                    Order.branch_id, Order.id, Order.subscription_id, Order.user_id,
+                    literal(0.0), literal(0.0), literal(0.0), literal(now)
+                ).where(Order.id.in_([row.id for row in completed]))
+            ).on_conflict_do_nothing(index_elements=[BranchRevenue.order_id]))
+        await db.commit()
+        return completed
+
+    @staticmethod
+    async def broadcast_completed(completed: list):
+        """Commit-тен кейін: әр филиалға бір orders_update оқиғасы"""
+        by_branch = defaultdict(list)
+        for row in completed:
+            by_branch[row.branch_id].append({
+                "id": row.id,
+                "status": OrderStatus.GIVEN,
+                "is_paid": row.is_paid,
+                "user_id": row.user_id
+            })
+        for branch_id, orders in by_branch.items():
+            await websocket_manager.broadcast_orders_update(branch_id, orders, automation=True)
+
+    @staticmethod
+    async def run_once(batch_size: Optional[int] = None) -> int:
+        """Барлық ескі заказдарды batch-термен аяқтау, аяқталған заказ санын қайтарады"""
+        batch_size = batch_size or settings.ORDER_AUTOMATION_BATCH_SIZE
+        cutoff = datetime.utcnow() - STALE_AFTER
+        total = 0
         while True:
-            try:
-                # Run every 10 minutes
-                await asyncio.sleep(600)
-                
-                db: Session = SessionLocal()
-                try:
-                    one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-                    
-                    # Find orders in non-final statuses created more than 1 hour ago
-                    stale_orders = db.query(Order).filter(
-                        Order.status.in_([
-                            OrderStatus.PENDING, 
-                            OrderStatus.ACCEPTED, 
-                            OrderStatus.COOKING, 
-                            OrderStatus.READY
-                        ]),
-                        Order.created_at <= one_hour_ago
-                    ).all()
-                    
-                    if not stale_orders:
-                        continue
-                        
-                    logger.info(f"[Automation] Found {len(stale_orders)} stale orders to auto-complete")
-                    
-                    for order in stale_orders:
-                        old_status = order.status
-                        order.status = OrderStatus.GIVEN
-                        
-                        # Record revenue (same as manual completion)
-                        revenue = BranchRevenue(
-                            branch_id=order.branch_id,
-                            order_id=order.id,
-                            subscription_id=order.subscription_id,
-                            user_id=order.user_id,
-                            amount=0.0,
-                            discount_amount=0.0,
-                            final_amount=0.0,
-                        )
-                        db.add(revenue)
-                        
-                        # Broadcast update via WebSocket
-                        await websocket_manager.broadcast_order_update({
-                            "id": order.id,
-                            "status": OrderStatus.GIVEN,
-                            "is_paid": order.is_paid,
-                            "branch_id": order.branch_id,
-                            "user_id": order.user_id,
-                            "automation": True
-                        })
-                        
-                        logger.info(f"[Automation] Order #{order.id} auto-completed (was {old_status})")
-                    
-                    db.commit()
-                    
-                except Exception as e:
-                    db.rollback()
-                    logger.error(f"[Automation] Error during stale order cleanup: {e}")
-                finally:
-                    db.close()
-                    
-            except Exception as e:
-                logger.error(f"[Automation] Unexpected error in background loop: {e}")
-                await asyncio.sleep(60) # Wait a bit before retrying if loop fails
+            async with AsyncSessionLocal() as db:
+                completed = await OrderAutomationService.complete_stale_batch(db, cutoff, batch_size)
+            if completed:
+                await OrderAutomationService.broadcast_completed(completed)
+                total += len(completed)
+                logger.info(f"[Automation] Auto-completed {len(completed)} stale orders")
+            if len(completed) < batch_size:
+                return total
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.database.connection import AsyncSessionLocal
+from app.models.order import Order, OrderStatus
+from app.schemas.order_dto import OrderResponse
+
+logger = logging.getLogger(__name__)
+
+# Тақтада тұратын (аяқталмаған) статустар
+BOARD_STATUSES = {
+    OrderStatus.PENDING.value,
+    OrderStatus.ACCEPTED.value,
+    OrderStatus.COOKING.value,
+    OrderStatus.READY.value,
+}
+
+
+def order_snapshot(order: Order) -> dict:
+    """Тақтаға және backplane-ге жіберілетін заказ көшірмесі (items және branch жүктелген болуы керек)"""
+    return OrderResponse.model_validate(order).model_dump(mode="json")
+
+
+def _status_value(status) -> str:
+    return status.value if isinstance(status, OrderStatus) else str(status)
+
+
+class OrderBoard:
+    """Филиал бойынша белсенді заказдар тақтасы (осы worker жадында)"""
+
+    def __init__(self):
+        self.branches: Dict[int, Dict[int, OrderResponse]] = {}
+        # Тақта DB-ден құрылмаса, endpoint-тер DB-ге жүгінеді
+        self.ready = False
+        # Rebuild кезінде келген оқиғалар: жаңа snapshot-қа қайта қолданылады
+        self._replay: Optional[List[dict]] = None
+        self._rebuild_lock = asyncio.Lock()
+        self._resync_task: Optional[asyncio.Task] = None
+        # Іске қосылған refresh task-тары: GC жоймауы және қателері жоғалмауы үшін
+        self._refresh_tasks: Set[asyncio.Task] = set()
+
+    async def rebuild(self):
+        """Барлық белсенді заказдарды DB-ден жүктеу (startup, мерзімді resync, backplane қайта қосылғанда)"""
+        async with self._rebuild_lock:
+            self._replay = []
+            try:
+                async with AsyncSessionLocal() as db:
+                    orders = (await db.scalars(
+                        select(Order)
+                        .options(selectinload(Order.items), joinedload(Order.branch))
+                        .where(Order.status.in_(BOARD_STATUSES))
+                    )).all()
+            except Exception:
+                self._replay = None
+                raise
+
+            branches: Dict[int, Dict[int, OrderResponse]] = {}
+            for order in orders:
+                branches.setdefault(order.branch_id, {})[order.id] = OrderResponse.model_validate(order)
+            replay, self._replay = self._replay, None
+            self.branches = branches
+            for envelope in replay:
+                self.apply_event(envelope)
+            self.ready = True
+            logger.info(f"Order board rebuilt: {len(orders)} active orders")
+
+    def start_resync(self, interval_seconds: float):
+        """Тақтаны мерзімді түрде DB-мен салыстыру: оқиға жоғалса немесе DB broadcast-сыз өзгерсе (әр worker-де)"""
+        if interval_seconds > 0 and (self._resync_task is None or self._resync_task.done()):
+            self._resync_task = asyncio.create_task(self._resync_loop(interval_seconds))
+
+    async def stop_resync(self):
+        if self._resync_task:
+            self._resync_task.cancel()
+            await asyncio.gather(self._resync_task, return_exceptions=True)
+            self._resync_task = None
+        pending = list(self._refresh_tasks)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _resync_loop(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Order board resync error: {e}")
+
+    def upsert(self, snapshot: dict):
+        order = OrderResponse.model_validate(snapshot)
+        if order.status not in BOARD_STATUSES:
+            self.remove(order.branch_id, order.id)
+            return
+        self.branches.setdefault(order.branch_id, {})[order.id] = order
+
+    def remove(self, branch_id: int, order_id: int):
+        self.branches.get(branch_id, {}).pop(order_id, None)
+
+    def apply_event(self, envelope: dict):
+        """WebSocket backplane оқиғасын тақтаға қолдану (әр worker-де)"""
+        if self._replay is not None:
+            self._replay.append(envelope)
+        if envelope.get("event") == "orders_update":
+            data = envelope.get("data", {})
+            for order in data.get("orders", []):
+                self._apply_change({"branch_id": data.get("branch_id"), **order})
+            return
+        if envelope.get("event") not in ("new_order", "order_update"):
+            return
+
+        if envelope.get("order"):
+            self.upsert(envelope["order"])
+            return
+
+        self._apply_change(envelope.get("data", {}))
+
+    def _apply_change(self, data: dict):
+        """Бір заказдың статус/is_paid өзгерісін тақтаға қолдану"""
+        order_id, branch_id = data.get("id"), data.get("branch_id")
+        if order_id is None:
+            return
+
+        current = self._find(order_id, branch_id)
+        if current is None:
+            # Тақтада жоқ заказ: толық мәліметін DB-ден алу
+            if "status" not in data or _status_value(data["status"]) in BOARD_STATUSES:
+                task = asyncio.create_task(self.refresh(order_id))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._refresh_done)
+            return
+
+        changes = {}
+        if "status" in data:
+            changes["status"] = _status_value(data["status"])
+        if "is_paid" in data:
+            changes["is_paid"] = data["is_paid"]
+        updated = current.model_copy(update=changes)
+        if updated.status not in BOARD_STATUSES:
+            self.remove(updated.branch_id, order_id)
+        else:
+            self.branches[updated.branch_id][order_id] = updated
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Order board refresh task failed: {task.exception()!r}")
+
+    async def refresh(self, order_id: int):
+        """Бір заказды DB-ден қайта жүктеу"""
+        try:
+            async with AsyncSessionLocal() as db:
+                order = await db.get(
+                    Order, order_id,
+                    options=[selectinload(Order.items), joinedload(Order.branch)]
+                )
+            if order:
+                self.upsert(order_snapshot(order))
+        except Exception as e:
+            logger.error(f"Order board refresh error (order #{order_id}): {e}")
+
+    def _find(self, order_id: int, branch_id: int = None) -> Optional[OrderResponse]:
+        if branch_id is not None:
+            return self.branches.get(branch_id, {}).get(order_id)
+        for orders in self.branches.values():
+            if order_id in orders:
+                return orders[order_id]
+        return None
+
+    def orders(self, branch_id: int = None, statuses: Iterable = BOARD_STATUSES, paid_only: bool = False) -> List[OrderResponse]:
+        """Филиалдың (None — барлық филиалдың) заказдары, DB-сіз"""
+        statuses = {_status_value(s) for s in statuses}
+        if branch_id is not None:
+            candidates = list(self.branches.get(branch_id, {}).values())
+        else:
+            candidates = [o for orders in list(self.branches.values()) for o in list(orders.values())]
+
+        result = [
+            o for o in candidates
+            if o.status in statuses and (not paid_only or o.is_paid)
+        ]
+        result.sort(key=lambda o: (o.created_at, o.id))
+        return result
+
+
+# Глобалдық заказ тақтасы
+order_board = OrderBoard()
@@ -1,66 +1,172 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select, insert, update, func, exists, or_, true
+from sqlalchemy.orm import Session, joinedload
 
-from app.models.branch_revenue import BranchRevenue
 from app.models.order import Order, OrderItem, OrderStatus
-from app.models.food import Food
+from app.models.food import Food, MenuType
 from app.models.branch import Branch
-from app.models.subscription import UserSubscription, Subscription
+from app.models.branch_menu import BranchMenu
+from app.models.subscription import UserSubscription, Subscription, SubscriptionMenu
+from app.service.subscription_usage_service import SubscriptionUsageService
+from app.service.revenue_service import RevenueService
+from app.service.qr_token_service import QrTokenService, QrClaims
 from fastapi import HTTPException, status
 from datetime import datetime, timedelta
 import secrets
 from config import settings
 
+# pg_advisory_xact_lock(namespace, user_id) — заказ жасау үшін бөлінген кілттер кеңістігі
+ORDER_LOCK_NAMESPACE = 1001
+
 class OrderService:
 
+    @staticmethod
+    def _load_order_context(db: Session, user_id: int, branch_id: int, today_start_utc: datetime):
+        """Заказды қабылдауға қажет фактілерді бір сұраныспен алу (branch, абонемент, бүгінгі қолдану)"""
+        now_utc = datetime.utcnow()
+
+        active_sub = (
+            select(
+                UserSubscription.id.label("user_subscription_id"),
+                UserSubscription.subscription_id,
+                UserSubscription.remaining_meals,
+                Subscription.daily_limit,
+            )
+            .join(Subscription, Subscription.id == UserSubscription.subscription_id)
+            .where(
+                UserSubscription.user_id == user_id,
+                UserSubscription.is_active == True,
+                UserSubscription.end_date > now_utc  # end_date is usually UTC
+            )
+            .limit(1)
+            .cte("active_sub")
+        )
+
+        today_usage = (
+            select(
+                func.count(Order.id).label("today_orders"),
+                func.count(Order.id).filter(Order.paid_by_subscription == True).label("today_sub_orders"),
+            )
+            .where(
+                Order.user_id == user_id,
+                Order.created_at >= today_start_utc,
+                Order.status != OrderStatus.CANCELLED
+            )
+            .cte("today_usage")
+        )
+
+        menu_size = (
+            select(func.count(SubscriptionMenu.id))
+            .where(SubscriptionMenu.subscription_id == active_sub.c.subscription_id)
+            .scalar_subquery()
+        )
+
+        branch_ok = exists().where(Branch.id == branch_id, Branch.is_active == True)
+
+        stmt = select(
+            branch_ok.label("branch_ok"),
+            active_sub.c.user_subscription_id,
+            active_sub.c.subscription_id,
+            active_sub.c.remaining_meals,
+            active_sub.c.daily_limit,
+            today_usage.c.today_orders,
+            today_usage.c.today_sub_orders,
+            menu_size.label("menu_size"),
+        ).select_from(today_usage.outerjoin(active_sub, true()))
+
+        return db.execute(stmt).one()
+
+    @staticmethod
+    def _load_order_foods(db: Session, branch_id: int, food_ids: set, subscription_id: int = None) -> dict:
+        """Себеттегі барлық тағамдарды бір IN сұранысымен алу"""
+        in_sub_menu = exists().where(
+            SubscriptionMenu.subscription_id == subscription_id,
+            SubscriptionMenu.food_id == Food.id
+        )
+
+        rows = db.query(
+            Food.id, Food.name, Food.menu_type, in_sub_menu.label("in_sub_menu")
+        ).join(
+            BranchMenu, BranchMenu.food_id == Food.id
+        ).filter(
+            Food.id.in_(food_ids),
+            BranchMenu.branch_id == branch_id,
+            BranchMenu.is_available == True
+        ).all()
+
+        return {row.id: row for row in rows}
+
+    @staticmethod
+    def _lock_user_orders(db: Session, user_id: int):
+        """Бір қолданушының заказ жасауын сериализациялау (транзакция аяқталғанда босатылады)"""
+        if db.get_bind().dialect.name != "postgresql":
+            return
+        db.execute(select(func.pg_advisory_xact_lock(ORDER_LOCK_NAMESPACE, user_id)))
+
+    @staticmethod
+    def _consume_meal(db: Session, user_subscription_id: int):
+        """Абонементтен бір тамақты атомды түрде шегеру. Тамақ қалмаса None қайтарады"""
+        stmt = (
+            update(UserSubscription)
+            .where(
+                UserSubscription.id == user_subscription_id,
+                UserSubscription.is_active == True,
+                or_(
+                    UserSubscription.remaining_meals.is_(None),
+                    UserSubscription.remaining_meals > 0
+                )
+            )
+            .values(remaining_meals=UserSubscription.remaining_meals - 1)
+            .returning(UserSubscription.id, UserSubscription.remaining_meals)
+            .execution_options(synchronize_session=False)
+        )
+        return db.execute(stmt).first()
+
     @staticmethod
     def create_order(db: Session, user_id: int, branch_id: int, items: list) -> Order:
         """Жаңа заказ жасау"""
-        
+        try:
+            return OrderService._create_order(db, user_id, branch_id, items)
+        except Exception:
+            # Транзакцияны және advisory lock-ты бірден босату
+            db.rollback()
+            raise
+
+    @staticmethod
+    def _create_order(db: Session, user_id: int, branch_id: int, items: list) -> Order:
         print(f"Creating order - user_id: {user_id}, branch_id: {branch_id}, items: {items}")
 
-        # ---------- Branch тексеру ----------
-        branch = db.query(Branch).filter(
-            Branch.id == branch_id,
-            Branch.is_active == True
-        ).first()
+        now_utc = datetime.utcnow()
+        today_start_utc = datetime(now_utc.year, now_utc.month, now_utc.day)
+
+        # Бір қолданушының қатар келген заказдары "күніне бір рет" ережесін айналып өтпеуі үшін
+        OrderService._lock_user_orders(db, user_id)
+
+        # ---------- Branch + Subscription + Daily usage (бір сұраныс) ----------
+        ctx = OrderService._load_order_context(db, user_id, branch_id, today_start_utc)
 
-        if not branch:
+        if not ctx.branch_ok:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Филиал табылмады немесе белсенді емес"
             )
 
-        # ---------- Foods + price ----------
-        total_price = 0
-        order_items_data = []
+        # ---------- Foods (бір IN сұраныс) ----------
+        foods = OrderService._load_order_foods(
+            db, branch_id, {item.food_id for item in items}, ctx.subscription_id
+        )
 
-        # Бір тапсырыста тек бірдей типті тағамдар болуы керек (немесе аралас мәзірді қолдамаймыз ба?)
-        # Қосарлы тексеру: барлық тағамдар қолжетімді ме?
-        from app.models.food import MenuType
-        from app.models.branch_menu import BranchMenu
-        
+        order_items_data = []
         has_subscription_food = False
         has_regular_food = False
 
         for item in items:
-            print(f"Processing item: {item}")
-            # Тарымды осы branch үшін BranchMenu арқылы тексеру
-            food_with_menu = db.query(Food, BranchMenu).join(
-                BranchMenu, BranchMenu.food_id == Food.id
-            ).filter(
-                Food.id == item.food_id,
-                BranchMenu.branch_id == branch_id,
-                BranchMenu.is_available == True
-            ).first()
-
-            if not food_with_menu:
+            food = foods.get(item.food_id)
+            if not food:
                 raise HTTPException(
                     status_code=404,
                     detail=f"Тағам ID {item.food_id} табылмады немесе бұл филиалда қолжетімсіз"
                 )
-                
-            food = food_with_menu.Food
-            
+
             if food.menu_type == MenuType.SUBSCRIPTION:
                 has_subscription_food = True
             elif food.menu_type == MenuType.REGULAR:
@@ -71,21 +177,13 @@ class OrderService:
                 "quantity": item.quantity,
                 "food_name": food.name
             })
-            
+
         if has_subscription_food and has_regular_food:
             raise HTTPException(
                 status_code=400,
                 detail="Абонемент тағамдары мен кәдімгі тағамдарды бір тапсырысқа қосуға болмайды"
             )
 
-        # ---------- Subscription ----------
-        now = datetime.now() # Use local time for business rules
-        
-        print(f"Checking subscription for user_id: {user_id} at local time: {now}")
-
-        paid_by_subscription = False
-        subscription_id = None
-        
         if has_regular_food:
             raise HTTPException(
                 status_code=400,
@@ -93,116 +191,44 @@ class OrderService:
             )
 
         # ---------- Daily Limit Check (Strictly one order per UTC day) ----------
-        now_utc = datetime.utcnow()
-        today_start_utc = datetime(now_utc.year, now_utc.month, now_utc.day)
-        
-        print(f"[DEBUG] OrderService: user_id={user_id}, today_start_utc={today_start_utc}")
-        
-        existing_order = db.query(Order).filter(
-            Order.user_id == user_id,
-            Order.created_at >= today_start_utc,
-            Order.status != OrderStatus.CANCELLED
-        ).first()
-
-        if existing_order:
-            print(f"[DEBUG] OrderService: Blocked by order_id={existing_order.id}, created_at={existing_order.created_at}, status={existing_order.status}")
+        if ctx.today_orders:
+            print(f"[DEBUG] OrderService: user_id={user_id} already has {ctx.today_orders} order(s) since {today_start_utc}")
             raise HTTPException(
                 status_code=400,
                 detail="Сіз бүгін тапсырыс беріп қойдыңыз. Күніне тек бір рет тапсырыс беруге болады."
             )
 
         # ---------- Subscription ----------
-        now = datetime.now() # Use local time for business rules
-        
-        print(f"Checking subscription for user_id: {user_id} at local time: {now}")
-
-        paid_by_subscription = False
-        subscription_id = None
-        
         # EVERY order now requires a subscription
-        # Note: end_date is likely stored in UTC if using utcnow default, 
-        # but for simplicity we compare with now(). If issues persist, we might need to unify.
-        active_subscription = db.query(UserSubscription).filter(
-            UserSubscription.user_id == user_id,
-            UserSubscription.is_active == True,
-            UserSubscription.end_date > datetime.utcnow() # end_date is usually UTC
-        ).first()
-
-        print(f"Active subscription found: {active_subscription}")
-
-        if not active_subscription:
+        if not ctx.user_subscription_id:
             raise HTTPException(
                 status_code=400,
                 detail="Тамақ алу үшін белсенді абонемент қажет. Абонемент сатып алыңыз"
             )
 
-        sub = active_subscription.subscription
-        print(f"Subscription details: {sub}")
-
-        from app.models.subscription import SubscriptionMenu
-        
-        can_use = True
-        
         # 0. Menu restriction check
-        sub_menu_foods = db.query(SubscriptionMenu.food_id).filter(
-            SubscriptionMenu.subscription_id == sub.id
-        ).all()
-        
-        if sub_menu_foods:
-            allowed_food_ids = [sf[0] for sf in sub_menu_foods]
-            for item in items:
-                if item.food_id not in allowed_food_ids:
-                    raise HTTPException(400, detail="Бұл тағам сіздің абонементіңізге кірмейді")
+        if ctx.menu_size and not all(food.in_sub_menu for food in foods.values()):
+            raise HTTPException(400, detail="Бұл тағам сіздің абонементіңізге кірмейді")
 
         # 1. Total usage limit check
-        if active_subscription.remaining_meals is not None and active_subscription.remaining_meals <= 0:
+        if ctx.remaining_meals is not None and ctx.remaining_meals <= 0:
             raise HTTPException(400, detail="Абонемент бойынша тамақ саны таусылды")
-        
+
         # 2. Daily limit check
-        if hasattr(sub, "daily_limit") and sub.daily_limit:
-            # Use local day start
-            today_start_local = datetime(now.year, now.month, now.day)
-            # We need to be careful: if Order.created_at is UTC, we should convert today_start to UTC or compare in UTC.
-            # However, for now let's assume if it's within the same 24h block.
-            # A better way is to compare with UTC range of the local day.
-            # But as a hotfix, let's just use utcnow() for the limit check to stay consistent with DB.
-            now_utc = datetime.utcnow()
-            today_start_utc = datetime(now_utc.year, now_utc.month, now_utc.day)
-            
-            today_used_query = db.query(Order).filter(
-                Order.user_id == user_id,
-                # No longer restriction on subscription_id specifically, just one order per day total
-                Order.created_at >= today_start_utc,
-                Order.paid_by_subscription == True,
-                Order.status != OrderStatus.CANCELLED
-            )
-            today_used = today_used_query.count()
-
-            print(f"[DEBUG] OrderService (sub check): daily_limit={sub.daily_limit}, today_used={today_used}")
-            if today_used >= sub.daily_limit:
-                already_ordered = today_used_query.first()
-                print(f"[DEBUG] OrderService (sub check): Blocked by order_id={already_ordered.id}, status={already_ordered.status}")
-                raise HTTPException(400, detail="Бүгінгі күндік лимит аяқталды")
-
-        # 3. Time window check
-        if hasattr(sub, "allowed_from") and sub.allowed_from and sub.allowed_to:
-            pass # Уақыт тексеруді уақытша өшірдік
-            # current_time = now.time() # This is LOCAL time
-            # if not (sub.allowed_from <= current_time <= sub.allowed_to):
-            #     raise HTTPException(400, detail=f"Абонемент тек {sub.allowed_from.strftime('%H:%M')} - {sub.allowed_to.strftime('%H:%M')} арасында жұмыс істейді. Қазіргі уақыт: {current_time.strftime('%H:%M')}")
-
-        # If all checks pass
-        active_subscription.remaining_meals -= 1
-        paid_by_subscription = True
-        subscription_id = sub.id
+        if ctx.daily_limit and ctx.today_sub_orders >= ctx.daily_limit:
+            print(f"[DEBUG] OrderService (sub check): daily_limit={ctx.daily_limit}, today_used={ctx.today_sub_orders}")
+            raise HTTPException(400, detail="Бүгінгі күндік лимит аяқталды")
+
+        # 3. Time window check — уақытша өшірілген
+
+        # If all checks pass — шартты UPDATE, сондықтан қатар заказдар санды теріс жасай алмайды
+        if OrderService._consume_meal(db, ctx.user_subscription_id) is None:
+            raise HTTPException(400, detail="Абонемент бойынша тамақ саны таусылды")
         print("Subscription validated and applied successfully")
-        
-        if not paid_by_subscription:
-            print("Proceeding without subscription (either none found or limits reached)")
 
         # ---------- QR ----------
         qr_token = secrets.token_urlsafe(32)
-        qr_expire = now + timedelta(minutes=settings.QR_CODE_EXPIRE_MINUTES)
+        qr_expire = datetime.utcnow() + timedelta(minutes=settings.QR_CODE_EXPIRE_MINUTES)
 
         # ---------- Order create ----------
         new_order = Order(
@@ -211,28 +237,38 @@ class OrderService:
             status=OrderStatus.PENDING,
             qr_code=qr_token,
             qr_expire_at=qr_expire,
-            paid_by_subscription=paid_by_subscription,
-            subscription_id=subscription_id,
-            is_paid=paid_by_subscription
+            paid_by_subscription=True,
+            subscription_id=ctx.subscription_id,
+            is_paid=True
         )
 
-
         db.add(new_order)
         db.flush()
+        if settings.QR_SIGNED_TOKENS:
+            # Қолтаңбалы токенге order id керек (commit кезінде бір UPDATE)
+            new_order.qr_code = OrderService._qr_token(new_order, qr_expire)
+
+        # Owner статистикасының күндік жиынтығы (сол транзакцияда)
+        db.execute(SubscriptionUsageService.add_stmt(new_order))
 
-        # ---------- Items ----------
-        for item_data in order_items_data:
-            db.add(OrderItem(order_id=new_order.id, **item_data))
+        # ---------- Items (бір executemany) ----------
+        db.execute(
+            insert(OrderItem),
+            [{"order_id": new_order.id, **item_data} for item_data in order_items_data]
+        )
 
+        order_id = new_order.id
         db.commit()
-        db.refresh(new_order)
 
-        return new_order
+        # Items және branch-ті бірге жүктеу (async сессияда кейін lazy load жасалмайды)
+        return db.query(Order).options(
+            joinedload(Order.items),
+            joinedload(Order.branch)
+        ).populate_existing().filter(Order.id == order_id).one()
 
     @staticmethod
     def get_user_orders(db: Session, user_id: int):
         """Қолданушының заказдарын алу (Оптимизацияланған)"""
-        from sqlalchemy.orm import joinedload
         return db.query(Order).options(
             joinedload(Order.items),
             joinedload(Order.branch)
@@ -247,58 +283,130 @@ class OrderService:
         ).first()
     
     @staticmethod
-    def client_verify_qr_code(db: Session, qr_code: str, user_id: int) -> Order:
-        """Клиент QR кодты тексеру және қабылдау"""
+    def _qr_token(order: Order, expires_at: datetime) -> str:
+        """QR_SIGNED_TOKENS қосулы болса — қолтаңбалы токен, әйтпесе кездейсоқ"""
+        if settings.QR_SIGNED_TOKENS:
+            return QrTokenService.issue(order.id, order.branch_id, order.user_id, expires_at)
+        return secrets.token_urlsafe(32)
+
+    @staticmethod
+    def _check_qr_claims(claims: QrClaims, user_id: int | None, branch_id: int | None, now: datetime):
+        """Қолтаңбалы токенді DB-сыз тексеру: бөтен немесе мерзімі өткен код бірден қайтарылады"""
+        if user_id is not None and claims.user_id != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Бұл заказ сіздің емес"
+            )
+
+        if branch_id is not None and claims.branch_id != branch_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Бұл заказ басқа филиалдікі"
+            )
+
+        if claims.expires_at <= now:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="QR код мерзімі өткен"
+            )
+
+    @staticmethod
+    def redeem_qr_code(db: Session, qr_code: str, user_id: int | None = None, branch_id: int | None = None) -> Order:
+        """QR арқылы заказды беру: барлық шарт бір шартты UPDATE-те (qr_code unique индексі бойынша)
+
+        Қатар сканерлеуде жолды тек бір транзакция өзгерте алады, қалғандары 0 жол алып, қате себебін
+        кейін анықтайды. Revenue сол транзакцияда жазылады.
+        Қолтаңбалы токен алдымен DB-сыз тексеріледі, заказ primary key бойынша ізделеді.
+        """
+        now = datetime.utcnow()
+        conditions = [
+            Order.qr_code == qr_code,
+            Order.qr_used == False,
+            Order.qr_expire_at > now,
+            Order.status == OrderStatus.READY
+        ]
+        if QrTokenService.is_signed(qr_code):
+            claims = QrTokenService.parse(qr_code)
+            if claims is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="QR код табылмады"
+                )
+            OrderService._check_qr_claims(claims, user_id, branch_id, now)
+            # qr_code теңдігі қалады: generate_order_qr жаңа код берсе, ескісі жарамсыз
+            conditions.append(Order.id == claims.order_id)
+        if user_id is not None:
+            conditions.append(Order.user_id == user_id)
+        if branch_id is not None:
+            conditions.append(Order.branch_id == branch_id)
+
+        order = db.execute(
+            update(Order)
+            .where(*conditions)
+            .values(status=OrderStatus.GIVEN, qr_used=True, updated_at=now)
+            .returning(Order)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+        if order is None:
+            OrderService._raise_qr_rejection(db, qr_code, user_id, branch_id, now)
+
+        # Revenue қосу (заказға бір рет қана)
+        RevenueService.record(db, order)
+
+        db.commit()
+        db.refresh(order)
+        return order
+
+    @staticmethod
+    def _raise_qr_rejection(db: Session, qr_code: str, user_id: int | None, branch_id: int | None, now: datetime):
+        """UPDATE 0 жол қайтарса — себебін бұрынғы тексеру ретімен анықтау"""
         order = db.query(Order).filter(Order.qr_code == qr_code).first()
-        
+
         if not order:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="QR код табылмады"
             )
-        
-        if order.user_id != user_id:
+
+        if user_id is not None and order.user_id != user_id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Бұл заказ сіздің емес"
             )
-        
+
+        if branch_id is not None and order.branch_id != branch_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Бұл заказ басқа филиалдікі"
+            )
+
         if order.qr_used:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="QR код қолданылған"
             )
-        
-        if order.qr_expire_at < datetime.utcnow():
+
+        if order.qr_expire_at is None or order.qr_expire_at <= now:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="QR код мерзімі өткен"
             )
-        
-        if order.status != OrderStatus.READY:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Заказ әлі дайын емес"
-            )
-        
-        # Заказды берілді деп белгілеу
-        order.status = OrderStatus.GIVEN
-        order.qr_used = True
-        
-        # Revenue қосу
-        revenue = BranchRevenue(
-            branch_id=order.branch_id,
-            order_id=order.id,
-            subscription_id=order.subscription_id,
-            user_id=order.user_id,
-            amount=0.0,
-            discount_amount=0.0,
-            final_amount=0.0,
+
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Заказ әлі дайын емес"
         )
-        db.add(revenue)
-        
-        db.commit()
-        db.refresh(order)
+
+    @staticmethod
+    def verify_qr_code(db: Session, qr_code: str, branch_id: int = None) -> Order:
+        """Кассир QR кодты тексеру және заказды беру (өз филиалының заказы ғана)"""
+        return OrderService.redeem_qr_code(db, qr_code, branch_id=branch_id)
+
+    @staticmethod
+    def client_verify_qr_code(db: Session, qr_code: str, user_id: int) -> Order:
+        """Клиент QR кодты тексеру және қабылдау"""
+        order = OrderService.redeem_qr_code(db, qr_code, user_id)
         return order
     
     @staticmethod
@@ -324,8 +432,8 @@ class OrderService:
             )
         
         # Жаңа QR код генерациялау
-        qr_token = secrets.token_urlsafe(32)
         qr_expire = datetime.utcnow() + timedelta(minutes=settings.QR_CODE_EXPIRE_MINUTES)
+        qr_token = OrderService._qr_token(order, qr_expire)
         
         # Заказды жаңарту
         order.qr_code = qr_token
@@ -343,56 +451,7 @@ class OrderService:
     @staticmethod
     def scan_order_by_qr(db: Session, qr_code: str, user_id: int) -> dict:
         """Клиент QR код сканерлеп заказды алу"""
-        order = db.query(Order).filter(Order.qr_code == qr_code).first()
-        
-        if not order:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="QR код табылмады"
-            )
-        
-        if order.user_id != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Бұл заказ сіздің емес"
-            )
-        
-        if order.qr_used:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="QR код қолданылған"
-            )
-        
-        if order.qr_expire_at < datetime.utcnow():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="QR код мерзімі өткен"
-            )
-        
-        if order.status != OrderStatus.READY:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Заказ әлі дайын емес"
-            )
-        
-        # Заказды берілді деп белгілеу
-        order.status = OrderStatus.GIVEN
-        order.qr_used = True
-        
-        # Revenue қосу
-        revenue = BranchRevenue(
-            branch_id=order.branch_id,
-            order_id=order.id,
-            subscription_id=order.subscription_id,
-            user_id=order.user_id,
-            amount=0.0,
-            discount_amount=0.0,
-            final_amount=0.0,
-        )
-        db.add(revenue)
-        
-        db.commit()
-        db.refresh(order)
+        order = OrderService.redeem_qr_code(db, qr_code, user_id)
         
         return {
             "message": "Заказ сәтті алынды",
@@ -450,16 +509,8 @@ class OrderService:
         # Статусты өзгерту
         order.status = OrderStatus.GIVEN  # COMPLETED емес, GIVEN
 
-        revenue = BranchRevenue(
-            branch_id=order.branch_id,
-            order_id=order.id,
-            subscription_id=order.subscription_id,
-            user_id=order.user_id,
-            amount=0.0,
-            discount_amount=0.0,
-            final_amount=0.0,
-        )
-        db.add(revenue)
+        # Revenue қосу (заказға бір рет қана)
+        RevenueService.record(db, order)
 
         db.commit()
         db.refresh(order)
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from argon2 import PasswordHasher
+from argon2.exceptions import VerifyMismatchError
+from fastapi import HTTPException, status
+
+from config import settings
+
+
+class PasswordHashPool:
+    """Argon2 хэштеу/тексеруді бөлек шектелген thread pool-да орындау
+
+    argon2-cffi есептеу кезінде GIL-ды босатады, сондықтан thread-тер параллель жұмыс істейді,
+    ал event loop пен Starlette threadpool-ы бос қалады.
+    """
+
+    def __init__(self, hasher: PasswordHasher, workers: int, max_pending: int):
+        self.hasher = hasher
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _submit(self, fn, *args):
+        # Кезек тым ұзын болса, бірден 503 (login толқыны басқа endpoint-терді тоқтатпауы үшін)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Сервер бос емес, кейінірек қайталаңыз",
+                    headers={"Retry-After": "1"}
+                )
+            self._pending += 1
+        try:
+            return self._executor.submit(self._run, fn, *args)
+        except Exception:
+            self._release()
+            raise
+
+    def _run(self, fn, *args):
+        try:
+            return fn(*args)
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+
+    def _verify(self, hashed_password: str, plain_password: str) -> Tuple[bool, Optional[str]]:
+        """(дұрыс па, параметрлер өзгерсе жаңа хэш)"""
+        try:
+            self.hasher.verify(hashed_password, plain_password)
+        except VerifyMismatchError:
+            return False, None
+        except Exception:
+            return False, None
+        if self.hasher.check_needs_rehash(hashed_password):
+            return True, self.hasher.hash(plain_password)
+        return True, None
+
+    def hash(self, password: str) -> str:
+        return self._submit(self.hasher.hash, password).result()
+
+    def verify(self, hashed_password: str, plain_password: str) -> Tuple[bool, Optional[str]]:
+        return self._submit(self._verify, hashed_password, plain_password).result()
+
+    async def verify_async(self, hashed_password: str, plain_password: str) -> Tuple[bool, Optional[str]]:
+        return await asyncio.wrap_future(self._submit(self._verify, hashed_password, plain_password))
+
+
+password_hasher = PasswordHashPool(
+    PasswordHasher(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_COST,
+        parallelism=settings.ARGON2_PARALLELISM
+    ),
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
@@ -0,0 +1,67 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import struct
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from config import settings
+
+# "q1." + base64url(version, order_id, branch_id, user_id, exp, nonce) + 16 байт HMAC-SHA256.
+# token_urlsafe алфавитінде нүкте жоқ, сондықтан ескі кездейсоқ кодпен шатаспайды.
+# nonce: бір секундта қайта жасалған код та ескісінен өзгеше болуы үшін.
+TOKEN_PREFIX = "q1."
+_PAYLOAD = struct.Struct(">BQIIII")
+_VERSION = 1
+_SIGNATURE_BYTES = 16
+
+
+class QrClaims(NamedTuple):
+    order_id: int
+    branch_id: int
+    user_id: int
+    expires_at: datetime  # naive UTC, orders.qr_expire_at сияқты
+
+
+def _key() -> bytes:
+    return (settings.QR_TOKEN_SECRET or settings.SECRET_KEY).encode()
+
+
+def _sign(payload: bytes) -> bytes:
+    return hmac.new(_key(), payload, hashlib.sha256).digest()[:_SIGNATURE_BYTES]
+
+
+class QrTokenService:
+    """Қолтаңбалы QR токен: кассир құрылғысы мерзімі өткен/бөтен кодты DB-ға бармай қайтарады"""
+
+    @staticmethod
+    def is_signed(token: str) -> bool:
+        return token.startswith(TOKEN_PREFIX)
+
+    @staticmethod
+    def issue(order_id: int, branch_id: int, user_id: int, expires_at: datetime) -> str:
+        exp = int(expires_at.replace(tzinfo=timezone.utc).timestamp())
+        payload = _PAYLOAD.pack(_VERSION, order_id, branch_id, user_id, exp, secrets.randbits(32))
+        return TOKEN_PREFIX + base64.urlsafe_b64encode(payload + _sign(payload)).rstrip(b"=").decode()
+
+    @staticmethod
+    def parse(token: str) -> Optional[QrClaims]:
+        """Қолтаңбасы дұрыс болса claims, әйтпесе None (мерзімді шақырушы тексереді)"""
+        if not QrTokenService.is_signed(token):
+            return None
+        body = token[len(TOKEN_PREFIX):]
+        try:
+            raw = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+        except ValueError:
+            return None
+        if len(raw) != _PAYLOAD.size + _SIGNATURE_BYTES:
+            return None
+        payload, signature = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        version, order_id, branch_id, user_id, exp, _ = _PAYLOAD.unpack(payload)
+        if version != _VERSION:
+            return None
+        expires_at = datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+        return QrClaims(order_id, branch_id, user_id, expires_at)
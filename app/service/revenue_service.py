@@ -0,0 +1,63 @@
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.branch_revenue import BranchRevenue
+from app.models.order import Order
+
+
+class RevenueService:
+    """branch_revenue: әр заказға бір жазба және филиал бойынша түсім жиынтығы"""
+
+    @staticmethod
+    def record_stmt(order: Order, amount: float = 0.0, discount_amount: float = 0.0):
+        """Заказ түсімін жазу; заказ бұрын жазылған болса — ештеңе істемейді (uq_branch_revenue_order_id)"""
+        return pg_insert(BranchRevenue).values(
+            branch_id=order.branch_id,
+            order_id=order.id,
+            subscription_id=order.subscription_id,
+            user_id=order.user_id,
+            amount=amount,
+            discount_amount=discount_amount,
+            final_amount=amount - discount_amount,
+            created_at=datetime.utcnow(),
+        ).on_conflict_do_nothing(index_elements=[BranchRevenue.order_id])
+
+    @staticmethod
+    def record(db: Session, order: Order) -> bool:
+        """Commit-ті шақырушы жасайды; жаңа жазба қосылса True"""
+        return db.execute(RevenueService.record_stmt(order)).rowcount > 0
+
+    @staticmethod
+    def totals(db: Session, branch_ids: List[int], start: Optional[date] = None, end: Optional[date] = None) -> dict:
+        """Филиал бойынша түсім: {branch_id: {orders, amount, discount_amount, final_amount}}
+
+        [start, end + 1 күн) — ix_branch_revenue_branch_created индексімен.
+        """
+        if not branch_ids:
+            return {}
+        query = db.query(
+            BranchRevenue.branch_id,
+            func.count(BranchRevenue.id),
+            func.coalesce(func.sum(BranchRevenue.amount), 0.0),
+            func.coalesce(func.sum(BranchRevenue.discount_amount), 0.0),
+            func.coalesce(func.sum(BranchRevenue.final_amount), 0.0),
+        ).filter(BranchRevenue.branch_id.in_(branch_ids))
+        if start:
+            query = query.filter(BranchRevenue.created_at >= datetime(start.year, start.month, start.day))
+        if end:
+            next_day = end + timedelta(days=1)
+            query = query.filter(BranchRevenue.created_at < datetime(next_day.year, next_day.month, next_day.day))
+
+        return {
+            branch_id: {
+                "orders": orders,
+                "amount": float(amount),
+                "discount_amount": float(discount),
+                "final_amount": float(final),
+            }
+            for branch_id, orders, amount, discount, final in query.group_by(BranchRevenue.branch_id)
+        }
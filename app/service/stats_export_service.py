@@ -0,0 +1,123 @@
+import csv
+import io
+from datetime import date, datetime, timedelta
+from typing import Iterator, List
+
+from sqlalchemy import select, cast, Date
+
+from app.database.connection import SessionLocal
+from app.models.branch import Branch
+from app.models.order import Order
+from app.models.subscription import Subscription
+from app.models.user import User
+
+EXPORT_BATCH_SIZE = 1000
+CSV_HEADER = ["Күні", "Филиал", "Абонемент", "Клиент"]
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _ChunkSink(io.RawIOBase):
+    """ParquetWriter жазған байттарды жинап, әр row group-тан кейін босатып беретін sink"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class StatsExportService:
+    """Абонемент заказдарын CSV/Parquet ретінде ағынмен (streaming) экспорттау"""
+
+    @staticmethod
+    def export_query(branch_ids: List[int], start: date, end: date):
+        next_day = end + timedelta(days=1)
+        return (
+            select(
+                cast(Order.created_at, Date).label("date"),
+                Branch.name.label("branch_name"),
+                Subscription.name.label("subscription_name"),
+                User.full_name.label("user_name"),
+            )
+            .join(Branch, Branch.id == Order.branch_id)
+            .join(Subscription, Subscription.id == Order.subscription_id)
+            .join(User, User.id == Order.user_id)
+            .where(
+                Order.branch_id.in_(branch_ids),
+                Order.paid_by_subscription == True,
+                # [start, end + 1 күн) — created_at индексін қолдана алады
+                Order.created_at >= datetime(start.year, start.month, start.day),
+                Order.created_at < datetime(next_day.year, next_day.month, next_day.day),
+            )
+            .order_by(Order.created_at.desc(), Order.id.desc())
+        )
+
+    @staticmethod
+    def batches(branch_ids: List[int], start: date, end: date, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list]:
+        """Server-side cursor арқылы қатарларды batch_size бойынша беру (жадта бір batch қана)
+
+        Өз session-ын ашады: StreamingResponse жіберілгенде request-тің get_db session-ы жабылған.
+        """
+        with SessionLocal() as db:
+            result = db.execute(
+                StatsExportService.export_query(branch_ids, start, end).execution_options(yield_per=batch_size)
+            )
+            for rows in result.partitions():
+                yield rows
+
+    @staticmethod
+    def csv_stream(branch_ids: List[int], start: date, end: date, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_HEADER)
+        yield buffer.getvalue().encode("utf-8")
+        for rows in StatsExportService.batches(branch_ids, start, end, batch_size):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue().encode("utf-8")
+
+    @staticmethod
+    def parquet_stream(branch_ids: List[int], start: date, end: date, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+        """Әр batch — бөлек row group; файл аяғы (footer) соңында жазылады"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema([
+            ("date", pa.date32()),
+            ("branch_name", pa.string()),
+            ("subscription_name", pa.string()),
+            ("user_name", pa.string()),
+        ])
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for rows in StatsExportService.batches(branch_ids, start, end, batch_size):
+                columns = list(zip(*rows))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                yield sink.drain()
+        yield sink.drain()
@@ -53,6 +53,9 @@ class SubscriptionService:
         ).first()
         
         if pending_sub:
+            # Сол чекпен қайталау (чек URL-ы мазмұнға байланысты): бұрынғы өтінішті қайтару
+            if pending_sub.subscription_id == subscription_id and pending_sub.receipt_url == receipt_url:
+                return pending_sub
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Сізде қаралып жатқан абонемент өтініші бар. Күте тұрыңыз."
@@ -0,0 +1,258 @@
+import argparse
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete, insert, update, func, case, exists, true, text, cast, Date
+from sqlalchemy.dialects.postgresql import insert as pg_insert, array
+from sqlalchemy.orm import Session
+
+from app.models.branch import Branch
+from app.models.order import Order, OrderStatus
+from app.models.subscription import Subscription
+from app.models.subscription_usage import SubscriptionUsageDaily
+
+Usage = SubscriptionUsageDaily
+
+GROUP_COLUMNS = {
+    "day": Usage.day,
+    "branch_id": Usage.branch_id,
+    "subscription_id": Usage.subscription_id,
+}
+
+
+def _status_value(status) -> str:
+    return status.value if isinstance(status, OrderStatus) else str(status)
+
+
+class SubscriptionUsageService:
+    """subscription_usage_daily жиынтығын жүргізу және одан статистика оқу"""
+
+    @staticmethod
+    def is_counted(paid_by_subscription, subscription_id, status) -> bool:
+        """Заказ статистикаға кіре ме (абонементпен, жойылмаған)"""
+        return bool(paid_by_subscription) and subscription_id is not None \
+            and _status_value(status) != OrderStatus.CANCELLED.value
+
+    @staticmethod
+    def add_stmt(order: Order):
+        """Заказды жиынтыққа қосу (upsert)"""
+        day = (order.created_at or datetime.utcnow()).date()
+        stmt = pg_insert(Usage).values(
+            branch_id=order.branch_id,
+            day=day,
+            subscription_id=order.subscription_id,
+            orders=1,
+            user_ids=array([order.user_id]),
+        )
+        current = Usage.__table__.c
+        return stmt.on_conflict_do_update(
+            index_elements=[current.branch_id, current.day, current.subscription_id],
+            set_={
+                "orders": current.orders + 1,
+                "user_ids": case(
+                    (current.user_ids.any(order.user_id), current.user_ids),
+                    else_=func.array_append(current.user_ids, order.user_id),
+                ),
+            },
+        )
+
+    @staticmethod
+    def remove_stmt(order: Order):
+        """Жойылған заказды жиынтықтан алу. Клиенттің осы күні басқа заказы болмаса, оны да алады"""
+        day = (order.created_at or datetime.utcnow()).date()
+        day_start = datetime(day.year, day.month, day.day)
+        other_order = exists().where(
+            Order.id != order.id,
+            Order.user_id == order.user_id,
+            Order.branch_id == order.branch_id,
+            Order.subscription_id == order.subscription_id,
+            Order.paid_by_subscription == True,
+            Order.status != OrderStatus.CANCELLED,
+            Order.created_at >= day_start,
+            Order.created_at < day_start + timedelta(days=1),
+        )
+        return (
+            update(Usage)
+            .where(
+                Usage.branch_id == order.branch_id,
+                Usage.day == day,
+                Usage.subscription_id == order.subscription_id,
+            )
+            .values(
+                orders=func.greatest(Usage.orders - 1, 0),
+                user_ids=case(
+                    (other_order, Usage.user_ids),
+                    else_=func.array_remove(Usage.user_ids, order.user_id),
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def status_change_stmt(order: Order, old_status):
+        """Статус өзгергенде қажет statement (cancelled-ке өтсе — алу, cancelled-тен шықса — қосу), болмаса None"""
+        was_counted = SubscriptionUsageService.is_counted(order.paid_by_subscription, order.subscription_id, old_status)
+        now_counted = SubscriptionUsageService.is_counted(order.paid_by_subscription, order.subscription_id, order.status)
+        if was_counted and not now_counted:
+            return SubscriptionUsageService.remove_stmt(order)
+        if now_counted and not was_counted:
+            return SubscriptionUsageService.add_stmt(order)
+        return None
+
+    @staticmethod
+    def backfill(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> int:
+        """Жиынтықты orders кестесінен қайта есептеу ([start, end] күндері, бос болса — бәрі)"""
+        day = cast(Order.created_at, Date)
+        filters = [
+            Order.paid_by_subscription == True,
+            Order.subscription_id.isnot(None),
+            Order.status != OrderStatus.CANCELLED,
+        ]
+        clear = delete(Usage)
+        if start:
+            filters.append(Order.created_at >= datetime(start.year, start.month, start.day))
+            clear = clear.where(Usage.day >= start)
+        if end:
+            next_day = end + timedelta(days=1)
+            filters.append(Order.created_at < datetime(next_day.year, next_day.month, next_day.day))
+            clear = clear.where(Usage.day <= end)
+
+        rows = (
+            select(
+                Order.branch_id,
+                day,
+                Order.subscription_id,
+                func.count(Order.id),
+                func.array_agg(func.distinct(Order.user_id)),
+            )
+            .where(*filters)
+            .group_by(Order.branch_id, day, Order.subscription_id)
+        )
+        # Қатар жасалып жатқан заказдардың upsert-і backfill аяқталғанша күтеді
+        db.execute(text("LOCK TABLE subscription_usage_daily IN SHARE ROW EXCLUSIVE MODE"))
+        db.execute(clear)
+        result = db.execute(
+            insert(Usage).from_select(
+                ["branch_id", "day", "subscription_id", "orders", "user_ids"], rows
+            )
+        )
+        db.commit()
+        return result.rowcount
+
+    @staticmethod
+    def rebuild_recent(db: Session, days: int = 1) -> int:
+        """Соңғы күндерді orders-тен қайта есептеу (фондық job): жиынтық ауытқып кетсе түзетеді"""
+        return SubscriptionUsageService.backfill(db, start=datetime.utcnow().date() - timedelta(days=days))
+
+    @staticmethod
+    def totals(
+        db: Session,
+        group_by: Iterable[str],
+        branch_ids: List[int],
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        subscription_id: Optional[int] = None,
+        customers: bool = True,
+    ) -> Dict[Tuple, dict]:
+        """Жиынтықтан заказ және distinct клиент саны: {топ кілті: {"orders", "customers"}}
+
+        Заказ саны жай қосылады (O(күн × филиал)); клиенттер бірнеше күн/филиалда қайталануы мүмкін,
+        сондықтан user_ids массивтері unnest арқылы distinct саналады.
+        """
+        columns = [GROUP_COLUMNS[name] for name in group_by]
+        filters = [Usage.branch_id.in_(branch_ids)]
+        if start:
+            filters.append(Usage.day >= start)
+        if end:
+            filters.append(Usage.day <= end)
+        if subscription_id:
+            filters.append(Usage.subscription_id == subscription_id)
+
+        result: Dict[Tuple, dict] = {}
+        order_rows = db.execute(
+            select(*columns, func.sum(Usage.orders))
+            .where(*filters)
+            .group_by(*columns)
+            .having(func.sum(Usage.orders) > 0)
+        ).all()
+        for row in order_rows:
+            result[tuple(row[:-1])] = {"orders": int(row[-1] or 0), "customers": 0}
+
+        if customers and result:
+            users = func.unnest(Usage.user_ids).table_valued("user_id").render_derived()
+            customer_rows = db.execute(
+                select(*columns, func.count(func.distinct(users.c.user_id)))
+                .select_from(Usage)
+                .join(users, true())
+                .where(*filters)
+                .group_by(*columns)
+            ).all()
+            for row in customer_rows:
+                if tuple(row[:-1]) in result:
+                    result[tuple(row[:-1])]["customers"] = row[-1]
+        return result
+
+    @staticmethod
+    def branch_summary(db: Session, branch_ids: List[int]) -> list:
+        """Әр филиал бойынша заказ, distinct клиент және ең көп қолданылған абонемент — бір SQL сұранысымен
+
+        Ең көп абонемент row_number() терезе функциясымен таңдалады (тең болса — кіші id).
+        Заказы жоқ филиалдар да қайтарылады (0, None).
+        """
+        orders = func.sum(Usage.orders)
+        per_subscription = (
+            select(
+                Usage.branch_id,
+                Usage.subscription_id,
+                orders.label("orders"),
+                func.sum(orders).over(partition_by=Usage.branch_id).label("branch_orders"),
+                func.row_number().over(
+                    partition_by=Usage.branch_id,
+                    order_by=(orders.desc(), Usage.subscription_id),
+                ).label("rank"),
+            )
+            .where(Usage.branch_id.in_(branch_ids))
+            .group_by(Usage.branch_id, Usage.subscription_id)
+            .subquery()
+        )
+        users = func.unnest(Usage.user_ids).table_valued("user_id").render_derived()
+        customers = (
+            select(Usage.branch_id, func.count(func.distinct(users.c.user_id)).label("customers"))
+            .select_from(Usage)
+            .join(users, true())
+            .where(Usage.branch_id.in_(branch_ids))
+            .group_by(Usage.branch_id)
+            .subquery()
+        )
+        return db.execute(
+            select(
+                Branch.id.label("branch_id"),
+                Branch.name.label("branch_name"),
+                func.coalesce(per_subscription.c.branch_orders, 0).label("total_orders"),
+                func.coalesce(customers.c.customers, 0).label("total_customers"),
+                Subscription.name.label("top_subscription"),
+                func.coalesce(per_subscription.c.orders, 0).label("top_subscription_count"),
+            )
+            .outerjoin(
+                per_subscription,
+                (per_subscription.c.branch_id == Branch.id) & (per_subscription.c.rank == 1),
+            )
+            .outerjoin(Subscription, Subscription.id == per_subscription.c.subscription_id)
+            .outerjoin(customers, customers.c.branch_id == Branch.id)
+            .where(Branch.id.in_(branch_ids))
+            .order_by(Branch.id)
+        ).all()
+
+
+if __name__ == "__main__":
+    # python -m app.service.subscription_usage_service [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    from app.database.connection import SessionLocal
+
+    parser = argparse.ArgumentParser(description="subscription_usage_daily жиынтығын orders-тен қайта есептеу")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        count = SubscriptionUsageService.backfill(session, args.start, args.end)
+    print(f"✅ subscription_usage_daily: {count} rows rebuilt")
@@ -1,3 +1,6 @@
+import uuid
+from datetime import datetime, timedelta
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -16,4 +19,129 @@ def db_session():
     try:
         yield session
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+
+@pytest.fixture(scope="session")
+def access_token():
+    """Пайдаланушыға access token жасау (sub, role, ver)"""
+    from app.service.auth_service import AuthService
+
+    def make(user) -> str:
+        return AuthService.create_access_token({"sub": user.id, "role": user.role.value, "ver": user.token_version})
+    return make
+
+
+@pytest.fixture(scope="session")
+def auth_headers(access_token):
+    """Пайдаланушының Authorization header-і"""
+    def make(user) -> dict:
+        return {"Authorization": f"Bearer {access_token(user)}"}
+    return make
+
+
+@pytest.fixture(scope="module")
+def order_setup(db_session):
+    """Заказ тесттеріне арналған филиал, тағамдар және абонемент"""
+    from app.models import (
+        User, Restaurant, Branch, Food, MenuType, BranchMenu,
+        Subscription, SubscriptionMenu, UserSubscription, Order, OrderItem, BranchRevenue
+    )
+    from app.models.user import UserRole
+
+    suffix = uuid.uuid4().hex[:8]
+    owner = User(
+        full_name="Test Owner",
+        email=f"test_owner_{suffix}@example.com",
+        hashed_password="x",
+        role=UserRole.OWNER
+    )
+    db_session.add(owner)
+    db_session.flush()
+
+    restaurant = Restaurant(name=f"Test Restaurant {suffix}", owner_id=owner.id)
+    db_session.add(restaurant)
+    db_session.flush()
+
+    branch = Branch(name=f"Test Branch {suffix}", address="Test", restaurant_id=restaurant.id)
+    db_session.add(branch)
+    db_session.flush()
+
+    foods = [
+        Food(name=f"Test Food {i}", menu_type=MenuType.SUBSCRIPTION, owner_id=owner.id)
+        for i in range(10)
+    ]
+    db_session.add_all(foods)
+    db_session.flush()
+
+    db_session.add_all([
+        BranchMenu(branch_id=branch.id, food_id=f.id, is_available=True) for f in foods
+    ])
+
+    subscription = Subscription(
+        name=f"Test Subscription {suffix}",
+        price=1000,
+        duration_days=30,
+        meal_limit=20,
+        daily_limit=1
+    )
+    db_session.add(subscription)
+    db_session.flush()
+
+    db_session.add_all([
+        SubscriptionMenu(subscription_id=subscription.id, food_id=f.id) for f in foods
+    ])
+    db_session.commit()
+
+    created_users = []
+
+    def make_client(remaining_meals: int = 20) -> User:
+        """Белсенді абонементі бар жаңа клиент жасау"""
+        user = User(
+            full_name="Test Client",
+            email=f"test_client_{uuid.uuid4().hex[:8]}@example.com",
+            hashed_password="x",
+            role=UserRole.CLIENT,
+            is_email_verified=True
+        )
+        db_session.add(user)
+        db_session.flush()
+
+        db_session.add(UserSubscription(
+            user_id=user.id,
+            subscription_id=subscription.id,
+            start_date=datetime.utcnow(),
+            end_date=datetime.utcnow() + timedelta(days=30),
+            remaining_meals=remaining_meals,
+            is_active=True,
+            status="ACTIVE"
+        ))
+        db_session.commit()
+        created_users.append(user.id)
+        return user
+
+    yield {
+        "branch": branch,
+        "foods": foods,
+        "subscription": subscription,
+        "make_client": make_client,
+    }
+
+    # cleanup
+    db_session.rollback()
+    order_ids = [o[0] for o in db_session.query(Order.id).filter(Order.branch_id == branch.id).all()]
+    if order_ids:
+        db_session.query(BranchRevenue).filter(BranchRevenue.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db_session.query(OrderItem).filter(OrderItem.order_id.in_(order_ids)).delete(synchronize_session=False)
+        db_session.query(Order).filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+    db_session.query(UserSubscription).filter(UserSubscription.subscription_id == subscription.id).delete(synchronize_session=False)
+    db_session.query(SubscriptionMenu).filter(SubscriptionMenu.subscription_id == subscription.id).delete(synchronize_session=False)
+    db_session.query(BranchMenu).filter(BranchMenu.branch_id == branch.id).delete(synchronize_session=False)
+    db_session.query(Subscription).filter(Subscription.id == subscription.id).delete(synchronize_session=False)
+    db_session.query(Food).filter(Food.id.in_([f.id for f in foods])).delete(synchronize_session=False)
+    db_session.query(Branch).filter(Branch.id == branch.id).delete(synchronize_session=False)
+    db_session.query(Restaurant).filter(Restaurant.id == restaurant.id).delete(synchronize_session=False)
+    if created_users:
+        db_session.query(User).filter(User.id.in_(created_users)).delete(synchronize_session=False)
+    db_session.query(User).filter(User.id == owner.id).delete(synchronize_session=False)
+    db_session.commit()
@@ -0,0 +1,45 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app.database.pool_metrics import CheckoutWaitHistogram
+from app.models.user import User, UserRole
+
+
+@pytest.fixture(scope="module")
+def admin_headers(db_session, auth_headers):
+    admin = User(
+        full_name="Test Admin",
+        email=f"test_admin_{uuid.uuid4().hex[:8]}@example.com",
+        hashed_password="x",
+        role=UserRole.ADMIN
+    )
+    db_session.add(admin)
+    db_session.commit()
+    yield auth_headers(admin)
+    db_session.delete(admin)
+    db_session.commit()
+
+
+def test_checkout_wait_histogram_is_cumulative():
+    histogram = CheckoutWaitHistogram(buckets=(0.01, 0.1, 1.0))
+    for seconds in (0.001, 0.05, 0.05, 2.0):
+        histogram.observe(seconds)
+    histogram.observe(5.0, timed_out=True)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["timeouts"] == 1
+    assert snapshot["buckets"] == {"le_0.01": 1, "le_0.1": 3, "le_1.0": 3, "le_inf": 5}
+
+
+def test_db_pool_endpoint(client, db_session, admin_headers):
+    db_session.execute(text("SELECT 1"))
+
+    assert client.get("/internal/db-pool").status_code in (401, 403)
+    resp = client.get("/internal/db-pool", headers=admin_headers)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["sync"]["checkout_wait"]["count"] >= 1
+    assert {"size", "checked_in", "checked_out", "overflow"} <= set(data["async"])
@@ -0,0 +1,108 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+from starlette.datastructures import UploadFile
+
+from app.models.FoodImage import FoodImage
+from app.models.food import Food
+from app.service.food_service import FoodService
+from app.utils import s3_upload
+from app.utils.image_variants import VARIANT_WIDTHS, render_variants
+from app.tests.test_s3_upload import s3_stub, stored  # noqa: F401
+
+
+def make_photo(width: int, height: int, mode: str = "RGB") -> bytes:
+    # Шу (noise) — нақты фотоға ұқсас, оңай сығылмайтын сурет
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).convert(mode)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG" if mode == "RGBA" else "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def test_render_variants_resizes_and_encodes_webp_and_jpeg():
+    data = make_photo(2400, 1600)
+    rendered = render_variants(data)
+
+    assert [(name, fmt) for name, fmt, *_ in rendered] == [
+        (name, fmt) for name in VARIANT_WIDTHS for fmt in ("webp", "jpeg")
+    ]
+    for name, fmt, width, height, content_type, ext, blob in rendered:
+        assert width == VARIANT_WIDTHS[name]
+        assert height == round(1600 * width / 2400)
+        with Image.open(io.BytesIO(blob)) as image:
+            assert image.format == ("WEBP" if fmt == "webp" else "JPEG")
+            assert image.size == (width, height)
+
+    thumbs = [blob for name, _, _, _, _, _, blob in rendered if name == "thumb"]
+    assert max(len(blob) for blob in thumbs) * 20 < len(data)
+
+
+def test_render_variants_does_not_upscale_and_flattens_alpha_for_jpeg():
+    rendered = render_variants(make_photo(300, 200, mode="RGBA"))
+
+    sizes = {name: (width, height) for name, _, width, height, *_ in rendered}
+    assert sizes == {"thumb": (160, 107), "medium": (300, 200), "large": (300, 200)}
+    jpeg = next(blob for _, fmt, *_, blob in rendered if fmt == "jpeg")
+    with Image.open(io.BytesIO(jpeg)) as image:
+        assert image.mode == "RGB"
+
+
+def test_upload_images_with_variants_stores_all_variants(s3_stub):
+    photos = [make_photo(1600, 1200) for _ in range(2)]
+    files = [
+        UploadFile(file=io.BytesIO(photo), filename=f"food{i}.jpg", headers={"content-type": "image/jpeg"})
+        for i, photo in enumerate(photos)
+    ]
+
+    results = s3_upload.upload_images_with_variants(files)
+
+    assert len(results) == 2
+    for (original_url, variants), photo in zip(results, photos):
+        assert stored(s3_stub, original_url)[0] == photo
+        assert set(variants) == set(VARIANT_WIDTHS)
+        assert variants["thumb"]["width"] == 160 and variants["thumb"]["height"] == 120
+        assert stored(s3_stub, variants["medium"]["webp"])[1] == "image/webp"
+        assert stored(s3_stub, variants["large"]["jpeg"])[1] == "image/jpeg"
+    # Әр сурет: түпнұсқа + 3 өлшем * 2 формат
+    assert len(s3_stub.objects) == 2 * 7
+
+
+def test_reuploaded_image_reuses_original_and_variants(s3_stub, monkeypatch):
+    photo = make_photo(800, 600)
+
+    def upload():
+        file = UploadFile(file=io.BytesIO(photo), filename="same.jpg", headers={"content-type": "image/jpeg"})
+        return s3_upload.upload_images_with_variants([file])[0]
+
+    first = upload()
+    uploaded = len(s3_stub.objects)
+
+    # Екінші рет сурет өңделмейді және S3-ке ештеңе жүктелмейді
+    monkeypatch.setattr(s3_upload, "get_image_pool", lambda: pytest.fail("image was rendered again"))
+    assert upload() == first
+    assert len(s3_stub.objects) == uploaded == 7
+
+
+def test_upload_rejects_files_pillow_cannot_read(s3_stub):
+    from fastapi import HTTPException
+
+    bad = UploadFile(file=io.BytesIO(b"not an image"), filename="x.jpg", headers={"content-type": "image/jpeg"})
+    with pytest.raises(HTTPException) as exc:
+        s3_upload.upload_images_with_variants([bad])
+
+    assert exc.value.status_code == 400
+    assert s3_stub.objects == {}
+
+
+def test_menu_image_fields_include_variants():
+    variants = {"thumb": {"width": 160, "height": 120, "webp": "t.webp", "jpeg": "t.jpg"}}
+    food = Food(name="Plov", images=[FoodImage(image_url="orig.jpg", variants=variants)])
+    assert FoodService.image_fields(food) == {"image_url": "orig.jpg", "image_variants": variants}
+
+    # Қолмен берілген басқа image_url-ға нұсқалар сәйкес келмейді
+    food.image_url = "https://cdn.example.com/other.jpg"
+    assert FoodService.image_fields(food) == {"image_url": food.image_url, "image_variants": None}
+
+    assert FoodService.image_fields(Food(name="Soup")) == {"image_url": None, "image_variants": None}
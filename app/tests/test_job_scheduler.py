@@ -0,0 +1,146 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.database.connection import async_engine
+from app.models import OtpCode, ScheduledJob
+from app.service.auth_service import AuthService
+from app.service.job_scheduler import JobScheduler
+
+
+def _run(coro):
+    async def scenario():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def job_name(db_session):
+    name = f"test_job_{uuid.uuid4().hex[:8]}"
+    yield name
+    db_session.rollback()
+    db_session.query(ScheduledJob).filter(ScheduledJob.name == name).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def _job_row(db_session, name: str) -> ScheduledJob:
+    db_session.expire_all()
+    return db_session.get(ScheduledJob, name)
+
+
+def test_job_runs_once_across_workers(db_session, job_name):
+    calls = []
+
+    async def job():
+        calls.append(1)
+
+    workers = [JobScheduler(1, 30, worker_id=f"worker-{i}") for i in range(3)]
+    for worker in workers:
+        worker.register(job_name, job, interval_seconds=3600)
+
+    async def scenario():
+        claimed = await asyncio.gather(*(worker.tick() for worker in workers))
+        await asyncio.gather(*(worker.wait_idle() for worker in workers))
+        # Келесі tick: job мерзімі әлі келмеген
+        again = await asyncio.gather(*(worker.tick() for worker in workers))
+        return claimed, again
+
+    claimed, again = _run(scenario())
+
+    assert sorted(len(names) for names in claimed) == [0, 0, 1]
+    assert again == [[], [], []]
+    assert calls == [1]
+    row = _job_row(db_session, job_name)
+    assert row.runs == 1 and row.locked_by is None
+
+
+def test_heartbeat_keeps_long_job_from_being_stolen(db_session, job_name):
+    calls = []
+
+    async def long_job():
+        calls.append(1)
+        await asyncio.sleep(1.5)
+
+    first, second = JobScheduler(1, 0.6, worker_id="first"), JobScheduler(1, 0.6, worker_id="second")
+    # interval 0: lease болмаса, келесі tick-те бірден қайта алынар еді
+    first.register(job_name, long_job, interval_seconds=0)
+    second.register(job_name, long_job, interval_seconds=0)
+
+    async def scenario():
+        assert await first.tick() == [job_name]
+        stolen = []
+        for _ in range(5):
+            await asyncio.sleep(0.25)
+            stolen += await second.tick()
+        await first.wait_idle()
+        return stolen
+
+    assert _run(scenario()) == []
+    assert calls == [1]
+
+
+def test_failure_and_success_are_recorded(db_session, job_name):
+    outcome = {"fail": True}
+
+    async def flaky():
+        if outcome["fail"]:
+            raise RuntimeError("boom")
+
+    scheduler = JobScheduler(1, 30, worker_id="worker")
+    scheduler.register(job_name, flaky, interval_seconds=0)
+
+    async def run_tick():
+        await scheduler.tick()
+        await scheduler.wait_idle()
+
+    _run(run_tick())
+    row = _job_row(db_session, job_name)
+    assert row.failures == 1 and row.last_error == "RuntimeError: boom"
+    assert row.last_success_at is None and row.locked_until is None
+
+    outcome["fail"] = False
+    _run(run_tick())
+    row = _job_row(db_session, job_name)
+    assert row.runs == 2 and row.failures == 1 and row.last_error is None
+    assert row.last_success_at is not None and row.last_duration_ms >= 0
+
+    stats = _run(scheduler.stats())
+    assert any(job["name"] == job_name and job["runs"] == 2 for job in stats["jobs"])
+
+
+def test_sync_job_gets_session(db_session, job_name):
+    received = []
+    scheduler = JobScheduler(1, 30, worker_id="worker")
+    scheduler.register(job_name, lambda db: received.append(isinstance(db, Session)), interval_seconds=60)
+
+    async def scenario():
+        await scheduler.tick()
+        await scheduler.wait_idle()
+
+    _run(scenario())
+    assert received == [True]
+
+
+def test_purge_expired_otps_keeps_recent(db_session):
+    email = f"otp_{uuid.uuid4().hex[:8]}@test.kz"
+    now = datetime.utcnow()
+    db_session.add_all([
+        OtpCode(email=email, code="old", expires_at=now - timedelta(days=3)),
+        OtpCode(email=email, code="recent", expires_at=now - timedelta(minutes=5)),
+        OtpCode(email=email, code="active", expires_at=now + timedelta(minutes=5)),
+    ])
+    db_session.commit()
+
+    assert AuthService.purge_expired_otps(db_session) >= 1
+
+    remaining = [c for (c,) in db_session.query(OtpCode.code).filter(OtpCode.email == email)]
+    assert sorted(remaining) == ["active", "recent"]
+    db_session.query(OtpCode).filter(OtpCode.email == email).delete(synchronize_session=False)
+    db_session.commit()
@@ -0,0 +1,197 @@
+import asyncio
+import socketserver
+import threading
+import time
+import uuid
+
+import pytest
+
+from config import settings
+from app.service.mail_outbox import MailOutbox, mail_outbox
+from app.service.mail_service import MailService
+
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    """Тесттерге арналған қарапайым SMTP сервері (EHLO, AUTH, MAIL, RCPT, DATA)"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpStubHandler)
+        self.messages = []
+        self.connections = 0
+        # Алдағы N DATA командасына 451 (уақытша қате) қайтару
+        self.fail_data = 0
+        self.data_delay = 0.0
+        self.lock = threading.Lock()
+
+
+class SmtpStubHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 stub ESMTP")
+        receivers = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-stub")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif verb == "AUTH":
+                self.reply("235 ok")
+            elif verb == "MAIL":
+                receivers = []
+                self.reply("250 ok")
+            elif verb == "RCPT":
+                receivers.append(command.split(":", 1)[1].strip("<> "))
+                self.reply("250 ok")
+            elif verb == "DATA":
+                self.reply("354 go")
+                body = []
+                while True:
+                    data = self.rfile.readline().decode()
+                    if data in (".\r\n", ""):
+                        break
+                    body.append(data)
+                time.sleep(server.data_delay)
+                with server.lock:
+                    if server.fail_data:
+                        server.fail_data -= 1
+                        self.reply("451 try again later")
+                        continue
+                    server.messages.append((receivers, "".join(body)))
+                self.reply("250 queued")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_stub(monkeypatch):
+    server = SmtpStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "MAIL_SERVER", "127.0.0.1")
+    monkeypatch.setattr(settings, "MAIL_PORT", server.server_address[1])
+    monkeypatch.setattr(settings, "MAIL_STARTTLS", False)
+    monkeypatch.setattr(settings, "MAIL_USERNAME", "noreply@foodlapp.test")
+    monkeypatch.setattr(settings, "MAIL_PASSWORD", "secret")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_outbox(**kwargs) -> MailOutbox:
+    options = dict(max_size=100, batch_size=20, max_attempts=3, retry_base_seconds=0.05, idle_seconds=5)
+    options.update(kwargs)
+    return MailOutbox(**options)
+
+
+def test_outbox_reuses_one_connection_for_many_messages(smtp_stub, monkeypatch):
+    outbox = make_outbox()
+    monkeypatch.setattr("app.service.mail_service.mail_outbox", outbox)
+
+    async def scenario():
+        outbox.start()
+        for i in range(10):
+            MailService.send_otp_email(f"user{i}@example.com", f"{i:06d}")
+        await outbox.flush()
+        await outbox.stop()
+
+    asyncio.run(scenario())
+
+    assert len(smtp_stub.messages) == 10
+    assert smtp_stub.connections == 1
+    assert outbox.stats()["sent"] == 10
+    assert ["user3@example.com"] in [receivers for receivers, _ in smtp_stub.messages]
+
+
+def test_outbox_retries_transient_failures_with_backoff(smtp_stub):
+    outbox = make_outbox()
+    smtp_stub.fail_data = 2
+
+    async def scenario():
+        outbox.start()
+        started = time.perf_counter()
+        outbox.enqueue("retry@example.com", MailService._build_message(
+            settings.MAIL_USERNAME, "retry@example.com", "Test", "text", "<p>html</p>"
+        ))
+        await outbox.flush()
+        elapsed = time.perf_counter() - started
+        await outbox.stop()
+        return elapsed
+
+    elapsed = asyncio.run(scenario())
+
+    # 0.05 + 0.1 секунд backoff
+    assert elapsed >= 0.15
+    assert len(smtp_stub.messages) == 1
+    assert outbox.stats()["retried"] == 2
+    assert outbox.stats()["failed"] == 0
+
+
+def test_outbox_gives_up_after_max_attempts(smtp_stub):
+    outbox = make_outbox(max_attempts=2)
+    smtp_stub.fail_data = 5
+
+    async def scenario():
+        outbox.start()
+        outbox.enqueue("never@example.com", MailService._build_message(
+            settings.MAIL_USERNAME, "never@example.com", "Test", "text", "<p>html</p>"
+        ), fallback="код: 000000")
+        await outbox.flush()
+        await outbox.stop()
+
+    asyncio.run(scenario())
+
+    assert smtp_stub.messages == []
+    assert outbox.stats()["failed"] == 1
+
+
+def test_full_outbox_logs_fallback_instead_of_failing(smtp_stub, capsys):
+    outbox = make_outbox(max_size=1)
+    message = MailService._build_message(settings.MAIL_USERNAME, "full@example.com", "Test", "text", "<p>html</p>")
+
+    async def scenario():
+        outbox.start()
+        outbox.enqueue("full@example.com", message, fallback="код: 111111")
+        # Кезек толы: қате лақтырылмайды
+        outbox.enqueue("full@example.com", message, fallback="код: 222222")
+        await outbox.flush()
+        await outbox.stop()
+
+    asyncio.run(scenario())
+
+    assert "FALLBACK: код: 222222" in capsys.readouterr().out
+    assert outbox.stats()["failed"] == 1
+    assert len(smtp_stub.messages) == 1
+
+
+def test_send_otp_returns_before_smtp_finishes(client, smtp_stub):
+    smtp_stub.data_delay = 1.0
+    email = f"outbox_{uuid.uuid4().hex[:8]}@example.com"
+
+    started = time.perf_counter()
+    resp = client.post("/api/auth/send-otp", json={"email": email})
+    elapsed = time.perf_counter() - started
+
+    assert resp.status_code == 200
+    assert elapsed < 0.8
+
+    # Хат фонда жетеді
+    deadline = time.time() + 5
+    while not smtp_stub.messages and time.time() < deadline:
+        time.sleep(0.05)
+    assert smtp_stub.messages[0][0] == [email]
+    assert mail_outbox.running
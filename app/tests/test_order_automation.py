@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert
+
+from app.configuration.websocket.websocket_server import websocket_manager
+from app.database.connection import async_engine
+from app.models import Branch, BranchRevenue, Order
+from app.models.order import OrderStatus
+from app.service.order_automation import OrderAutomationService
+from app.service.order_board import OrderBoard
+
+
+def _run(coro):
+    async def scenario():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def automation_setup(db_session, order_setup):
+    # Басқа тесттерден қалған ескі заказдарды алдын ала аяқтау
+    _run(OrderAutomationService.run_once())
+
+    second = Branch(name=f"{order_setup['branch'].name} 2", address="Test",
+                    restaurant_id=order_setup["branch"].restaurant_id)
+    db_session.add(second)
+    db_session.commit()
+    user_id = order_setup["make_client"]().id
+    events = []
+    websocket_manager.add_listener(events.append)
+
+    def make_orders(branch_id: int, count: int, age: timedelta, status=OrderStatus.ACCEPTED) -> list:
+        return db_session.scalars(insert(Order).returning(Order.id), [
+            {"user_id": user_id, "branch_id": branch_id, "status": status, "is_paid": True,
+             "created_at": datetime.utcnow() - age, "updated_at": datetime.utcnow() - age}
+            for _ in range(count)
+        ]).all()
+
+    yield {"branches": [order_setup["branch"].id, second.id], "make_orders": make_orders, "events": events}
+
+    websocket_manager.listeners.remove(events.append)
+    db_session.rollback()
+    order_ids = [o[0] for o in db_session.query(Order.id).filter(Order.branch_id == second.id)]
+    db_session.query(BranchRevenue).filter(BranchRevenue.order_id.in_(order_ids)).delete(synchronize_session=False)
+    db_session.query(Order).filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+    db_session.delete(second)
+    db_session.commit()
+
+
+def test_stale_orders_are_completed_in_bulk_with_revenue(db_session, automation_setup):
+    first, second = automation_setup["branches"]
+    make_orders = automation_setup["make_orders"]
+    stale = make_orders(first, 3, timedelta(hours=2)) + make_orders(second, 2, timedelta(hours=3), OrderStatus.READY)
+    fresh = make_orders(first, 1, timedelta(minutes=10))
+    done = make_orders(first, 1, timedelta(hours=2), OrderStatus.CANCELLED)
+    db_session.commit()
+    started = datetime.utcnow()
+
+    assert _run(OrderAutomationService.run_once()) == 5
+
+    db_session.expire_all()
+    statuses = dict(db_session.query(Order.id, Order.status).filter(Order.id.in_(stale + fresh + done)))
+    assert {statuses[i] for i in stale} == {OrderStatus.GIVEN}
+    assert statuses[fresh[0]] == OrderStatus.ACCEPTED
+    assert statuses[done[0]] == OrderStatus.CANCELLED
+    assert all(o.updated_at >= started for o in db_session.query(Order).filter(Order.id.in_(stale)))
+    revenue = db_session.query(BranchRevenue.order_id, BranchRevenue.branch_id, BranchRevenue.final_amount).filter(
+        BranchRevenue.order_id.in_(stale + fresh + done)
+    ).all()
+    assert sorted(revenue) == sorted([(i, first, 0.0) for i in stale[:3]] + [(i, second, 0.0) for i in stale[3:]])
+
+    # Әр филиалға бір оқиға
+    updates = [e for e in automation_setup["events"] if e["event"] == "orders_update"]
+    assert sorted((e["data"]["branch_id"], sorted(o["id"] for o in e["data"]["orders"])) for e in updates) == [
+        (first, sorted(stale[:3])), (second, sorted(stale[3:]))
+    ]
+    assert all(e["data"]["automation"] and e["seq"] for e in updates)
+
+
+def test_batches_use_constant_statements_per_batch(db_session, automation_setup):
+    first, _ = automation_setup["branches"]
+    automation_setup["make_orders"](first, 7, timedelta(hours=2))
+    db_session.commit()
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement.split()[0])
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        assert _run(OrderAutomationService.run_once(batch_size=3)) == 7
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+
+    # 3 + 3 + 1: әр batch — бір UPDATE ... RETURNING және бір INSERT ... SELECT
+    assert [s for s in statements if s in ("UPDATE", "INSERT", "SELECT")] == ["UPDATE", "INSERT"] * 3
+    assert len(automation_setup["events"]) == 3
+
+
+def test_board_applies_batched_update():
+    board = OrderBoard()
+    board.ready = True
+    board.upsert({
+        "id": 1, "user_id": 5, "branch_id": 7, "status": "ready", "is_paid": True, "qr_code": None, "qr_used": False,
+        "created_at": datetime.utcnow(), "items": []
+    })
+
+    board.apply_event({"event": "orders_update", "data": {
+        "branch_id": 7, "orders": [{"id": 1, "status": OrderStatus.GIVEN, "is_paid": True, "user_id": 5}]
+    }})
+
+    assert board.orders(7) == []
@@ -0,0 +1,171 @@
+import asyncio
+
+from app.database.connection import async_engine
+from app.models.order import OrderStatus
+from app.schemas.order_dto import OrderItemRequest
+from app.service.order_board import OrderBoard
+from app.service.order_service import OrderService
+
+
+def _run(coro):
+    async def scenario():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(scenario())
+
+
+def _place_order(db_session, order_setup):
+    return OrderService.create_order(
+        db_session,
+        order_setup["make_client"]().id,
+        order_setup["branch"].id,
+        [OrderItemRequest(food_id=order_setup["foods"][0].id, quantity=2)]
+    )
+
+
+def test_board_rebuilds_active_orders_from_db(db_session, order_setup):
+    order = _place_order(db_session, order_setup)
+    board = OrderBoard()
+    _run(board.rebuild())
+
+    orders = board.orders(order.branch_id, paid_only=True)
+    assert board.ready
+    assert order.id in [o.id for o in orders]
+    board_order = next(o for o in orders if o.id == order.id)
+    assert board_order.branch_name == order_setup["branch"].name
+    assert [(i.food_name, i.quantity) for i in board_order.items] == [("Test Food 0", 2)]
+
+
+def test_board_applies_order_events(db_session, order_setup):
+    order = _place_order(db_session, order_setup)
+    board = OrderBoard()
+    _run(board.rebuild())
+    branch_id = order.branch_id
+
+    board.apply_event({"event": "order_update", "data": {"id": order.id, "branch_id": branch_id, "status": OrderStatus.ACCEPTED}})
+    assert [o.id for o in board.orders(branch_id, [OrderStatus.ACCEPTED])] == [order.id]
+    assert order.id not in [o.id for o in board.orders(branch_id, [OrderStatus.PENDING])]
+
+    board.apply_event({"event": "order_update", "data": {"id": order.id, "branch_id": branch_id, "status": "given"}})
+    assert order.id not in [o.id for o in board.orders(branch_id)]
+
+
+def test_board_loads_unknown_order_on_event(db_session, order_setup):
+    board = OrderBoard()
+    order = _place_order(db_session, order_setup)
+
+    async def scenario():
+        board.apply_event({"event": "order_update", "data": {"id": order.id, "branch_id": order.branch_id, "is_paid": True}})
+        # refresh фонда орындалады
+        for _ in range(50):
+            if board.orders(order.branch_id):
+                break
+            await asyncio.sleep(0.02)
+
+    _run(scenario())
+    assert [o.id for o in board.orders(order.branch_id)] == [order.id]
+
+
+def test_refresh_tasks_are_tracked_logged_and_cancelled(monkeypatch, caplog):
+    board = OrderBoard()
+    started = []
+
+    async def failing(order_id):
+        raise RuntimeError("db down")
+
+    async def slow(order_id):
+        started.append(order_id)
+        await asyncio.sleep(10)
+
+    async def scenario():
+        monkeypatch.setattr(board, "refresh", failing)
+        board.apply_event({"event": "order_update", "data": {"id": 1, "branch_id": 1, "is_paid": True}})
+        assert len(board._refresh_tasks) == 1
+        await asyncio.sleep(0.01)
+        # Аяқталған task жиыннан шығады, қатесі логқа жазылады
+        assert not board._refresh_tasks
+
+        monkeypatch.setattr(board, "refresh", slow)
+        board.apply_event({"event": "order_update", "data": {"id": 2, "branch_id": 1, "is_paid": True}})
+        pending = list(board._refresh_tasks)
+        await asyncio.sleep(0.01)
+        await board.stop_resync()
+        return pending
+
+    pending = _run(scenario())
+    assert started == [2] and all(task.cancelled() for task in pending)
+    assert not board._refresh_tasks
+    assert "db down" in caplog.text
+
+
+def test_screen_orders_same_contract_with_and_without_board(db_session, order_setup, monkeypatch):
+    from types import SimpleNamespace
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.api import screen
+    from app.configuration.security.dependencies import get_current_user
+    from app.models.order import Order
+
+    order = _place_order(db_session, order_setup)
+    db_session.query(Order).filter(Order.id == order.id).update({Order.status: OrderStatus.ACCEPTED})
+    db_session.commit()
+
+    app = FastAPI()
+    app.include_router(screen.router)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(branch_id=order.branch_id)
+    board = OrderBoard()
+    monkeypatch.setattr(screen, "order_board", board)
+
+    with TestClient(app) as c:
+        from_db = c.get("/screen/orders").json()
+    _run(board.rebuild())
+    with TestClient(app) as c:
+        from_board = c.get("/screen/orders").json()
+
+    assert order.id in [o["id"] for o in from_db]
+    assert from_db == from_board
+
+
+def test_resync_picks_up_changes_made_without_broadcast(db_session, order_setup):
+    from app.models.order import Order
+
+    order = _place_order(db_session, order_setup)
+    board = OrderBoard()
+
+    async def scenario():
+        await board.rebuild()
+        assert order.id in [o.id for o in board.orders(order.branch_id)]
+        # Скрипт/админ өзгерісі: оқиға жарияланбайды
+        db_session.query(Order).filter(Order.id == order.id).update({Order.status: OrderStatus.CANCELLED})
+        db_session.commit()
+        board.start_resync(0.05)
+        try:
+            await asyncio.sleep(0.3)
+        finally:
+            await board.stop_resync()
+
+    _run(scenario())
+    assert order.id not in [o.id for o in board.orders(order.branch_id)]
+
+
+def test_events_during_rebuild_are_replayed(db_session, order_setup):
+    order = _place_order(db_session, order_setup)
+    board = OrderBoard()
+
+    async def scenario():
+        rebuild = asyncio.create_task(board.rebuild())
+        await asyncio.sleep(0)
+        # DB snapshot оқылып жатқанда келген оқиға жаңа тақтада жоғалмауы керек
+        board.apply_event({"event": "order_update", "data": {
+            "id": order.id, "branch_id": order.branch_id, "status": "given"
+        }})
+        await rebuild
+
+    _run(scenario())
+    assert board.ready
+    assert order.id not in [o.id for o in board.orders(order.branch_id)]
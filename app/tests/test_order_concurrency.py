@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from app.database.connection import SessionLocal
+from app.models.order import Order
+from app.models.subscription import UserSubscription
+from app.schemas.order_dto import OrderItemRequest
+from app.service.order_service import OrderService
+
+PARALLEL_ORDERS = 200
+
+
+def _place_order(user_id: int, branch_id: int, food_id: int) -> str:
+    db = SessionLocal()
+    try:
+        OrderService.create_order(db, user_id, branch_id, [OrderItemRequest(food_id=food_id)])
+        return "ok"
+    except HTTPException as e:
+        return e.detail
+    finally:
+        db.close()
+
+
+def test_parallel_orders_consume_single_meal(db_session, order_setup):
+    user_id = order_setup["make_client"](remaining_meals=5).id
+    branch_id = order_setup["branch"].id
+    food_id = order_setup["foods"][0].id
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(
+            lambda _: _place_order(user_id, branch_id, food_id),
+            range(PARALLEL_ORDERS)
+        ))
+
+    assert results.count("ok") == 1
+
+    db_session.expire_all()
+    assert db_session.query(Order).filter(Order.user_id == user_id).count() == 1
+    user_sub = db_session.query(UserSubscription).filter(UserSubscription.user_id == user_id).one()
+    assert user_sub.remaining_meals == 4
+
+
+def test_parallel_orders_never_overdraw_meals(db_session, order_setup):
+    users = [order_setup["make_client"](remaining_meals=0).id for _ in range(5)]
+    users += [order_setup["make_client"](remaining_meals=1).id for _ in range(5)]
+    branch_id = order_setup["branch"].id
+    food_id = order_setup["foods"][0].id
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(
+            lambda i: _place_order(users[i % len(users)], branch_id, food_id),
+            range(PARALLEL_ORDERS)
+        ))
+
+    assert results.count("ok") == 5
+
+    db_session.expire_all()
+    remaining = [
+        r[0] for r in db_session.query(UserSubscription.remaining_meals)
+        .filter(UserSubscription.user_id.in_(users)).all()
+    ]
+    assert all(r == 0 for r in remaining)
@@ -0,0 +1,135 @@
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select, func, insert, text
+
+from app.database.connection import engine
+from app.models import Branch, Order, OrderItem, User
+from app.models.order import OrderStatus
+from app.models.user import UserRole
+from app.service.stats_export_service import StatsExportService
+
+SEED_ORDERS = 60_000
+SEED_BRANCHES = 20
+SEED_USERS = 200
+ACTIVE = [OrderStatus.PENDING, OrderStatus.ACCEPTED, OrderStatus.COOKING, OrderStatus.READY]
+
+
+@pytest.fixture(scope="module")
+def seeded(db_session, order_setup):
+    """Жылға таралған 60k заказ: 96% аяқталған, 3% белсенді, 1% жойылған"""
+    suffix = uuid.uuid4().hex[:8]
+    branches = [
+        Branch(name=f"Index Branch {i}", address="Index", restaurant_id=order_setup["branch"].restaurant_id)
+        for i in range(SEED_BRANCHES)
+    ]
+    db_session.add_all(branches)
+    db_session.flush()
+    branch_ids = [b.id for b in branches]
+    user_ids = db_session.scalars(insert(User).returning(User.id), [
+        {"full_name": "Index Client", "email": f"index_{suffix}_{i}@example.com",
+         "hashed_password": "x", "role": UserRole.CLIENT}
+        for i in range(SEED_USERS)
+    ]).all()
+    db_session.execute(text("""
+        INSERT INTO orders (user_id, branch_id, status, qr_code, paid_by_subscription, is_paid, created_at, updated_at)
+        SELECT (:users)[1 + i % :user_count],
+               (:branches)[1 + i % :branch_count],
+               CAST(CASE i % 100 WHEN 0 THEN 'pending' WHEN 1 THEN 'accepted' WHEN 2 THEN 'ready'
+                                 WHEN 3 THEN 'cancelled' ELSE 'given' END AS orderstatus),
+               :prefix || i, true, true,
+               now() - (i % 365) * interval '1 day' - i * interval '1 second',
+               now() - (i % 365) * interval '1 day' - i * interval '1 second'
+        FROM generate_series(1, :total) AS i
+    """), {
+        "users": user_ids, "user_count": SEED_USERS, "branches": branch_ids, "branch_count": SEED_BRANCHES,
+        "prefix": f"idx-{suffix}-", "total": SEED_ORDERS,
+    })
+    db_session.execute(text("""
+        INSERT INTO order_items (order_id, food_name, quantity)
+        SELECT id, 'Index Food', 1 FROM orders WHERE branch_id = ANY(:branches)
+    """), {"branches": branch_ids})
+    db_session.commit()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("ANALYZE orders")
+        conn.exec_driver_sql("ANALYZE order_items")
+
+    yield {"branch_id": branch_ids[0], "user_id": user_ids[0], "qr_code": f"idx-{suffix}-4242"}
+
+    db_session.rollback()
+    db_session.execute(text(
+        "DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE branch_id = ANY(:branches))"
+    ), {"branches": branch_ids})
+    db_session.execute(text("DELETE FROM orders WHERE branch_id = ANY(:branches)"), {"branches": branch_ids})
+    db_session.execute(text("DELETE FROM branches WHERE id = ANY(:branches)"), {"branches": branch_ids})
+    db_session.execute(text("DELETE FROM users WHERE id = ANY(:users)"), {"users": user_ids})
+    db_session.commit()
+
+
+def _plan(stmt) -> dict:
+    sql = stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        return conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()[0]["Plan"]
+
+
+def _seq_scans(plan: dict) -> list:
+    found = []
+    if plan["Node Type"] == "Seq Scan" and plan.get("Relation Name") in ("orders", "order_items"):
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def _hot_queries(seeded) -> dict:
+    branch_id, user_id = seeded["branch_id"], seeded["user_id"]
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        # client.py / order_service.py
+        "client history": select(Order).where(Order.user_id == user_id).order_by(Order.created_at.desc()).limit(30),
+        "daily limit": select(func.count(Order.id)).where(
+            Order.user_id == user_id,
+            Order.created_at >= today_start,
+            Order.paid_by_subscription == True,
+            Order.status != OrderStatus.CANCELLED,
+        ),
+        "qr lookup": select(Order).where(Order.qr_code == seeded["qr_code"]),
+        "order items": select(OrderItem).where(OrderItem.order_id.in_(
+            select(Order.id).where(Order.user_id == user_id).order_by(Order.created_at.desc()).limit(30)
+        )),
+        # cashier.py / screen.py
+        "cashier active": select(Order).where(Order.status.in_(ACTIVE), Order.is_paid == True, Order.branch_id == branch_id),
+        "cashier pending": select(Order).where(
+            Order.status == OrderStatus.PENDING, Order.is_paid == True, Order.branch_id == branch_id
+        ),
+        "cashier history": select(Order).where(
+            Order.status.in_([OrderStatus.GIVEN, OrderStatus.CANCELLED]), Order.branch_id == branch_id
+        ).order_by(Order.created_at.desc()).limit(100),
+        # websocket.py, order_automation.py
+        "board since": select(Order).where(Order.branch_id == branch_id, Order.updated_at > now - timedelta(minutes=5)),
+        "stale orders": select(Order).where(Order.status.in_(ACTIVE), Order.created_at <= now - timedelta(hours=1)),
+        # canteen_admin.py, owner.py
+        "canteen today": select(Order).where(
+            Order.branch_id == branch_id,
+            Order.created_at >= today_start,
+            Order.created_at < today_start + timedelta(days=1),
+        ),
+        "stats export": StatsExportService.export_query([branch_id], date.today() - timedelta(days=7), date.today()),
+    }
+
+
+def test_hot_order_queries_use_indexes(seeded):
+    scans = {name: _seq_scans(_plan(stmt)) for name, stmt in _hot_queries(seeded).items()}
+
+    assert {name: tables for name, tables in scans.items() if tables} == {}
+
+
+def test_active_order_queries_use_partial_index(seeded):
+    plans = [
+        str(_plan(_hot_queries(seeded)[name]))
+        for name in ("cashier active", "cashier pending", "stale orders")
+    ]
+
+    assert all("ix_orders_active_" in plan for plan in plans)
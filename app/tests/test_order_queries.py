@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.database.connection import engine
+from app.schemas.order_dto import OrderItemRequest
+from app.service.order_service import OrderService
+
+
+@contextmanager
+def count_statements():
+    """Engine арқылы орындалған SQL statement-терді санау"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _create_order_statements(db_session, order_setup, item_count: int) -> list:
+    user_id = order_setup["make_client"]().id
+    branch_id = order_setup["branch"].id
+    items = [
+        OrderItemRequest(food_id=food.id, quantity=1)
+        for food in order_setup["foods"][:item_count]
+    ]
+
+    with count_statements() as statements:
+        order = OrderService.create_order(db_session, user_id, branch_id, items)
+
+    assert order.paid_by_subscription
+    assert len(order.items) == item_count
+    return statements
+
+
+def test_create_order_statement_count_is_constant(db_session, order_setup):
+    single = _create_order_statements(db_session, order_setup, 1)
+    many = _create_order_statements(db_session, order_setup, 10)
+
+    # lock + context + foods + UPDATE subscription + INSERT order + usage upsert + INSERT items + refresh
+    assert len(single) <= 8
+    assert len(many) == len(single)
@@ -0,0 +1,48 @@
+import threading
+import uuid
+
+import pytest
+from argon2 import PasswordHasher
+from fastapi import HTTPException
+
+from app.models.user import User, UserRole
+from app.service.password_hasher import PasswordHashPool, password_hasher
+
+
+def test_login_rehashes_outdated_argon2_params(client, db_session):
+    old_hash = PasswordHasher(time_cost=1, memory_cost=8192, parallelism=1).hash("secret123")
+    user = User(
+        full_name="Rehash Client",
+        email=f"rehash_{uuid.uuid4().hex[:8]}@example.com",
+        hashed_password=old_hash,
+        role=UserRole.CLIENT,
+        is_email_verified=True
+    )
+    db_session.add(user)
+    db_session.commit()
+    try:
+        resp = client.post("/api/auth/login", json={"email": user.email, "password": "secret123"})
+        assert resp.status_code == 200
+
+        db_session.refresh(user)
+        assert user.hashed_password != old_hash
+        assert not password_hasher.hasher.check_needs_rehash(user.hashed_password)
+        assert password_hasher.verify(user.hashed_password, "secret123") == (True, None)
+    finally:
+        db_session.delete(user)
+        db_session.commit()
+
+
+def test_pool_rejects_when_queue_is_full():
+    release = threading.Event()
+    pool = PasswordHashPool(PasswordHasher(), workers=1, max_pending=2)
+
+    blocked = [pool._submit(release.wait, 5) for _ in range(2)]
+    with pytest.raises(HTTPException) as exc:
+        pool.hash("x")
+    assert exc.value.status_code == 503
+
+    release.set()
+    assert [f.result() for f in blocked] == [True, True]
+    assert pool.pending == 0
+    assert pool.verify(pool.hash("x"), "x") == (True, None)
@@ -0,0 +1,78 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.configuration.security.principal_cache import principal_cache
+from app.database.connection import engine
+from app.models.user import User, UserRole
+from app.service.auth_service import AuthService
+
+
+@pytest.fixture
+def auth_user(db_session):
+    user = User(
+        full_name="Cache Client",
+        email=f"cache_{uuid.uuid4().hex[:8]}@example.com",
+        hashed_password=AuthService.get_password_hash("oldpassword"),
+        role=UserRole.CLIENT,
+        is_email_verified=True
+    )
+    db_session.add(user)
+    db_session.commit()
+    principal_cache.clear()
+    yield user
+    principal_cache.clear()
+    db_session.rollback()
+    db_session.query(User).filter(User.id == user.id).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def test_cached_principal_needs_no_queries(db_session, auth_user, access_token):
+    token = access_token(auth_user)
+    AuthService.get_current_user(db_session, token)
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        user = AuthService.get_current_user(db_session, token)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert statements == []
+    assert user.id == auth_user.id
+    assert user.role == UserRole.CLIENT
+
+
+def test_revoked_token_is_rejected(db_session, auth_user, access_token):
+    token = access_token(auth_user)
+    AuthService.get_current_user(db_session, token)
+
+    AuthService.revoke_tokens(auth_user)
+    db_session.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        AuthService.get_current_user(db_session, token)
+    assert exc.value.status_code == 401
+    assert AuthService.get_current_user(db_session, access_token(auth_user)).id == auth_user.id
+
+
+def test_profile_and_password_changes_invalidate_cache(client, auth_user, auth_headers):
+    headers = auth_headers(auth_user)
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "Cache Client"
+
+    client.put("/api/auth/me", json={"full_name": "Renamed"}, headers=headers)
+    assert client.get("/api/auth/me", headers=headers).json()["full_name"] == "Renamed"
+
+    resp = client.post(
+        "/api/auth/me/change-password",
+        json={"old_password": "oldpassword", "new_password": "newpassword"},
+        headers=headers
+    )
+    assert resp.status_code == 200
+    assert client.get("/api/auth/me", headers=headers).status_code == 401
+
+    new_headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+    assert client.get("/api/auth/me", headers=new_headers).status_code == 200
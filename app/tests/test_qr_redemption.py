@@ -0,0 +1,242 @@
+import secrets
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, insert, select
+
+from app.database.connection import SessionLocal, engine
+from app.models import BranchRevenue, Order, OrderItem, User
+from app.models.order import OrderStatus
+from app.models.user import UserRole
+from app.schemas.order_dto import OrderItemRequest
+from app.service.order_service import OrderService
+from app.service.qr_token_service import QrTokenService
+from config import settings
+
+PARALLEL_SCANS = 20
+LATENCY_CODES = 200
+
+
+@pytest.fixture
+def qr_setup(db_session, order_setup):
+    branch_id = order_setup["branch"].id
+    user_id = order_setup["make_client"]().id
+    created = []
+
+    def make_orders(count: int, status=OrderStatus.READY, expires_in=timedelta(minutes=10), owner_id=None) -> list:
+        rows = db_session.execute(insert(Order).returning(Order.id, Order.qr_code), [
+            {"user_id": owner_id or user_id, "branch_id": branch_id, "status": status, "is_paid": True,
+             "qr_code": secrets.token_urlsafe(32), "qr_used": False, "qr_expire_at": datetime.utcnow() + expires_in}
+            for _ in range(count)
+        ]).all()
+        db_session.commit()
+        created.extend(row.id for row in rows)
+        return rows
+
+    yield {
+        "user_id": user_id,
+        "make_orders": make_orders,
+        "make_client": order_setup["make_client"],
+        # OrderService.create_order арқылы жасалған заказдарды тазалауға тіркеу
+        "track": created.append,
+    }
+
+    db_session.rollback()
+    db_session.query(BranchRevenue).filter(BranchRevenue.order_id.in_(created)).delete(synchronize_session=False)
+    db_session.query(OrderItem).filter(OrderItem.order_id.in_(created)).delete(synchronize_session=False)
+    db_session.query(Order).filter(Order.id.in_(created)).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def _scan(qr_code: str, user_id: int) -> str:
+    db = SessionLocal()
+    try:
+        OrderService.scan_order_by_qr(db, qr_code, user_id)
+        return "ok"
+    except HTTPException as e:
+        return e.detail
+    finally:
+        db.close()
+
+
+def test_parallel_scans_redeem_once(db_session, qr_setup):
+    (order,) = qr_setup["make_orders"](1)
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: _scan(order.qr_code, qr_setup["user_id"]), range(PARALLEL_SCANS)))
+
+    assert results.count("ok") == 1
+    assert results.count("QR код қолданылған") == PARALLEL_SCANS - 1
+    db_session.expire_all()
+    redeemed = db_session.get(Order, order.id)
+    assert redeemed.status == OrderStatus.GIVEN and redeemed.qr_used
+    assert db_session.query(BranchRevenue).filter(BranchRevenue.order_id == order.id).count() == 1
+
+
+def test_rejections_keep_their_reason(qr_setup):
+    user_id = qr_setup["user_id"]
+    other_user = qr_setup["make_client"]().id
+    (foreign,) = qr_setup["make_orders"](1, owner_id=other_user)
+    (expired,) = qr_setup["make_orders"](1, expires_in=timedelta(minutes=-1))
+    (cooking,) = qr_setup["make_orders"](1, status=OrderStatus.COOKING)
+
+    assert _scan("missing", user_id) == "QR код табылмады"
+    assert _scan(foreign.qr_code, user_id) == "Бұл заказ сіздің емес"
+    assert _scan(expired.qr_code, user_id) == "QR код мерзімі өткен"
+    assert _scan(cooking.qr_code, user_id) == "Заказ әлі дайын емес"
+
+
+def test_redemption_p99_under_concurrent_scans(qr_setup):
+    """Әр код 4 рет қатар сканерленеді; барлық сканерлеу уақытының p99-ы"""
+    orders = qr_setup["make_orders"](LATENCY_CODES)
+    scans = [order.qr_code for order in orders for _ in range(4)]
+
+    def timed_scan(qr_code: str):
+        started = time.perf_counter()
+        result = _scan(qr_code, qr_setup["user_id"])
+        return result, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(timed_scan, scans))
+
+    latencies = sorted(ms for _, ms in results)
+    p50, p99 = latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+    print(f"QR redemption over {len(scans)} concurrent scans: p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    assert [result for result, _ in results].count("ok") == LATENCY_CODES
+    assert p99 < 1000
+
+
+@pytest.fixture
+def cashier_headers(db_session, order_setup, auth_headers):
+    def make(branch_id: int) -> dict:
+        cashier = User(
+            full_name="Test Cashier", email=f"test_cashier_{uuid.uuid4().hex[:8]}@example.com",
+            hashed_password="x", role=UserRole.CASHIER, branch_id=branch_id
+        )
+        db_session.add(cashier)
+        db_session.commit()
+        cashiers.append(cashier.id)
+        return auth_headers(cashier)
+
+    cashiers = []
+    yield make
+    db_session.rollback()
+    db_session.query(User).filter(User.id.in_(cashiers)).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def test_cashier_verify_qr_endpoint(client, order_setup, qr_setup, cashier_headers):
+    (order,) = qr_setup["make_orders"](1)
+    own_branch = cashier_headers(order_setup["branch"].id)
+
+    resp = client.post(f"/api/cashier/orders/verify-qr/{order.qr_code}", headers=own_branch)
+    assert resp.status_code == 200
+    assert resp.json()["valid"] is True and resp.json()["order"]["status"] == OrderStatus.GIVEN.value
+
+    resp = client.post(f"/api/cashier/orders/verify-qr/{order.qr_code}", headers=own_branch)
+    assert resp.status_code == 400 and resp.json()["detail"] == "QR код қолданылған"
+
+
+@pytest.fixture
+def signed_tokens(monkeypatch):
+    monkeypatch.setattr(settings, "QR_SIGNED_TOKENS", True)
+
+
+def _statements(fn) -> tuple:
+    """fn орындалғанда жіберілген SQL және лақтырылған HTTPException (болмаса None)"""
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        fn()
+    except HTTPException as e:
+        return statements, e
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return statements, None
+
+
+def test_signed_token_round_trip_and_tamper():
+    expires = datetime(2030, 1, 1, 12, 0, 0)
+    token = QrTokenService.issue(41, 7, 9, expires)
+
+    assert token.startswith("q1.") and len(token) < 60
+    assert tuple(QrTokenService.parse(token)) == (41, 7, 9, expires)
+    tampered = token[:-2] + ("AA" if token[-2:] != "AA" else "BB")
+    assert QrTokenService.parse(tampered) is None
+    assert QrTokenService.parse(secrets.token_urlsafe(32)) is None
+
+
+def test_signed_token_rejects_foreign_and_expired_without_db(db_session, qr_setup, signed_tokens):
+    (order,) = qr_setup["make_orders"](1)
+    branch_id = db_session.get(Order, order.id).branch_id
+    token = OrderService.generate_order_qr(db_session, order.id)["qr_code"]
+    assert QrTokenService.is_signed(token)
+    expired = QrTokenService.issue(order.id, branch_id, qr_setup["user_id"], datetime.utcnow() - timedelta(seconds=5))
+
+    db = SessionLocal()
+    try:
+        for call, detail in [
+            (lambda: OrderService.scan_order_by_qr(db, token, qr_setup["user_id"] + 1), "Бұл заказ сіздің емес"),
+            (lambda: OrderService.verify_qr_code(db, token, branch_id + 1), "Бұл заказ басқа филиалдікі"),
+            (lambda: OrderService.scan_order_by_qr(db, expired, qr_setup["user_id"]), "QR код мерзімі өткен"),
+            (lambda: OrderService.scan_order_by_qr(db, token[:-3] + "abc", qr_setup["user_id"]), "QR код табылмады"),
+        ]:
+            statements, error = _statements(call)
+            assert error is not None and error.detail == detail
+            assert statements == []
+    finally:
+        db.close()
+
+    # Кассир өз филиалының кодын қабылдайды
+    db = SessionLocal()
+    try:
+        assert OrderService.verify_qr_code(db, token, branch_id).status == OrderStatus.GIVEN
+    finally:
+        db.close()
+
+
+def test_new_order_gets_signed_token(db_session, order_setup, qr_setup, signed_tokens):
+    user_id = qr_setup["make_client"]().id
+    order = OrderService.create_order(
+        db_session, user_id, order_setup["branch"].id, [OrderItemRequest(food_id=order_setup["foods"][0].id)]
+    )
+    qr_setup["track"](order.id)
+
+    claims = QrTokenService.parse(order.qr_code)
+    assert (claims.order_id, claims.branch_id, claims.user_id) == (order.id, order.branch_id, user_id)
+    assert claims.expires_at == order.qr_expire_at.replace(microsecond=0)
+
+
+def test_regenerated_signed_token_invalidates_previous(db_session, qr_setup, signed_tokens):
+    (order,) = qr_setup["make_orders"](1)
+    old = OrderService.generate_order_qr(db_session, order.id)["qr_code"]
+    new = OrderService.generate_order_qr(db_session, order.id)["qr_code"]
+
+    assert _scan(old, qr_setup["user_id"]) == "QR код табылмады"
+    assert _scan(new, qr_setup["user_id"]) == "ok"
+
+
+def test_qr_lookup_microbenchmark(db_session, qr_setup):
+    """Қолтаңбаны тексеру vs qr_code бойынша іздеу vs primary key бойынша іздеу"""
+    orders = qr_setup["make_orders"](100)
+    tokens = [QrTokenService.issue(o.id, 1, qr_setup["user_id"], datetime.utcnow() + timedelta(minutes=5)) for o in orders]
+
+    def per_call_us(fn, items, repeat=1) -> float:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for item in items:
+                fn(item)
+        return (time.perf_counter() - started) / (len(items) * repeat) * 1e6
+
+    with engine.connect() as conn:
+        by_code = per_call_us(lambda o: conn.execute(select(Order.id).where(Order.qr_code == o.qr_code)).one(), orders, 5)
+        by_pk = per_call_us(lambda o: conn.execute(select(Order.id).where(Order.id == o.id)).one(), orders, 5)
+    signed = per_call_us(QrTokenService.parse, tokens, 50)
+
+    print(f"QR lookup per call: signed token {signed:.1f} us, qr_code index {by_code:.1f} us, primary key {by_pk:.1f} us")
+    assert signed < by_pk
@@ -0,0 +1,103 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.database.connection import async_engine
+from app.models import BranchRevenue, Order, User
+from app.models.order import OrderStatus
+from app.service.order_automation import OrderAutomationService
+from app.service.revenue_service import RevenueService
+
+
+@pytest.fixture
+def revenue_setup(db_session, order_setup, auth_headers):
+    branch = order_setup["branch"]
+    user_id = order_setup["make_client"]().id
+    created = []
+
+    def make_order(status=OrderStatus.READY, age=timedelta(0)) -> Order:
+        order_id = db_session.scalar(insert(Order).returning(Order.id).values(
+            user_id=user_id, branch_id=branch.id, status=status,
+            created_at=datetime.utcnow() - age, updated_at=datetime.utcnow() - age
+        ))
+        db_session.commit()
+        created.append(order_id)
+        return db_session.get(Order, order_id)
+
+    owner = db_session.get(User, branch.restaurant.owner_id)
+    yield {
+        "branch_id": branch.id,
+        "branch_name": branch.name,
+        "make_order": make_order,
+        "headers": auth_headers(owner),
+    }
+
+    db_session.rollback()
+    db_session.query(BranchRevenue).filter(BranchRevenue.branch_id == branch.id).delete(synchronize_session=False)
+    db_session.query(Order).filter(Order.id.in_(created)).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def _revenue_rows(db_session, order_id: int) -> int:
+    return db_session.query(BranchRevenue).filter(BranchRevenue.order_id == order_id).count()
+
+
+def test_revenue_is_recorded_once_per_order(db_session, revenue_setup):
+    order = revenue_setup["make_order"]()
+
+    assert RevenueService.record(db_session, order) is True
+    assert RevenueService.record(db_session, order) is False
+    db_session.commit()
+
+    assert _revenue_rows(db_session, order.id) == 1
+
+
+def test_automation_skips_orders_with_revenue(db_session, revenue_setup):
+    # Кассир жазған түсім, бірақ заказ статусы әлі жаңармаған (мысалы, параллель сұраныс)
+    order = revenue_setup["make_order"](OrderStatus.ACCEPTED, age=timedelta(hours=2))
+    RevenueService.record(db_session, order)
+    db_session.commit()
+
+    async def sweep():
+        try:
+            return await OrderAutomationService.run_once()
+        finally:
+            await async_engine.dispose()
+
+    assert asyncio.run(sweep()) >= 1
+
+    db_session.expire_all()
+    assert db_session.get(Order, order.id).status == OrderStatus.GIVEN
+    assert _revenue_rows(db_session, order.id) == 1
+
+
+def test_revenue_stats_aggregate_per_branch(client, db_session, revenue_setup):
+    branch_id = revenue_setup["branch_id"]
+    for amount, discount in [(1000.0, 100.0), (500.0, 0.0)]:
+        db_session.execute(RevenueService.record_stmt(revenue_setup["make_order"](), amount, discount))
+    db_session.commit()
+
+    resp = client.get("/api/owner/stats/revenue", headers=revenue_setup["headers"])
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["branches"] == [{
+        "branch_id": branch_id,
+        "branch_name": revenue_setup["branch_name"],
+        "orders": 2,
+        "amount": 1500.0,
+        "discount_amount": 100.0,
+        "final_amount": 1400.0,
+    }]
+    assert body["total_final_amount"] == 1400.0
+
+    past = date.today() - timedelta(days=10)
+    resp = client.get(
+        "/api/owner/stats/revenue",
+        params={"start_date": past.isoformat(), "end_date": (past + timedelta(days=1)).isoformat()},
+        headers=revenue_setup["headers"],
+    )
+    assert resp.json() == {
+        "total_orders": 0, "total_amount": 0, "total_discount_amount": 0, "total_final_amount": 0, "branches": []
+    }
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from config import settings
+from app.database.connection import SessionLocal
+from app.models.stored_object import StoredObject
+from app.models.subscription import UserSubscription
+from app.service.subscription_service import SubscriptionService
+from app.utils import s3_upload
+
+
+class S3Stub(ThreadingHTTPServer):
+    """Тесттерге арналған S3 сервері: PutObject және multipart upload"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), S3StubHandler)
+        self.objects = {}
+        self.uploads = {}
+        self.parts = 0
+        self.active = 0
+        self.max_active = 0
+        self.delay = 0.0
+        # False: мазмұнның орнына sha256 сақталады (жад өлшеміне stub-тың өзі кірмеуі үшін)
+        self.keep_data = True
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class S3StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _payload(self):
+        if self.server.keep_data:
+            return self._body()
+        digest = hashlib.sha256()
+        remaining = int(self.headers.get("Content-Length", 0))
+        while remaining:
+            block = self.rfile.read(min(remaining, 64 * 1024))
+            digest.update(block)
+            remaining -= len(block)
+        return digest.hexdigest()
+
+    def _reply(self, status: int = 200, body: bytes = b"", headers: dict = None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_PUT(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            data = self._payload()
+            time.sleep(server.delay)
+            etag = f'"{hashlib.md5(str(data).encode()).hexdigest()}"'
+            with server.lock:
+                if "uploadId" in query:
+                    upload = server.uploads[query["uploadId"][0]]
+                    upload[int(query["partNumber"][0])] = data
+                    server.parts += 1
+                else:
+                    server.objects[url.path] = (data, self.headers.get("Content-Type"))
+        finally:
+            with server.lock:
+                server.active -= 1
+        self._reply(headers={"ETag": etag})
+
+    def do_POST(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        body = self._body()
+        bucket, key = url.path.lstrip("/").split("/", 1)
+        with server.lock:
+            if "uploads" in query:
+                upload_id = f"upload-{len(server.uploads) + 1}"
+                server.uploads[upload_id] = {}
+                self.server.objects[f"{url.path}#type"] = self.headers.get("Content-Type")
+                xml = (
+                    f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                    f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+                )
+            else:
+                upload = server.uploads.pop(query["uploadId"][0])
+                numbers = [int(n) for n in re.findall(rb"<PartNumber>(\d+)</PartNumber>", body)]
+                parts = [upload[n] for n in numbers]
+                data = b"".join(parts) if server.keep_data else parts
+                server.objects[url.path] = (data, server.objects.pop(f"{url.path}#type"))
+                xml = (
+                    f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                    f"<ETag>\"x\"</ETag></CompleteMultipartUploadResult>"
+                )
+        self._reply(body=xml.encode(), headers={"Content-Type": "application/xml"})
+
+
+@pytest.fixture
+def s3_stub(monkeypatch):
+    server = S3Stub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(s3_upload, "s3_client", s3_upload.make_s3_client(server.url))
+    yield server
+    server.shutdown()
+    server.server_close()
+    # Келесі тесттер объектілерді қайта жүктеуі үшін индексті тазалау
+    with SessionLocal() as db:
+        db.query(StoredObject).filter(
+            StoredObject.url.in_([settings.AWS_S3_ENDPOINT_URL + path for path in server.objects])
+        ).delete(synchronize_session=False)
+        db.commit()
+
+
+def make_upload(data: bytes, filename: str = "photo.jpg", content_type: str = "image/jpeg") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename, headers={"content-type": content_type})
+
+
+def stored(server: S3Stub, url: str):
+    return server.objects[url.replace(settings.AWS_S3_ENDPOINT_URL, "")]
+
+
+def test_small_file_is_uploaded_with_single_put(s3_stub):
+    url = s3_upload.upload_file_to_s3(make_upload(b"receipt"), "image/jpeg", folder="receipts")
+
+    assert f"/{settings.AWS_S3_BUCKET_NAME}/receipts/" in url and url.endswith(".jpg")
+    assert stored(s3_stub, url) == (b"receipt", "image/jpeg")
+    assert s3_stub.parts == 0
+
+
+def test_large_file_is_streamed_in_bounded_parts(s3_stub, monkeypatch):
+    chunk = 5 * s3_upload.MB
+    monkeypatch.setattr(s3_upload, "transfer_config", s3_upload.make_transfer_config(chunk, chunk, 2))
+    s3_stub.keep_data = False
+    data = os.urandom(24 * s3_upload.MB)
+    upload = make_upload(data, filename="big.png", content_type="image/png")
+
+    tracemalloc.start()
+    try:
+        url = s3_upload.upload_file_to_s3(upload, "image/png")
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    expected = [hashlib.sha256(data[i:i + chunk]).hexdigest() for i in range(0, len(data), chunk)]
+    assert stored(s3_stub, url) == (expected, "image/png")
+    assert s3_stub.parts == 5
+    # Файл толық жадқа оқылмайды: бөлік өлшемі * concurrency шамасында
+    print(f"\nUpload peak memory: {peak / s3_upload.MB:.1f} MB for a {len(data) // s3_upload.MB} MB file")
+    assert peak < 4 * chunk
+
+
+def test_multiple_images_upload_in_parallel(s3_stub):
+    s3_stub.delay = 0.2
+    images = [make_upload(f"image-{i}".encode()) for i in range(4)]
+
+    started = time.perf_counter()
+    urls = s3_upload.upload_files_to_s3(images)
+    elapsed = time.perf_counter() - started
+
+    assert [stored(s3_stub, url)[0] for url in urls] == [f"image-{i}".encode() for i in range(4)]
+    assert s3_stub.max_active > 1
+    assert elapsed < 0.7
+
+
+def test_async_upload_does_not_block_event_loop(s3_stub):
+    s3_stub.delay = 0.3
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        url = await s3_upload.upload_file_to_s3_async(make_upload(b"async"), "image/jpeg", folder="receipts")
+        task.cancel()
+        return url, ticks
+
+    url, ticks = asyncio.run(scenario())
+
+    assert stored(s3_stub, url)[0] == b"async"
+    assert ticks >= 10
+
+
+def test_same_content_is_uploaded_once(s3_stub, db_session):
+    data = os.urandom(2048)
+
+    first = s3_upload.upload_file_to_s3(make_upload(data, filename="a.jpg"), "image/jpeg", folder="receipts")
+    retry = s3_upload.upload_file_to_s3(make_upload(data, filename="retry.jpg"), "image/jpeg", folder="receipts")
+    other = s3_upload.upload_file_to_s3(make_upload(data + b"!"), "image/jpeg", folder="receipts")
+
+    assert retry == first
+    assert other != first
+    assert len(s3_stub.objects) == 2
+    assert first.endswith(f"/receipts/{hashlib.sha256(data).hexdigest()}.jpg")
+
+    row = db_session.query(StoredObject).filter(StoredObject.url == first).one()
+    assert (row.folder, row.size, row.content_type) == ("receipts", len(data), "image/jpeg")
+
+
+def test_purchase_retry_with_same_receipt_is_idempotent(s3_stub, db_session, order_setup):
+    user = order_setup["make_client"]()
+    db_session.query(UserSubscription).filter(UserSubscription.user_id == user.id).update(
+        {"is_active": False, "status": "CANCELLED"}
+    )
+    db_session.commit()
+    subscription_id = order_setup["subscription"].id
+    receipt = os.urandom(1024)
+
+    first_url = s3_upload.upload_file_to_s3(make_upload(receipt), "image/jpeg", folder="receipts")
+    first = SubscriptionService.purchase_subscription(db_session, user.id, subscription_id, first_url)
+
+    retry_url = s3_upload.upload_file_to_s3(make_upload(receipt), "image/jpeg", folder="receipts")
+    retry = SubscriptionService.purchase_subscription(db_session, user.id, subscription_id, retry_url)
+    assert retry.id == first.id
+
+    other_url = s3_upload.upload_file_to_s3(make_upload(os.urandom(1024)), "image/jpeg", folder="receipts")
+    with pytest.raises(HTTPException) as exc:
+        SubscriptionService.purchase_subscription(db_session, user.id, subscription_id, other_url)
+    assert exc.value.status_code == 400
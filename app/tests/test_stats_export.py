@@ -0,0 +1,107 @@
+import csv
+import io
+import math
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.models import Order, User
+from app.models.order import OrderStatus
+from app.service.stats_export_service import StatsExportService
+
+EXPORT_ORDERS = 2500
+START, END = date(2001, 1, 1), date(2001, 1, 10)
+
+
+@pytest.fixture(scope="module")
+def export_setup(db_session, order_setup, auth_headers):
+    branch = order_setup["branch"]
+    client_user = order_setup["make_client"]()
+    first_day = datetime(START.year, START.month, START.day)
+    db_session.execute(insert(Order), [
+        {
+            "user_id": client_user.id,
+            "branch_id": branch.id,
+            "subscription_id": order_setup["subscription"].id,
+            "paid_by_subscription": True,
+            "status": OrderStatus.GIVEN,
+            # 12 күнге таралған: соңғы екі күн диапазоннан тыс
+            "created_at": first_day + timedelta(days=i % 12, seconds=i),
+        }
+        for i in range(EXPORT_ORDERS)
+    ])
+    db_session.commit()
+    in_range = sum(1 for i in range(EXPORT_ORDERS) if i % 12 < 10)
+
+    owner = db_session.get(User, branch.restaurant.owner_id)
+    return {
+        "branch_id": branch.id,
+        "client_name": client_user.full_name,
+        "in_range": in_range,
+        "headers": auth_headers(owner),
+    }
+
+
+def test_csv_export_streams_all_rows_in_range(client, export_setup):
+    resp = client.get(
+        "/api/owner/stats/subscription/export/stream",
+        params={"start_date": START.isoformat(), "end_date": END.isoformat()},
+        headers=export_setup["headers"],
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "text/csv; charset=utf-8"
+    assert resp.headers["content-disposition"] == 'attachment; filename="subscription_stats_2001-01-01_2001-01-10.csv"'
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0] == ["Күні", "Филиал", "Абонемент", "Клиент"]
+    assert len(rows) - 1 == export_setup["in_range"]
+    days = [row[0] for row in rows[1:]]
+    assert days == sorted(days, reverse=True)
+    assert days[0] == END.isoformat() and days[-1] == START.isoformat()
+
+
+def test_json_export_keeps_its_contract(client, export_setup):
+    resp = client.get(
+        "/api/owner/stats/subscription/export",
+        params={"start_date": START.isoformat(), "end_date": END.isoformat()},
+        headers=export_setup["headers"],
+    )
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert set(body) == {"csv_data", "filename", "count"}
+    assert body["filename"] == "subscription_stats_2001-01-01_2001-01-10.csv"
+    assert body["count"] == export_setup["in_range"]
+    rows = list(csv.reader(io.StringIO(body["csv_data"])))
+    assert rows[0] == ["Күні", "Филиал", "Абонемент", "Клиент"]
+    assert len(rows) - 1 == body["count"]
+    assert rows[1][0] == END.isoformat() and rows[1][3] == export_setup["client_name"]
+
+
+def test_csv_stream_yields_bounded_batches(export_setup):
+    chunks = list(StatsExportService.csv_stream([export_setup["branch_id"]], START, END, batch_size=100))
+
+    # Тақырып + әр 100 қатарға бір chunk: барлық нәтиже жадқа жиналмайды
+    assert len(chunks) == 1 + math.ceil(export_setup["in_range"] / 100)
+    assert all(chunk.count(b"\n") <= 100 for chunk in chunks)
+
+
+def test_unknown_format_is_rejected(client, export_setup):
+    resp = client.get(
+        "/api/owner/stats/subscription/export/stream", params={"format": "xlsx"}, headers=export_setup["headers"]
+    )
+    assert resp.status_code == 400
+
+
+def test_parquet_export_writes_row_group_per_batch(export_setup):
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    chunks = list(StatsExportService.parquet_stream([export_setup["branch_id"]], START, END, batch_size=500))
+    table = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+
+    assert table.metadata.num_rows == export_setup["in_range"]
+    assert table.metadata.num_row_groups == math.ceil(export_setup["in_range"] / 500)
+    assert table.schema_arrow.names == ["date", "branch_name", "subscription_name", "user_name"]
+    first = table.read_row_group(0).to_pylist()[0]
+    assert first["date"] == END and first["user_name"] == export_setup["client_name"]
@@ -0,0 +1,238 @@
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app.models.order import Order, OrderStatus
+from app.models.subscription_usage import SubscriptionUsageDaily
+from app.schemas.order_dto import OrderItemRequest
+from app.service.order_service import OrderService
+from app.service.subscription_usage_service import SubscriptionUsageService
+
+
+@pytest.fixture
+def usage_setup(db_session, order_setup):
+    branch_id = order_setup["branch"].id
+    # Алдыңғы тесттердің заказдарымен сәйкестендіру
+    SubscriptionUsageService.backfill(db_session)
+    yield order_setup
+    db_session.rollback()
+    db_session.query(SubscriptionUsageDaily).filter(
+        SubscriptionUsageDaily.branch_id == branch_id
+    ).delete(synchronize_session=False)
+    db_session.commit()
+
+
+def _order(db_session, order_setup, user_id: int) -> Order:
+    items = [OrderItemRequest(food_id=order_setup["foods"][0].id, quantity=1)]
+    return OrderService.create_order(db_session, user_id, order_setup["branch"].id, items)
+
+
+def _rows(db_session, branch_id: int) -> dict:
+    db_session.expire_all()
+    return {
+        (row.day, row.subscription_id): (row.orders, sorted(row.user_ids))
+        for row in db_session.query(SubscriptionUsageDaily).filter(SubscriptionUsageDaily.branch_id == branch_id)
+    }
+
+
+def _cancel(db_session, order: Order):
+    old_status = order.status
+    order.status = OrderStatus.CANCELLED
+    db_session.execute(SubscriptionUsageService.status_change_stmt(order, old_status))
+    db_session.commit()
+
+
+def test_orders_are_counted_in_daily_rollup(db_session, usage_setup):
+    branch_id = usage_setup["branch"].id
+    subscription_id = usage_setup["subscription"].id
+    first, second = usage_setup["make_client"](), usage_setup["make_client"]()
+    before = _rows(db_session, branch_id)
+
+    orders = [_order(db_session, usage_setup, user.id) for user in (first, second)]
+
+    key = (orders[0].created_at.date(), subscription_id)
+    count, user_ids = before.get(key, (0, []))
+    assert _rows(db_session, branch_id)[key] == (count + 2, sorted(user_ids + [first.id, second.id]))
+
+    _cancel(db_session, orders[1])
+    assert _rows(db_session, branch_id)[key] == (count + 1, sorted(user_ids + [first.id]))
+
+    # Жойылмаған статустар арасындағы өзгеріс жиынтыққа әсер етпейді
+    assert SubscriptionUsageService.status_change_stmt(orders[0], OrderStatus.COOKING) is None
+
+
+def test_backfill_matches_incremental_rollup(db_session, usage_setup):
+    branch_id = usage_setup["branch"].id
+    subscription_id = usage_setup["subscription"].id
+    users = [usage_setup["make_client"]() for _ in range(3)]
+    orders = [_order(db_session, usage_setup, user.id) for user in users]
+    _cancel(db_session, orders[2])
+
+    # Өткен күнгі заказ: жиынтыққа backfill арқылы ғана түседі
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    db_session.add(Order(
+        user_id=users[0].id, branch_id=branch_id, subscription_id=subscription_id,
+        paid_by_subscription=True, status=OrderStatus.GIVEN, created_at=yesterday
+    ))
+    db_session.commit()
+
+    incremental = _rows(db_session, branch_id)
+    SubscriptionUsageService.backfill(db_session, start=datetime.utcnow().date())
+    assert _rows(db_session, branch_id) == incremental
+
+    SubscriptionUsageService.backfill(db_session)
+    rebuilt = _rows(db_session, branch_id)
+    assert rebuilt[(yesterday.date(), subscription_id)] == (1, [users[0].id])
+    assert rebuilt[(orders[0].created_at.date(), subscription_id)] == incremental[(orders[0].created_at.date(), subscription_id)]
+
+
+def test_totals_count_distinct_customers_across_days(db_session, usage_setup):
+    branch_id = usage_setup["branch"].id
+    subscription_id = usage_setup["subscription"].id
+    # Заказдары жоқ күндер
+    today = date(2000, 1, 2)
+    yesterday = today - timedelta(days=1)
+    db_session.add_all([
+        SubscriptionUsageDaily(branch_id=branch_id, day=yesterday, subscription_id=subscription_id,
+                               orders=3, user_ids=[1, 2]),
+        SubscriptionUsageDaily(branch_id=branch_id, day=today, subscription_id=subscription_id,
+                               orders=2, user_ids=[2, 3]),
+    ])
+    db_session.commit()
+
+    by_day = SubscriptionUsageService.totals(db_session, ["day"], [branch_id], end=today)
+    assert by_day == {
+        (yesterday,): {"orders": 3, "customers": 2},
+        (today,): {"orders": 2, "customers": 2},
+    }
+    # Клиент 2 екі күнде де бар — бір рет саналады
+    assert SubscriptionUsageService.totals(db_session, ["subscription_id"], [branch_id], end=today) == {
+        (subscription_id,): {"orders": 5, "customers": 3}
+    }
+    assert SubscriptionUsageService.totals(db_session, [], [branch_id], start=today, end=today, customers=False) == {
+        (): {"orders": 2, "customers": 0}
+    }
+
+
+def test_branch_summary_picks_top_subscription_per_branch(db_session, usage_setup):
+    from app.models import Branch, Subscription
+
+    branch = usage_setup["branch"]
+    subscription = usage_setup["subscription"]
+    other = Subscription(name=f"{subscription.name} Extra", price=500, duration_days=7, meal_limit=5)
+    # Басқа заказы жоқ жеке филиал: нәтижелер дәл тексеріледі
+    isolated = Branch(name=f"{branch.name} Isolated", address="Test", restaurant_id=branch.restaurant_id)
+    empty = Branch(name=f"{branch.name} Empty", address="Test", restaurant_id=branch.restaurant_id)
+    db_session.add_all([other, isolated, empty])
+    db_session.flush()
+    day = date(2000, 1, 1)
+    db_session.add_all([
+        SubscriptionUsageDaily(branch_id=isolated.id, day=day, subscription_id=subscription.id, orders=2, user_ids=[1]),
+        SubscriptionUsageDaily(branch_id=isolated.id, day=day, subscription_id=other.id, orders=3, user_ids=[1, 2]),
+        SubscriptionUsageDaily(branch_id=isolated.id, day=date(2000, 1, 2), subscription_id=subscription.id,
+                               orders=2, user_ids=[3]),
+    ])
+    db_session.commit()
+    try:
+        rows = SubscriptionUsageService.branch_summary(db_session, [isolated.id, empty.id])
+    finally:
+        db_session.query(SubscriptionUsageDaily).filter(
+            SubscriptionUsageDaily.branch_id == isolated.id
+        ).delete(synchronize_session=False)
+        db_session.delete(other)
+        db_session.delete(isolated)
+        db_session.delete(empty)
+        db_session.commit()
+
+    # subscription: 2 + 2 = 4 заказ, other: 3; барлығы 7 заказ, 3 клиент
+    assert [tuple(row) for row in rows] == [
+        (isolated.id, isolated.name, 7, 3, subscription.name, 4),
+        (empty.id, empty.name, 0, 0, None, 0),
+    ]
+
+
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="RUN_BENCHMARKS=1 болғанда ғана (1M заказ жасайды)")
+def test_branch_summary_benchmark_1m_orders(db_session):
+    """1M заказ, 20 филиал: by-branch статистикасы жиынтықтан бір сұраныспен"""
+    from app.models import User, Restaurant, Branch, Subscription
+    from app.models.user import UserRole
+
+    total, branch_count, user_count = 1_000_000, 20, 1000
+    start, end = date(2021, 1, 1), date(2023, 12, 31)
+    suffix = uuid.uuid4().hex[:8]
+
+    owner = User(full_name="Bench Owner", email=f"bench_owner_{suffix}@example.com",
+                 hashed_password="x", role=UserRole.OWNER)
+    db_session.add(owner)
+    db_session.flush()
+    restaurant = Restaurant(name=f"Bench Restaurant {suffix}", owner_id=owner.id)
+    db_session.add(restaurant)
+    db_session.flush()
+    branches = [Branch(name=f"Bench Branch {i}", address="Bench", restaurant_id=restaurant.id)
+                for i in range(branch_count)]
+    subscriptions = [Subscription(name=f"Bench {suffix} {i}", price=1000, duration_days=30, meal_limit=20)
+                     for i in range(3)]
+    users = [User(full_name="Bench Client", email=f"bench_{suffix}_{i}@example.com",
+                  hashed_password="x", role=UserRole.CLIENT) for i in range(user_count)]
+    db_session.add_all(branches + subscriptions + users)
+    db_session.commit()
+    branch_ids = [b.id for b in branches]
+
+    try:
+        started = time.perf_counter()
+        db_session.execute(text("""
+            INSERT INTO orders (user_id, branch_id, status, paid_by_subscription, subscription_id, is_paid, created_at)
+            SELECT (:users)[1 + (CAST(i AS bigint) * 7919) % :user_count],
+                   (:branches)[1 + i % :branch_count],
+                   CAST(CASE WHEN i % 50 = 0 THEN 'cancelled' ELSE 'given' END AS orderstatus),
+                   true,
+                   (:subscriptions)[1 + (i / :branch_count + i % 5) % 3],
+                   true,
+                   CAST(:start AS timestamp) + (i % 1095) * interval '1 day' + (i % 600) * interval '1 minute'
+            FROM generate_series(1, :total) AS i
+        """), {
+            "users": [u.id for u in users], "user_count": user_count,
+            "branches": branch_ids, "branch_count": branch_count,
+            "subscriptions": [s.id for s in subscriptions], "start": start, "total": total,
+        })
+        db_session.commit()
+        SubscriptionUsageService.backfill(db_session, start, end)
+        print(f"\ngenerated {total} orders + rollup in {time.perf_counter() - started:.1f} s")
+
+        # Салыстыру үшін: orders кестесін тікелей агрегаттау
+        started = time.perf_counter()
+        reference = db_session.execute(text("""
+            WITH per_subscription AS (
+                SELECT branch_id, subscription_id, count(*) AS orders,
+                       row_number() OVER (PARTITION BY branch_id ORDER BY count(*) DESC, subscription_id) AS rank
+                FROM orders
+                WHERE branch_id = ANY(:branches) AND paid_by_subscription AND status != 'cancelled'
+                GROUP BY branch_id, subscription_id
+            )
+            SELECT o.branch_id, count(*), count(DISTINCT o.user_id), max(p.orders)
+            FROM orders o JOIN per_subscription p ON p.branch_id = o.branch_id AND p.rank = 1
+            WHERE o.branch_id = ANY(:branches) AND o.paid_by_subscription AND o.status != 'cancelled'
+            GROUP BY o.branch_id ORDER BY o.branch_id
+        """), {"branches": branch_ids}).all()
+        scan = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rows = SubscriptionUsageService.branch_summary(db_session, branch_ids)
+        rollup = time.perf_counter() - started
+        print(f"by-branch over {total} orders: orders scan {scan * 1000:.0f} ms, rollup {rollup * 1000:.0f} ms")
+
+        assert [(r.branch_id, r.total_orders, r.total_customers, r.top_subscription_count) for r in rows] == \
+            [tuple(r) for r in reference]
+        assert sum(r.total_orders for r in rows) == total - total // 50
+        assert rollup < scan
+    finally:
+        db_session.rollback()
+        db_session.execute(text("DELETE FROM orders WHERE branch_id = ANY(:branches)"), {"branches": branch_ids})
+        db_session.execute(text("DELETE FROM branches WHERE id = ANY(:branches)"), {"branches": branch_ids})
+        for obj in subscriptions + users + [restaurant, owner]:
+            db_session.delete(obj)
+        db_session.commit()
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from app.api.websocket import fetch_active_orders, handle_websocket_message, websocket_manager
+from app.database.connection import AsyncSessionLocal, async_engine
+from app.models.order import Order
+from app.models.user import User, UserRole
+from app.schemas.order_dto import OrderItemRequest
+from app.service.order_service import OrderService
+
+
+def _fetch(branch_id: int, since: datetime = None):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def scenario():
+        event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            async with AsyncSessionLocal() as db:
+                return await fetch_active_orders(db, branch_id, since)
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+            await async_engine.dispose()
+
+    return asyncio.run(scenario()), statements
+
+
+def test_active_orders_load_names_in_one_query(db_session, order_setup):
+    branch_id = order_setup["branch"].id
+    food_id = order_setup["foods"][0].id
+    clients = [order_setup["make_client"]() for _ in range(3)]
+    for c in clients:
+        OrderService.create_order(db_session, c.id, branch_id, [OrderItemRequest(food_id=food_id)])
+
+    orders, statements = _fetch(branch_id)
+
+    assert len(statements) == 1
+    assert {o["user_id"] for o in orders} >= {c.id for c in clients}
+    assert all(o["user_name"] == "Test Client" for o in orders)
+
+
+def test_active_orders_since_cursor(db_session, order_setup):
+    branch_id = order_setup["branch"].id
+    food_id = order_setup["foods"][0].id
+    old = OrderService.create_order(db_session, order_setup["make_client"]().id, branch_id, [OrderItemRequest(food_id=food_id)])
+    changed = OrderService.create_order(db_session, order_setup["make_client"]().id, branch_id, [OrderItemRequest(food_id=food_id)])
+
+    cursor = datetime.utcnow() - timedelta(minutes=5)
+    db_session.query(Order).filter(Order.id == old.id).update(
+        {Order.updated_at: cursor - timedelta(minutes=1)}, synchronize_session=False
+    )
+    db_session.query(Order).filter(Order.id == changed.id).update(
+        {Order.status: "given", Order.updated_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db_session.commit()
+
+    orders, _ = _fetch(branch_id, since=cursor)
+    ids = {o["id"] for o in orders}
+
+    assert changed.id in ids
+    assert old.id not in ids
+
+
+class _Socket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+
+def _request_since(user: User, since: datetime, branch_id: int = None) -> dict:
+    websocket = _Socket()
+
+    async def scenario():
+        try:
+            await handle_websocket_message(websocket, {
+                "type": "get_active_orders", "data": {"since": since.isoformat(), "branch_id": branch_id}
+            }, user)
+        finally:
+            websocket_manager.disconnect(websocket)
+            await async_engine.dispose()
+
+    asyncio.run(scenario())
+    return websocket.sent[-1]
+
+
+def test_since_is_scoped_to_caller(db_session, order_setup):
+    branch_id = order_setup["branch"].id
+    food_id = order_setup["foods"][0].id
+    me, other = order_setup["make_client"](), order_setup["make_client"]()
+    mine = OrderService.create_order(db_session, me.id, branch_id, [OrderItemRequest(food_id=food_id)])
+    theirs = OrderService.create_order(db_session, other.id, branch_id, [OrderItemRequest(food_id=food_id)])
+    since = datetime.utcnow() - timedelta(minutes=1)
+
+    # Клиент: тек өз заказдары
+    reply = _request_since(me, since)
+    assert reply["type"] == "active_orders" and reply["since"] is not None
+    assert {o["id"] for o in reply["data"]} == {mine.id}
+
+    # Кассир: хабарламадағы бөтен филиал емес, өз филиалы
+    cashier = User(id=-1, role=UserRole.CASHIER, branch_id=branch_id)
+    reply = _request_since(cashier, since, branch_id=branch_id + 1000)
+    assert {mine.id, theirs.id} <= {o["id"] for o in reply["data"]}
+    assert {o["branch_id"] for o in reply["data"]} == {branch_id}
+
+    # Admin: филиалсыз since рұқсат етілмейді
+    admin = User(id=-2, role=UserRole.ADMIN, branch_id=None)
+    assert _request_since(admin, since)["type"] == "error"
+
+
+def test_old_or_large_since_falls_back_to_snapshot(db_session, order_setup, monkeypatch):
+    branch_id = order_setup["branch"].id
+    food_id = order_setup["foods"][0].id
+    client = order_setup["make_client"]()
+    order = OrderService.create_order(db_session, client.id, branch_id, [OrderItemRequest(food_id=food_id)])
+    db_session.query(Order).filter(Order.id == order.id).update({Order.status: "given"}, synchronize_session=False)
+    db_session.commit()
+    cashier = User(id=-1, role=UserRole.CASHIER, branch_id=branch_id)
+
+    # 1970 курсоры: бүкіл кестенің орнына — белсенді заказдар snapshot-ы
+    reply = _request_since(cashier, datetime(1970, 1, 1))
+    assert reply["since"] is None
+    assert order.id not in {o["id"] for o in reply["data"]}
+
+    monkeypatch.setattr("app.api.websocket.settings.WS_SINCE_MAX_ORDERS", 0)
+    reply = _request_since(cashier, datetime.utcnow() - timedelta(minutes=1))
+    assert reply["since"] is None
+    assert all(o["status"] != "given" for o in reply["data"])
+
+
+def test_client_snapshot_fallback_matches_plain_request(db_session, order_setup):
+    branch_id = order_setup["branch"].id
+    food_id = order_setup["foods"][0].id
+    me, other = order_setup["make_client"](), order_setup["make_client"]()
+    OrderService.create_order(db_session, me.id, branch_id, [OrderItemRequest(food_id=food_id)])
+    theirs = OrderService.create_order(db_session, other.id, branch_id, [OrderItemRequest(food_id=food_id)])
+
+    # Ескі курсор snapshot-қа ауысады: since-сіз сұраныстағыдай бүкіл филиал
+    reply = _request_since(me, datetime(1970, 1, 1), branch_id=branch_id)
+    assert reply["since"] is None
+    plain, _ = _fetch(branch_id)
+    assert {o["id"] for o in reply["data"]} == {o["id"] for o in plain}
+    assert theirs.id in {o["id"] for o in reply["data"]}
@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+from app.configuration.websocket.backplane import InMemoryBroker, InMemoryBackplane, RedisBackplane
+from app.configuration.websocket.websocket_server import WebSocketManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+
+def _events(ws: FakeWebSocket, event_type: str) -> list:
+    return [m for m in ws.sent if m["type"] == event_type]
+
+
+def test_order_events_reach_sockets_on_other_workers():
+    async def scenario():
+        broker = InMemoryBroker()
+        worker_a, worker_b = WebSocketManager(), WebSocketManager()
+        await worker_a.start_backplane(InMemoryBackplane(broker))
+        await worker_b.start_backplane(InMemoryBackplane(broker))
+
+        cashier_a, cashier_b = FakeWebSocket(), FakeWebSocket()
+        other_branch, client_b = FakeWebSocket(), FakeWebSocket()
+        await worker_a.connect(cashier_a, "cashier", branch_id=1)
+        await worker_b.connect(cashier_b, "cashier", branch_id=1)
+        await worker_b.connect(other_branch, "client", branch_id=2)
+        await worker_b.connect(client_b, "client", user_id=42)
+
+        await worker_a.broadcast_new_order({"id": 7, "branch_id": 1})
+        await worker_a.broadcast_order_update({"id": 7, "branch_id": 1, "user_id": 42})
+        await worker_a.flush()
+        await worker_b.flush()
+
+        await worker_a.stop_backplane()
+        await worker_b.stop_backplane()
+        return cashier_a, cashier_b, other_branch, client_b
+
+    cashier_a, cashier_b, other_branch, client_b = asyncio.run(scenario())
+
+    for cashier in (cashier_a, cashier_b):
+        assert [m["data"]["id"] for m in _events(cashier, "new_order")] == [7]
+        assert len(_events(cashier, "order_update")) == 1
+    assert cashier_a.sent == cashier_b.sent
+    assert not _events(other_branch, "new_order")
+    assert len(_events(client_b, "order_update")) == 1
+
+
+def test_without_backplane_delivers_locally():
+    async def scenario():
+        manager = WebSocketManager()
+        cashier = FakeWebSocket()
+        await manager.connect(cashier, "cashier", branch_id=1)
+        await manager.broadcast_new_order({"id": 1, "branch_id": 1})
+        await manager.flush()
+        return cashier
+
+    cashier = asyncio.run(scenario())
+    assert _events(cashier, "new_order")
+
+
+class _PubSub:
+    def __init__(self, fail: bool):
+        self.fail = fail
+
+    async def subscribe(self, channel: str):
+        if self.fail:
+            raise ConnectionError("redis down")
+
+    async def listen(self):
+        await asyncio.Event().wait()
+        yield
+
+    async def close(self):
+        pass
+
+
+class _FlakyRedis:
+    """Бірінші жазылу сәтсіз, екіншісі сәтті"""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def pubsub(self):
+        self.attempts += 1
+        return _PubSub(fail=self.attempts == 1)
+
+
+def test_redis_backplane_calls_on_reconnect_after_resubscribe():
+    async def scenario():
+        reconnected = asyncio.Event()
+
+        async def on_reconnect():
+            reconnected.set()
+
+        backplane = RedisBackplane("redis://unused", reconnect_delay=0, on_reconnect=on_reconnect)
+        backplane.redis = _FlakyRedis()
+        listener = asyncio.create_task(backplane._listen(lambda event: None))
+        try:
+            await asyncio.wait_for(reconnected.wait(), timeout=1)
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+        return backplane.redis.attempts
+
+    assert asyncio.run(scenario()) == 2
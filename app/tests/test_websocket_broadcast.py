@@ -0,0 +1,235 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from app.configuration.websocket import websocket_server
+from app.configuration.websocket.websocket_server import WebSocketManager
+
+SOCKETS = 1000
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.delay = 0.0
+        self.fail = False
+        self.closed = False
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def close(self, code: int = 1000):
+        self.closed = True
+
+    async def send_text(self, text: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("socket closed")
+        self.sent.append(json.loads(text))
+
+
+async def _connect_many(manager: WebSocketManager, sockets, role: str, branch_id: int = None, user_id: int = None):
+    for ws in sockets:
+        await manager.connect(ws, role, branch_id=branch_id, user_id=user_id)
+    await manager.flush()
+    for ws in sockets:
+        ws.sent.clear()
+
+
+def test_order_update_is_serialized_once_and_deduplicated(monkeypatch):
+    calls = []
+    real_dumps = json.dumps
+    monkeypatch.setattr(websocket_server.json, "dumps", lambda obj, **kw: calls.append(obj) or real_dumps(obj, **kw))
+
+    async def scenario():
+        manager = WebSocketManager()
+        cashiers = [FakeWebSocket() for _ in range(5)]
+        await _connect_many(manager, cashiers, "cashier", branch_id=1)
+        client = FakeWebSocket()
+        await _connect_many(manager, [client], "client", branch_id=1, user_id=42)
+        calls.clear()
+
+        await manager.broadcast_order_update({"id": 1, "branch_id": 1, "user_id": 42})
+        await manager.flush()
+        return cashiers, client
+
+    cashiers, client = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert all(len(ws.sent) == 1 for ws in cashiers + [client])
+
+
+def test_failed_and_stalled_sockets_are_dropped():
+    async def scenario():
+        manager = WebSocketManager(send_timeout=0.05)
+        healthy, broken, stalled = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        await _connect_many(manager, [healthy, broken, stalled], "cashier", branch_id=1)
+        broken.fail = True
+        stalled.delay = 1
+
+        await manager.broadcast_new_order({"id": 1, "branch_id": 1})
+        await manager.flush()
+        return manager, healthy, stalled
+
+    manager, healthy, stalled = asyncio.run(scenario())
+
+    assert len(healthy.sent) == 1
+    assert manager.branch_connections[1] == {healthy}
+    assert manager.active_connections["cashier"] == {healthy}
+    assert manager.get_queue_stats()["dropped"]["send_failed"] == 2
+    assert stalled.closed
+
+
+def _stalled_client_scenario(policy: str, updates):
+    async def scenario():
+        manager = WebSocketManager(queue_size=3, overflow_policy=policy, send_timeout=5)
+        stalled = FakeWebSocket()
+        await _connect_many(manager, [stalled], "client", user_id=42)
+        stalled.delay = 0.05
+
+        for order_id, status in updates:
+            await manager.broadcast_order_update({"id": order_id, "status": status, "user_id": 42})
+        await manager.flush()
+        return manager, stalled
+
+    return asyncio.run(scenario())
+
+
+def test_drop_oldest_policy_keeps_latest_messages():
+    updates = [(i, "pending") for i in range(1, 7)]
+    manager, stalled = _stalled_client_scenario("drop_oldest", updates)
+
+    # Кезекте соңғы 3 хабарлама қалады
+    assert [m["data"]["id"] for m in stalled.sent] == [4, 5, 6]
+    assert manager.get_queue_stats()["dropped"] == {"dropped_oldest": 3}
+
+
+def test_coalesce_policy_keeps_latest_status_per_order():
+    updates = [(1, "pending"), (2, "pending"), (3, "pending"), (4, "pending"), (2, "cooking"), (2, "ready")]
+    manager, stalled = _stalled_client_scenario("coalesce", updates)
+
+    # 4-ші заказға орын жоқ — ең ескісі түседі, 2-ші заказдың статустары біріктіріледі
+    assert [(m["data"]["id"], m["data"]["status"]) for m in stalled.sent] == [
+        (2, "ready"), (3, "pending"), (4, "pending")
+    ]
+    assert manager.get_queue_stats()["dropped"] == {"dropped_oldest": 1, "coalesced": 2}
+
+
+@pytest.mark.parametrize("policy", ["drop_oldest", "coalesce"])
+def test_dropped_sequenced_messages_request_resync(policy):
+    async def scenario():
+        manager = WebSocketManager(queue_size=3, overflow_policy=policy, send_timeout=5)
+        stalled = FakeWebSocket()
+        await _connect_many(manager, [stalled], "client", branch_id=1, user_id=42)
+        stalled.delay = 0.01
+
+        for order_id, status in [(1, "pending"), (2, "pending"), (3, "pending"), (1, "cooking"), (4, "pending")]:
+            await manager.broadcast_order_update({"id": order_id, "status": status, "branch_id": 1, "user_id": 42})
+        await manager.flush()
+        return manager, stalled
+
+    manager, stalled = asyncio.run(scenario())
+
+    # seq үзілісі жасырын қалмайды: клиент алдымен resync_required алады
+    assert stalled.sent[0] == {"type": "resync_required", "reason": "queue_overflow"}
+    seqs = [m["seq"] for m in stalled.sent[1:]]
+    assert seqs == sorted(seqs) and len(seqs) == 3
+    assert manager.get_queue_stats()["dropped"]["resync_required"] == 1
+
+
+def test_orders_update_is_split_for_clients_without_capability():
+    orders = [{"id": 1, "status": "given", "user_id": 42}, {"id": 2, "status": "given", "user_id": 43}]
+
+    async def scenario():
+        manager = WebSocketManager()
+        legacy_cashier, new_cashier = FakeWebSocket(), FakeWebSocket()
+        legacy_client, new_client = FakeWebSocket(), FakeWebSocket()
+        await _connect_many(manager, [legacy_cashier], "cashier", branch_id=1)
+        await manager.connect(new_cashier, "cashier", branch_id=1, capabilities={"orders_update"})
+        await _connect_many(manager, [legacy_client], "client", user_id=42)
+        await manager.connect(new_client, "client", user_id=43, capabilities={"orders_update"})
+        await manager.flush()
+        new_cashier.sent.clear()
+        new_client.sent.clear()
+
+        await manager.broadcast_orders_update(1, orders, automation=True)
+        await manager.flush()
+        replay = manager.events_for(legacy_cashier, manager.events_since(1, 0, manager.epoch))
+        return legacy_cashier, new_cashier, legacy_client, new_client, replay
+
+    legacy_cashier, new_cashier, legacy_client, new_client, replay = asyncio.run(scenario())
+
+    # Жаңа клиенттер бір batch алады
+    assert [m["type"] for m in new_cashier.sent + new_client.sent] == ["orders_update", "orders_update"]
+    # Ескі кассир әр заказды бөлек алады, seq соңғысында ғана
+    assert legacy_cashier.sent == [
+        {"type": "order_update", "data": {**orders[0], "branch_id": 1, "automation": True}},
+        {"type": "order_update", "data": {**orders[1], "branch_id": 1, "automation": True}, "seq": 1, "epoch": new_cashier.sent[0]["epoch"]},
+    ]
+    assert legacy_client.sent == [{"type": "order_update", "data": {**orders[0], "branch_id": 1, "automation": True}}]
+    assert replay == legacy_cashier.sent
+    assert all(m["data"]["automation"] is True for m in legacy_cashier.sent + legacy_client.sent)
+
+
+def test_disconnect_policy_evicts_slow_consumer():
+    updates = [(i, "pending") for i in range(1, 7)]
+    manager, stalled = _stalled_client_scenario("disconnect", updates)
+
+    assert stalled.closed
+    assert 42 not in manager.user_connections or not manager.user_connections[42]
+    assert manager.get_queue_stats()["connections"] == 0
+
+
+def test_broadcast_to_1k_sockets_serializes_once(monkeypatch):
+    """1000 сокет, олардың 1%-ы баяу: әр сокет хабарламаны бір рет алады, JSON бір рет жасалады"""
+    calls = []
+    real_dumps = json.dumps
+    monkeypatch.setattr(websocket_server.json, "dumps", lambda obj, **kw: calls.append(obj) or real_dumps(obj, **kw))
+
+    async def scenario():
+        manager = WebSocketManager(send_timeout=5)
+        sockets = [FakeWebSocket() for _ in range(SOCKETS)]
+        await _connect_many(manager, sockets, "client", branch_id=1)
+        for ws in sockets[::100]:
+            ws.delay = 0.05
+        calls.clear()
+
+        await manager.broadcast_to_branch({"type": "ping"}, 1)
+        await manager.flush()
+        return sockets
+
+    sockets = asyncio.run(scenario())
+
+    assert all(ws.sent == [{"type": "ping"}] for ws in sockets)
+    assert len(calls) == 1
+
+
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="RUN_BENCHMARKS=1 болғанда ғана (уақытқа тәуелді)")
+def test_broadcast_benchmark_1k_sockets():
+    """Broadcast кезекке қойып, бірден қайтады; жеткізу сокеттер бойынша параллель"""
+    delay = 0.01
+
+    async def scenario():
+        manager = WebSocketManager(send_timeout=0.5)
+        sockets = [FakeWebSocket() for _ in range(SOCKETS)]
+        await _connect_many(manager, sockets, "client", branch_id=1)
+        for i, ws in enumerate(sockets):
+            ws.delay = 0.2 if i % 100 == 0 else delay
+
+        started = time.perf_counter()
+        await manager.broadcast_to_branch({"type": "ping"}, 1)
+        broadcast = time.perf_counter() - started
+        await manager.flush()
+        delivered = time.perf_counter() - started
+        return broadcast, delivered
+
+    broadcast, delivered = asyncio.run(scenario())
+
+    # Broadcast уақыты баяу клиентке тәуелді емес
+    assert broadcast < 0.2
+    # Тізбектей жіберу ~SOCKETS * delay (10+ с) алар еді
+    assert delivered < SOCKETS * delay / 5
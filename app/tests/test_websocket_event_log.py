@@ -0,0 +1,67 @@
+import asyncio
+
+from app.configuration.websocket.backplane import InMemoryBroker, InMemoryBackplane
+from app.configuration.websocket.event_log import BranchEventLog
+from app.configuration.websocket.websocket_server import WebSocketManager
+
+
+def _record(log: BranchEventLog, seqs, epoch="e1", branch_id=1):
+    for seq in seqs:
+        log.record(branch_id, seq, epoch, {"seq": seq})
+
+
+def test_resume_returns_delta_after_last_seq():
+    log = BranchEventLog(size=10)
+    _record(log, range(1, 6))
+
+    assert [m["seq"] for m in log.since(1, 3, "e1")] == [4, 5]
+    assert log.since(1, 5, "e1") == []
+
+
+def test_resume_falls_back_to_snapshot():
+    log = BranchEventLog(size=3)
+    _record(log, range(1, 8))
+
+    # Буферден шығып кеткен оқиғалар
+    assert log.since(1, 2, "e1") is None
+    assert [m["seq"] for m in log.since(1, 4, "e1")] == [5, 6, 7]
+    # Басқа epoch немесе болашақ seq
+    assert log.since(1, 6, "e0") is None
+    assert log.since(1, 9, "e1") is None
+
+
+def test_resume_waits_for_out_of_order_and_unsequenced_events():
+    log = BranchEventLog(size=10)
+    _record(log, [1, 2, 4])
+    assert log.since(1, 2, "e1") is None
+
+    _record(log, [3])
+    assert [m["seq"] for m in log.since(1, 2, "e1")] == [3, 4]
+
+    # seq-сіз оқиға өтті: бұрынғы курсорлар жарамсыз
+    log.invalidate(1)
+    _record(log, [5])
+    assert log.since(1, 4, "e1") is None
+    assert log.since(1, 5, "e1") == []
+
+
+def test_workers_share_branch_sequence():
+    async def scenario():
+        broker = InMemoryBroker()
+        worker_a, worker_b = WebSocketManager(), WebSocketManager()
+        await worker_a.start_backplane(InMemoryBackplane(broker))
+        await worker_b.start_backplane(InMemoryBackplane(broker))
+
+        await worker_a.broadcast_new_order({"id": 1, "branch_id": 1})
+        await worker_b.broadcast_order_update({"id": 1, "branch_id": 1, "status": "cooking"})
+        await worker_a.broadcast_new_order({"id": 2, "branch_id": 2})
+        return worker_a, worker_b
+
+    worker_a, worker_b = asyncio.run(scenario())
+
+    assert worker_a.epoch == worker_b.epoch
+    for worker in (worker_a, worker_b):
+        assert worker.current_seq(1) == 2
+        assert worker.current_seq(2) == 1
+        events = worker.events_since(1, 0, worker.epoch)
+        assert [(e["type"], e["seq"]) for e in events] == [("new_order", 1), ("order_update", 2)]
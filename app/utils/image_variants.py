@@ -0,0 +1,85 @@
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from config import settings
+
+# Мобильді клиенттерге арналған өлшемдер (ең үлкен ені, px)
+VARIANT_WIDTHS = {
+    "thumb": 160,
+    "medium": 480,
+    "large": 1080,
+}
+
+# (формат, Pillow формат аты, content type, кеңейтім)
+VARIANT_FORMATS = [
+    ("webp", "WEBP", "image/webp", "webp"),
+    ("jpeg", "JPEG", "image/jpeg", "jpg"),
+]
+
+_image_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """Суреттерді өңдейтін process pool (алғашқы сұраныста ашылады)
+
+    Pillow decode/resize CPU-ды алады, сондықтан бөлек процесстерде орындалады.
+    "spawn" — fork-пен thread-тері бар (asyncio, boto3) процессті көшірмеу үшін.
+    """
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _image_pool
+
+
+def shutdown_image_pool():
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+
+def render_variants(data: bytes) -> List[Tuple[str, str, int, int, str, str, bytes]]:
+    """Суреттің барлық нұсқаларын жасау: (аты, формат, ені, биіктігі, content type, кеңейтім, bytes)
+
+    Process pool ішінде орындалады, сондықтан тек bytes қабылдап, bytes қайтарады.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        # Телефон фотоларының EXIF бағытын қолдану
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    variants = []
+    for name, max_width in VARIANT_WIDTHS.items():
+        resized = image
+        if image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            resized = image.resize((max_width, height), Image.Resampling.LANCZOS)
+
+        for fmt, pil_format, content_type, ext in VARIANT_FORMATS:
+            frame = resized
+            if pil_format == "JPEG" and frame.mode == "RGBA":
+                # JPEG-те мөлдірлік жоқ: ақ фонға салу
+                background = Image.new("RGB", frame.size, (255, 255, 255))
+                background.paste(frame, mask=frame.split()[3])
+                frame = background
+            buffer = io.BytesIO()
+            frame.save(buffer, pil_format, quality=settings.IMAGE_VARIANT_QUALITY, optimize=True)
+            variants.append((name, fmt, resized.width, resized.height, content_type, ext, buffer.getvalue()))
+    return variants
+
+
+def variant_map(rendered: List[Tuple], urls: List[str]) -> Dict[str, dict]:
+    """{"thumb": {"width": 160, "height": 120, "webp": url, "jpeg": url}, ...}"""
+    result: Dict[str, dict] = {}
+    for (name, fmt, width, height, *_), url in zip(rendered, urls):
+        entry = result.setdefault(name, {"width": width, "height": height})
+        entry[fmt] = url
+    return result
@@ -1,57 +1,226 @@
-import uuid
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+
 import boto3
-from botocore.exceptions import BotoCoreError, NoCredentialsError
+from boto3.s3.transfer import TransferConfig
 from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 from config import settings
+from app.database.connection import SessionLocal
+from app.models.stored_object import StoredObject
+from app.utils.image_variants import get_image_pool, render_variants, variant_map
 
 from botocore.config import Config
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-    region_name=settings.AWS_S3_REGION_NAME,
-    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-    config=Config(
-        signature_version="s3v4",
-        s3={
-            "payload_signing_enabled": False,
-            "addressing_style": "path",
-        }
+MB = 1024 * 1024
+HASH_CHUNK_SIZE = 1 * MB
+
+
+def make_s3_client(endpoint_url: str = None):
+    return boto3.client(
+        "s3",
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_S3_REGION_NAME,
+        endpoint_url=endpoint_url or settings.AWS_S3_ENDPOINT_URL,
+        config=Config(
+            signature_version="s3v4",
+            # Бір client (және оның urllib3 connection pool-ы) барлық жүктеулерге ортақ
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            # Жаңа botocore CRC32 trailer (aws-chunked) қосады, S3-үйлес сервер оны қабылдамайды
+            request_checksum_calculation="when_required",
+            response_checksum_validation="when_required",
+            s3={
+                "payload_signing_enabled": False,
+                "addressing_style": "path",
+            }
+        )
     )
+
+
+s3_client = make_s3_client()
+
+
+def make_transfer_config(threshold: int, chunksize: int, concurrency: int) -> TransferConfig:
+    """Үлкен файл бөліктермен (multipart) жүктеледі: жадта ең көбі chunksize * concurrency"""
+    config = TransferConfig(
+        multipart_threshold=threshold,
+        multipart_chunksize=chunksize,
+        max_concurrency=concurrency,
+    )
+    # s3transfer әдепкіде 10 бөлікті алдын ала жадқа оқиды
+    config.max_in_memory_upload_chunks = concurrency
+    return config
+
+
+transfer_config = make_transfer_config(
+    settings.S3_MULTIPART_THRESHOLD_MB * MB,
+    settings.S3_MULTIPART_CHUNK_MB * MB,
+    settings.S3_MULTIPART_CONCURRENCY,
 )
 
-def upload_file_to_s3(file, content_type: str, folder: str = "foods") -> str:
+# Жүктеулер event loop-тан және Starlette threadpool-ынан тыс орындалады
+upload_executor = ThreadPoolExecutor(max_workers=settings.S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload")
+
+
+def _hash_file(fileobj) -> Tuple[str, int]:
+    """Файлды бөліктермен оқып SHA-256 және өлшемін есептеу (жад шектелген)"""
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    size = 0
+    for block in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(block)
+        size += len(block)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+def _find_stored(sha256: str, folder: str) -> Optional[StoredObject]:
+    try:
+        with SessionLocal() as db:
+            return db.query(StoredObject).filter(
+                StoredObject.sha256 == sha256,
+                StoredObject.folder == folder
+            ).first()
+    except Exception as e:
+        # Индекс қолжетімсіз болса, жай жүктей береміз
+        print(f"Stored object lookup error: {e}", flush=True)
+        return None
+
+
+def _remember(sha256: str, folder: str, url: str, content_type: str, size: int, variants: dict = None):
+    stmt = insert(StoredObject).values(
+        sha256=sha256, folder=folder, url=url, content_type=content_type, size=size,
+        variants=variants, created_at=datetime.utcnow()
+    )
+    # Бір файл қатар жүктелсе, бірінші жазба қалады (кілт мазмұнға байланысты, объект бірдей)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_stored_object_sha256_folder",
+        set_={"variants": func.coalesce(StoredObject.variants, stmt.excluded.variants)}
+    )
     try:
-        ext = file.filename.split(".")[-1]
-        unique_name = f"{folder}/{uuid.uuid4()}.{ext}"
-
-        file.file.seek(0)
-        file_bytes = file.file.read()
-        print(f"Uploading file of size: {len(file_bytes)} bytes", flush=True)
-
-        # Generate a presigned URL to bypass boto3's PutObject payload handling
-        presigned_url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': settings.AWS_S3_BUCKET_NAME,
-                'Key': unique_name,
-                'ContentType': content_type
-            },
-            ExpiresIn=300
+        with SessionLocal() as db:
+            db.execute(stmt)
+            db.commit()
+    except Exception as e:
+        print(f"Stored object index error: {e}", flush=True)
+
+
+def _object_url(key: str) -> str:
+    return f"{settings.AWS_S3_ENDPOINT_URL}/{settings.AWS_S3_BUCKET_NAME}/{key}"
+
+
+def _upload_stream(fileobj, content_type: str, key: str) -> str:
+    try:
+        s3_client.upload_fileobj(
+            fileobj,
+            settings.AWS_S3_BUCKET_NAME,
+            key,
+            ExtraArgs={"ContentType": content_type},
+            Config=transfer_config
         )
+        return _object_url(key)
+    except Exception as e:
+        print(f"S3 Upload Error: {e}", flush=True)
+        raise HTTPException(status_code=500, detail="S3 upload error")
+
+
+def upload_file_to_s3(file, content_type: str, folder: str = "foods") -> str:
+    """Файлды S3-ке жүктеу. Кілт — мазмұнның SHA-256-ы, сондықтан бірдей файл қайта жүктелмейді
+
+    Клиент сол чекпен қайталаса (нашар желі), бұрынғы объектінің URL-ы қайтарылады.
+    """
+    ext = file.filename.split(".")[-1]
+    # UploadFile.file — дискідегі SpooledTemporaryFile, толық оқымай бөліктермен өңдейміз
+    sha256, size = _hash_file(file.file)
+
+    stored = _find_stored(sha256, folder)
+    if stored:
+        print(f"Upload deduplicated: {folder}/{sha256} ({size} bytes)", flush=True)
+        return stored.url
+
+    print(f"Uploading file of size: {size} bytes", flush=True)
+    url = _upload_stream(file.file, content_type, f"{folder}/{sha256}.{ext}")
+    _remember(sha256, folder, url, content_type, size)
+    return url
+
 
-        import urllib.request
-        req = urllib.request.Request(presigned_url, data=file_bytes, method='PUT')
-        req.add_header('Content-Type', content_type)
-        req.add_header('Content-Length', str(len(file_bytes)))
-        
-        with urllib.request.urlopen(req) as response:
-            if response.status not in (200, 201):
-                raise Exception(f"S3 HTTP status {response.status}")
+def upload_files_to_s3(files: List, folder: str = "foods") -> List[str]:
+    """Бірнеше файлды параллель жүктеу (sync endpoint-тер үшін), URL-дар файлдар ретімен"""
+    futures = [
+        upload_executor.submit(upload_file_to_s3, file, file.content_type, folder)
+        for file in files
+    ]
+    return [future.result() for future in futures]
 
-        return f"{settings.AWS_S3_ENDPOINT_URL}/{settings.AWS_S3_BUCKET_NAME}/{unique_name}"
 
+async def upload_file_to_s3_async(file, content_type: str, folder: str = "foods") -> str:
+    """async endpoint-тер үшін: event loop-ты бөгемейді"""
+    return await asyncio.wrap_future(upload_executor.submit(upload_file_to_s3, file, content_type, folder))
+
+
+def upload_bytes_to_s3(data: bytes, content_type: str, key: str) -> str:
+    """Кішкентай файлды (сурет нұсқалары) бір PUT-пен жүктеу"""
+    try:
+        s3_client.put_object(
+            Bucket=settings.AWS_S3_BUCKET_NAME, Key=key, Body=data, ContentType=content_type
+        )
+        return _object_url(key)
     except Exception as e:
         print(f"S3 Upload Error: {e}", flush=True)
-        raise HTTPException(status_code=500, detail="S3 upload error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="S3 upload error")
+
+
+def upload_images_with_variants(files: List, folder: str = "foods") -> List[Tuple[str, dict]]:
+    """Суреттердің түпнұсқасын және thumb/medium/large (WebP, JPEG) нұсқаларын жүктеу
+
+    Бұрын жүктелген сурет (SHA-256 бойынша) қайта өңделмейді. Нұсқалар process pool-да жасалады,
+    барлық жүктеу upload_executor-да параллель жүреді. Әр файл үшін (түпнұсқа URL, нұсқалар картасы) қайтарады.
+    """
+    hashes = [_hash_file(file.file) for file in files]
+    known = [_find_stored(sha256, folder) for sha256, _ in hashes]
+
+    renders = {}
+    for index, (file, stored) in enumerate(zip(files, known)):
+        if stored is None or stored.variants is None:
+            renders[index] = get_image_pool().submit(render_variants, file.file.read())
+            file.file.seek(0)
+
+    rendered_all = {}
+    for index, render in renders.items():
+        try:
+            rendered_all[index] = render.result()
+        except Exception as e:
+            print(f"Image processing error ({files[index].filename}): {e}", flush=True)
+            raise HTTPException(status_code=400, detail="Суретті оқу мүмкін емес")
+
+    uploads = {}
+    for index, rendered in rendered_all.items():
+        file, (sha256, _), stored = files[index], hashes[index], known[index]
+        original_ext = file.filename.split(".")[-1]
+        original = None if stored else upload_executor.submit(
+            _upload_stream, file.file, file.content_type, f"{folder}/{sha256}.{original_ext}"
+        )
+        base = f"{folder}/variants/{sha256}"
+        variants = [
+            upload_executor.submit(upload_bytes_to_s3, blob, content_type, f"{base}_{name}.{ext}")
+            for name, _, _, _, content_type, ext, blob in rendered
+        ]
+        uploads[index] = (original, variants)
+
+    results = []
+    for index, (file, (sha256, size), stored) in enumerate(zip(files, hashes, known)):
+        if index not in uploads:
+            print(f"Upload deduplicated: {folder}/{sha256} ({size} bytes)", flush=True)
+            results.append((stored.url, stored.variants))
+            continue
+        original, variant_futures = uploads[index]
+        url = original.result() if original else stored.url
+        variants = variant_map(rendered_all[index], [future.result() for future in variant_futures])
+        _remember(sha256, folder, url, file.content_type, size, variants)
+        results.append((url, variants))
+    return results
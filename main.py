@@ -1,12 +1,23 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import auth, canteen_admin, cashier, client, notification, owner, websocket, admin, ai
 from app.service.order_automation import OrderAutomationService
+from app.service.auth_service import AuthService
+from app.service.subscription_usage_service import SubscriptionUsageService
+from app.service.job_scheduler import job_scheduler
 import logging
 import asyncio
 from alembic.config import Config
 from alembic import command
 from config import settings
+from app.database.connection import engine, async_engine
+from app.database.pool_metrics import get_pool_stats
+from app.configuration.security.dependencies import get_admin_user
+from app.configuration.websocket.websocket_server import websocket_manager
+from app.configuration.websocket.backplane import RedisBackplane, InMemoryBackplane
+from app.service.order_board import order_board
+from app.service.mail_outbox import mail_outbox
+from app.utils.image_variants import shutdown_image_pool
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
@@ -20,18 +31,53 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initialize Redis on startup
     try:
-        redis = aioredis.from_url("redis://localhost:6379", encoding="utf8", decode_responses=True)
+        redis = aioredis.from_url(settings.REDIS_URL, encoding="utf8", decode_responses=True)
         FastAPICache.init(RedisBackend(redis), prefix="foodlapp-cache")
         logger.info("✅ Redis Caching initialized successfully")
     except Exception as e:
         logger.warning(f"⚠️ Redis init error (Is redis-server running?): {e}")
 
-    # Start Background Automation Tasks
-    asyncio.create_task(OrderAutomationService.auto_complete_stale_orders())
-    logger.info("🚀 Order Automation background task started")
+    # WebSocket backplane: order оқиғалары барлық worker-лердің сокеттеріне жетуі үшін
+    try:
+        if settings.WS_BACKPLANE == "redis":
+            await websocket_manager.start_backplane(
+                RedisBackplane(settings.REDIS_URL, on_reconnect=order_board.rebuild)
+            )
+        else:
+            await websocket_manager.start_backplane(InMemoryBackplane())
+        logger.info(f"✅ WebSocket backplane started ({settings.WS_BACKPLANE})")
+    except Exception as e:
+        logger.warning(f"⚠️ WebSocket backplane error, broadcasts stay local to this worker: {e}")
+
+    # Белсенді заказдар тақтасы: order оқиғаларымен жаңарады, алдымен DB-ден құрылады
+    websocket_manager.add_listener(order_board.apply_event)
+    try:
+        await order_board.rebuild()
+    except Exception as e:
+        logger.warning(f"⚠️ Order board rebuild error, cashier endpoints will query the DB: {e}")
+    order_board.start_resync(settings.ORDER_BOARD_RESYNC_SECONDS)
+
+    # Email кезегі: OTP хаттарын фонда жібереді
+    mail_outbox.start()
+
+    # Фондық job-тар: әр worker тексереді, бірақ әр job-ты бір уақытта біреуі ғана орындайды
+    job_scheduler.register("stale_orders", OrderAutomationService.run_once, settings.JOB_STALE_ORDERS_INTERVAL_SECONDS)
+    job_scheduler.register("otp_purge", AuthService.purge_expired_otps, settings.JOB_OTP_PURGE_INTERVAL_SECONDS)
+    job_scheduler.register(
+        "subscription_usage_rollup", SubscriptionUsageService.rebuild_recent, settings.JOB_USAGE_ROLLUP_INTERVAL_SECONDS
+    )
+    if settings.JOB_SCHEDULER_ENABLED:
+        job_scheduler.start()
+        logger.info(f"🚀 Job scheduler started ({job_scheduler.worker_id})")
     
     yield
     # Cleanup on shutdown
+    await job_scheduler.stop()
+    await order_board.stop_resync()
+    await mail_outbox.stop()
+    shutdown_image_pool()
+    await websocket_manager.stop_backplane()
+    await async_engine.dispose()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -78,3 +124,30 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/internal/ws-queues", include_in_schema=False, dependencies=[Depends(get_admin_user)])
+def ws_queue_stats():
+    """Осы worker-дегі WebSocket жіберу кезектерінің метрикалары"""
+    return websocket_manager.get_queue_stats()
+
+
+@app.get("/internal/jobs", include_in_schema=False, dependencies=[Depends(get_admin_user)])
+async def job_stats():
+    """Фондық job-тар: соңғы орындалу ұзақтығы, соңғы сәтті уақыты, қателер (барлық worker бойынша)"""
+    return await job_scheduler.stats()
+
+
+@app.get("/internal/db-pool", include_in_schema=False, dependencies=[Depends(get_admin_user)])
+def db_pool_stats():
+    """Осы worker-дегі DB connection pool статистикасы"""
+    return {
+        "sync": get_pool_stats(engine.pool),
+        "async": get_pool_stats(async_engine.sync_engine.pool),
+        "config": {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+            "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+        },
+    }